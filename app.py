@@ -2,7 +2,7 @@ import streamlit as st
 import os
 import re
 from PIL import Image
-from src.agents.orchestrator.agent import app as report_agent_app
+from src.agents.orchestrator.agent import stream_report
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
@@ -33,6 +33,35 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+NODE_LABELS = {
+    "calculate_metrics": "Calculando métricas",
+    "generate_plots": "Gerando gráficos",
+    "fetch_news": "Buscando notícias",
+    "clinical_protocol_search": "Pesquisando protocolos clínicos",
+    "generate_report": "Redigindo o relatório",
+    "generate_pdf": "Gerando o PDF",
+}
+
+
+def render_metrics(metrics: dict) -> None:
+    """Mostra as métricas principais assim que o cálculo termina, antes do relatório."""
+    cols = st.columns(4)
+    cols[0].metric("Taxa de Mortalidade", f"{metrics.get('taxa_mortalidade', 0)}%")
+    cols[1].metric("Internados em UTI", f"{metrics.get('taxa_uti', 0)}%")
+    cols[2].metric("Vacinados (COVID-19)", f"{metrics.get('taxa_vacinacao', 0)}%")
+    cols[3].metric("Variação Semanal", f"{metrics.get('taxa_aumento_casos', 0)}%")
+
+
+def render_plots(plot_paths: dict) -> None:
+    plot_col1, plot_col2 = st.columns(2)
+    if "daily_cases_plot" in plot_paths:
+        with plot_col1:
+            st.image(plot_paths["daily_cases_plot"], caption="Evolução Diária de Casos")
+    if "monthly_cases_plot" in plot_paths:
+        with plot_col2:
+            st.image(plot_paths["monthly_cases_plot"], caption="Evolução Mensal de Casos")
+
+
 def answer_follow_up_question(question: str, report_context: str) -> str:
     """Usa um LLM para responder a uma pergunta com base no relatório já gerado."""
     llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
@@ -92,13 +121,14 @@ for message in st.session_state.messages:
         if "plots" in message and message["plots"]:
             st.subheader("Gráficos de Evolução")
             plot_col1, plot_col2 = st.columns(2)
-            if "daily" in message["plots"]:
+            # Os arquivos das mensagens anteriores podem ter saído do cache de relatórios
+            if os.path.exists(message["plots"].get("daily") or ""):
                 with plot_col1:
                     st.image(message["plots"]["daily"], caption="Evolução Diária de Casos")
-            if "monthly" in message["plots"]:
+            if os.path.exists(message["plots"].get("monthly") or ""):
                 with plot_col2:
                     st.image(message["plots"]["monthly"], caption="Evolução Mensal de Casos")
-        if "pdf" in message and message["pdf"]:
+        if "pdf" in message and message["pdf"] and os.path.exists(message["pdf"]):
             with open(message["pdf"], "rb") as pdf_file:
                 st.download_button(
                     label="Baixar Relatório em PDF",
@@ -106,6 +136,8 @@ for message in st.session_state.messages:
                     file_name=os.path.basename(message["pdf"]),
                     mime="application/octet-stream"
                 )
+        elif message.get("pdf"):
+            st.caption("O PDF deste relatório não está mais disponível; gere o relatório novamente.")
 
 if "last_report" in st.session_state:
     if prompt := st.chat_input("Faça uma pergunta sobre o relatório acima..."):
@@ -123,32 +155,54 @@ else:
         with st.chat_message("user"):
             st.markdown(prompt)
         with st.chat_message("assistant"):
-            with st.spinner(f"Entendido. Iniciando a análise completa para '{prompt}'..."):
-                try:
-                    city, state = None, prompt.strip()
-                    match = re.match(r'^(.*?)[,\s-]+([A-Za-z]{2})$', prompt.strip())
-                    if match:
-                        city, state = match.group(1).strip(), match.group(2).strip().upper()
-                    
-                    initial_input = {"topic": state, "city": city}
-                    final_state = report_agent_app.invoke(initial_input)
-                    report_text = final_state.get("report_text", "Não foi possível gerar o relatório.")
-                    plot_paths = final_state.get("plot_image_paths", {})
-                    pdf_path = final_state.get("pdf_report_path")
-                    st.markdown(report_text)
-                    st.session_state.last_report = report_text
-                    assistant_plots = {}
-                    if "daily_cases_plot" in plot_paths:
-                        assistant_plots["daily"] = plot_paths["daily_cases_plot"]
-                    if "monthly_cases_plot" in plot_paths:
-                        assistant_plots["monthly"] = plot_paths["monthly_cases_plot"]
-
-                    assistant_message = {"role": "assistant", "content": report_text, "plots": assistant_plots}
-                    if pdf_path and os.path.exists(pdf_path):
-                        assistant_message["pdf"] = pdf_path
-                    st.session_state.messages.append(assistant_message)
-                    st.rerun()
-                except Exception as e:
-                    error_message = f"Desculpe, ocorreu um erro: {e}"
-                    st.error(error_message)
-                    st.session_state.messages.append({"role": "assistant", "content": error_message})
\ No newline at end of file
+            try:
+                city, state = None, prompt.strip()
+                match = re.match(r'^(.*?)[,\s-]+([A-Za-z]{2})$', prompt.strip())
+                if match:
+                    city, state = match.group(1).strip(), match.group(2).strip().upper()
+
+                initial_input = {"topic": state, "city": city}
+                # Métricas, gráficos e o texto do relatório aparecem à medida que ficam prontos
+                status = st.status(f"Entendido. Iniciando a análise completa para '{prompt}'...", expanded=False)
+                metrics_area, plots_area, report_area = st.container(), st.container(), st.empty()
+                partial_report, final_state = "", {}
+                for event in stream_report(initial_input):
+                    if event["event"] == "node_start":
+                        label = NODE_LABELS.get(event["node"], event["node"])
+                        status.update(label=f"{label}...")
+                        status.write(label)
+                    elif event["event"] == "node_end" and event["node"] == "calculate_metrics":
+                        with metrics_area:
+                            render_metrics(event["update"].get("metrics", {}))
+                    elif event["event"] == "node_end" and event["node"] == "generate_plots":
+                        with plots_area:
+                            render_plots(event["update"].get("plot_image_paths", {}))
+                    elif event["event"] == "report_token":
+                        partial_report += event["text"]
+                        report_area.markdown(partial_report + "▌")
+                    elif event["event"] == "report_reset":
+                        partial_report = ""
+                    elif event["event"] == "done":
+                        final_state = event["state"]
+                status.update(label="Análise concluída.", state="complete")
+
+                report_text = final_state.get("report_text") or "Não foi possível gerar o relatório."
+                plot_paths = final_state.get("plot_image_paths", {})
+                pdf_path = final_state.get("pdf_report_path")
+                report_area.markdown(report_text)
+                st.session_state.last_report = report_text
+                assistant_plots = {}
+                if "daily_cases_plot" in plot_paths:
+                    assistant_plots["daily"] = plot_paths["daily_cases_plot"]
+                if "monthly_cases_plot" in plot_paths:
+                    assistant_plots["monthly"] = plot_paths["monthly_cases_plot"]
+
+                assistant_message = {"role": "assistant", "content": report_text, "plots": assistant_plots}
+                if pdf_path and os.path.exists(pdf_path):
+                    assistant_message["pdf"] = pdf_path
+                st.session_state.messages.append(assistant_message)
+                st.rerun()
+            except Exception as e:
+                error_message = f"Desculpe, ocorreu um erro: {e}"
+                st.error(error_message)
+                st.session_state.messages.append({"role": "assistant", "content": error_message})
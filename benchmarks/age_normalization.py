@@ -0,0 +1,64 @@
+"""
+Micro-benchmark da normalização de idades.
+
+Compara o tempo do caminho vetorizado de SragDataProcessor._normalize_age com
+o da implementação anterior (apply linha a linha). A equivalência entre os dois
+é verificada em tests/test_data_processor.py.
+
+Uso: python -m benchmarks.age_normalization --rows 1000000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.config import DATA_PROCESSING_CONFIG
+from src.data_processor import SragDataProcessor
+
+
+def convert_age_rowwise(df: pd.DataFrame) -> pd.Series:
+    """Implementação anterior, mantida como referência."""
+    def convert_age(row):
+        age, age_type = row['idade'], row['tipo_idade']
+        if pd.isna(age) or pd.isna(age_type): return age
+        if age_type == 1: return age / 365.25
+        if age_type == 2: return age / 12
+        return age
+    return df.apply(convert_age, axis=1)
+
+
+def make_age_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Gera idades e unidades com ~2% de valores ausentes em cada coluna."""
+    rng = np.random.default_rng(seed)
+    age = pd.array(rng.integers(0, 120, rows), dtype="Int64")
+    age_type = pd.array(rng.choice([1, 2, 3], rows, p=[0.05, 0.10, 0.85]), dtype="Int64")
+    age[rng.random(rows) < 0.02] = pd.NA
+    age_type[rng.random(rows) < 0.02] = pd.NA
+    return pd.DataFrame({"idade": age, "tipo_idade": age_type})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    df = make_age_frame(args.rows, args.seed)
+
+    start = time.perf_counter()
+    convert_age_rowwise(df)
+    rowwise_seconds = time.perf_counter() - start
+
+    processor = SragDataProcessor(config=DATA_PROCESSING_CONFIG)
+    processor.df = df.copy()
+    start = time.perf_counter()
+    processor._normalize_age()
+    vectorized_seconds = time.perf_counter() - start
+
+    print(f"\nRegistros: {args.rows}")
+    print(f"  apply linha a linha: {rowwise_seconds:.3f}s")
+    print(f"  vetorizado:          {vectorized_seconds:.3f}s")
+    print(f"  ganho:               {rowwise_seconds / max(vectorized_seconds, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
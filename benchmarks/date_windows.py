@@ -0,0 +1,110 @@
+"""
+Benchmark das consultas por janela de datas.
+
+Compara as janelas respondidas pelo DateIndex (busca binária sobre o frame
+ordenado por data) com as implementações anteriores por máscara booleana e
+set_index + resample, e confere que os resultados são idênticos para cada
+localidade: últimos 30 dias, últimos 12 meses, variação semanal, intervalos
+arbitrários e semanas epidemiológicas.
+
+Uso: python -m benchmarks.date_windows --data data/processed/OpenSUS_limpo.csv --repeat 20
+"""
+import argparse
+import time
+import pandas as pd
+from src.config import DATA_PROCESSING_CONFIG
+from src.data_store import get_processed_data_path
+from src.dataset_index import epi_weeks
+from src.metrics_calculator import MetricsCalculator
+
+DEFAULT_LOCATIONS = ["Brasil", "SP", "Presidente Prudente, SP"]
+
+
+def daily_by_mask(df: pd.DataFrame, days: int = 30) -> pd.Series:
+    """Implementações anteriores, mantidas como referência."""
+    if df.empty or df['data_notificacao'].isnull().all():
+        return pd.Series(dtype=float)
+    last_date = df['data_notificacao'].max()
+    return df[df['data_notificacao'] >= last_date - pd.Timedelta(days=days)].groupby('data_notificacao').size()
+
+
+def monthly_by_resample(df: pd.DataFrame, months: int = 12) -> pd.Series:
+    if df.empty or df['data_notificacao'].isnull().all():
+        return pd.Series(dtype=float)
+    return df.set_index('data_notificacao').resample('ME').size().tail(months)
+
+
+def increase_by_mask(df: pd.DataFrame) -> float:
+    if df.empty or df['data_notificacao'].nunique() < 14:
+        return 0.0
+    dates = df['data_notificacao']
+    last_date = dates.max()
+    last_week = (dates >= last_date - pd.Timedelta(days=6)).sum()
+    prev_week = ((dates >= last_date - pd.Timedelta(days=13)) & (dates <= last_date - pd.Timedelta(days=7))).sum()
+    return round(((last_week - prev_week) / prev_week) * 100, 2) if prev_week > 0 else float('inf')
+
+
+def range_by_mask(df: pd.DataFrame, start, end) -> pd.DataFrame:
+    return df[(df['data_notificacao'] >= start) & (df['data_notificacao'] <= end)]
+
+
+def week_by_mask(df: pd.DataFrame, year: int, week: int) -> pd.DataFrame:
+    years, weeks = epi_weeks(df['data_notificacao'].to_numpy())
+    return df[(years == year) & (weeks == week) & df['data_notificacao'].notna().to_numpy()]
+
+
+def best_time(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=str(get_processed_data_path(DATA_PROCESSING_CONFIG)))
+    parser.add_argument("--locations", nargs="*", default=DEFAULT_LOCATIONS,
+                        help="Localidades no formato 'UF' ou 'Cidade, UF'.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'localidade':<28} {'linhas':>9} {'máscaras':>10} {'índice':>10} {'ganho':>7}  iguais")
+    for location in args.locations:
+        city, _, uf = location.rpartition(",")
+        calculator = MetricsCalculator(cleaned_data_path=args.data, location=uf.strip() or location,
+                                       city=city.strip() or None)
+        df = calculator.df
+        index = calculator.date_index
+        if index.empty:
+            print(f"{location:<28} {len(df):>9} (sem datas)")
+            continue
+        last = index.last_date
+        start, end = last - pd.Timedelta(days=90), last - pd.Timedelta(days=30)
+        year, week = index.weeks[len(index.weeks) // 2]
+
+        equal = (
+            daily_by_mask(df).equals(calculator.get_daily_cases())
+            and monthly_by_resample(df).equals(calculator.get_monthly_cases())
+            and increase_by_mask(df) == calculator.calculate_case_increase_rate()
+            and range_by_mask(df, start, end).equals(calculator.get_cases_between(start, end))
+            and week_by_mask(df, year, week).equals(calculator.get_epi_week_cases(year, week))
+            and len(range_by_mask(df, start, end)) == calculator.count_cases_between(start, end)
+        )
+
+        def by_mask():
+            daily_by_mask(df), monthly_by_resample(df), increase_by_mask(df)
+            range_by_mask(df, start, end), week_by_mask(df, year, week)
+
+        def by_index():
+            calculator.get_daily_cases(), calculator.get_monthly_cases(), calculator.calculate_case_increase_rate()
+            calculator.get_cases_between(start, end), calculator.get_epi_week_cases(year, week)
+
+        mask_time, index_time = best_time(by_mask, args.repeat), best_time(by_index, args.repeat)
+        print(f"{location:<28} {len(df):>9} {mask_time * 1000:>8.2f}ms {index_time * 1000:>8.2f}ms "
+              f"{mask_time / index_time:>6.1f}x  {equal}")
+
+
+if __name__ == "__main__":
+    main()
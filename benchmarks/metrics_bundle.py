@@ -0,0 +1,76 @@
+"""
+Benchmark do cálculo das métricas do relatório.
+
+Compara MetricsCalculator.compute_all (passagem única) com as chamadas
+individuais feitas originalmente pelo calculate_metrics_node e confere
+que os resultados são idênticos para cada localidade.
+
+Uso: python -m benchmarks.metrics_bundle --data data/processed/OpenSUS_limpo.csv --repeat 5
+"""
+import argparse
+import time
+import pandas as pd
+from src.config import DATA_PROCESSING_CONFIG
+from src.data_store import get_processed_data_path
+from src.metrics_calculator import MetricsCalculator
+
+DEFAULT_LOCATIONS = ["Brasil", "SP", "Presidente Prudente, SP"]
+
+
+def compute_per_method(calculator: MetricsCalculator) -> dict:
+    """Caminho original: um método (e uma filtragem) por métrica."""
+    metrics = {
+        "taxa_mortalidade": calculator.calculate_mortality_rate(), "taxa_uti": calculator.calculate_icu_rate(),
+        "taxa_vacinacao": calculator.calculate_vaccination_rate(), "taxa_aumento_casos": calculator.calculate_case_increase_rate(),
+        "tempo_medio_notificacao": calculator.calculate_avg_notification_time(),
+        "proporcao_casos": calculator.get_case_proportions(),
+        "letalidade_por_idade": calculator.get_lethality_by_age_group(),
+        "taxa_ventilacao_invasiva": calculator.calculate_invasive_ventilation_rate(),
+        "taxa_vacinacao_gripe": calculator.calculate_flu_vaccination_rate(),
+    }
+    plot_data = {"casos_diarios": calculator.get_daily_cases(), "casos_mensais": calculator.get_monthly_cases()}
+    return {"metrics": metrics, "plot_data": plot_data}
+
+
+def assert_same_results(expected: dict, result: dict, location: str) -> None:
+    if expected["metrics"] != result["metrics"]:
+        raise AssertionError(f"Métricas divergentes para '{location}':\n{expected['metrics']}\n{result['metrics']}")
+    for key, series in expected["plot_data"].items():
+        # O atributo freq do resample original varia com a presença de NaT; os valores e rótulos não
+        pd.testing.assert_series_equal(series, result["plot_data"][key], check_freq=False)
+
+
+def time_call(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=str(get_processed_data_path(DATA_PROCESSING_CONFIG)))
+    parser.add_argument("--locations", nargs="+", default=DEFAULT_LOCATIONS,
+                        help="Localidades no formato 'UF' ou 'Cidade, UF'.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    for location in args.locations:
+        city, _, topic = location.rpartition(",")
+        calculator = MetricsCalculator(cleaned_data_path=args.data, location=topic.strip(),
+                                       city=city.strip() or None)
+        assert_same_results(compute_per_method(calculator), calculator.compute_all(), location)
+        per_method = time_call(lambda: compute_per_method(calculator), args.repeat)
+        fused = time_call(calculator.compute_all, args.repeat)
+        rows.append((location, len(calculator.df), per_method, fused))
+
+    print(f"\n{'Localidade':<30}{'Registros':>12}{'Por método':>14}{'compute_all':>14}{'Ganho':>8}")
+    for location, size, per_method, fused in rows:
+        print(f"{location:<30}{size:>12}{per_method:>13.4f}s{fused:>13.4f}s{per_method / max(fused, 1e-9):>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
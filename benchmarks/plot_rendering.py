@@ -0,0 +1,89 @@
+"""
+Benchmark da renderização dos gráficos.
+
+Compara o caminho anterior (pyplot: estilo, figura e savefig globais a cada
+gráfico) com o PlotGenerator atual (Agg, figuras modelo reutilizadas), em série
+e com render_many em processos, e mede a segunda passagem sobre séries
+inalteradas, que reaproveita os PNGs já gerados.
+
+Uso: python -m benchmarks.plot_rendering --charts 40 --workers 4
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from src.plot_generator import PlotGenerator, render_many
+
+
+def render_pyplot(kind: str, data: pd.Series, output_path: str) -> str:
+    """Implementação anterior, mantida como referência."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    plt.style.use('ggplot')
+    fig, ax = plt.subplots(figsize=(12, 6))
+    if kind == "daily":
+        ax.bar(data.index, data.values, color='skyblue', label='Nº de Casos Diários')
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
+    else:
+        ax.plot(data.index, data.values, marker='o', linestyle='-', color='royalblue', label='Nº de Casos Mensais')
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%b/%Y'))
+    plt.xticks(rotation=45, ha='right')
+    ax.set_title('Gráfico', fontsize=16)
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+    ax.legend()
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close(fig)
+    return output_path
+
+
+def make_jobs(charts: int, output_dir: str, seed: int = 42) -> list:
+    """Séries diárias (30 dias) e mensais (12 meses) alternadas, com contagens aleatórias."""
+    rng = np.random.default_rng(seed)
+    jobs = []
+    for i in range(charts):
+        if i % 2 == 0:
+            index = pd.date_range("2025-01-01", periods=31, freq="D", name="data_notificacao")
+            jobs.append(("daily", pd.Series(rng.integers(0, 500, len(index)), index=index), f"{output_dir}/daily_{i}.png"))
+        else:
+            index = pd.date_range("2024-01-31", periods=12, freq="ME", name="data_notificacao")
+            jobs.append(("monthly", pd.Series(rng.integers(0, 9000, len(index)), index=index), f"{output_dir}/monthly_{i}.png"))
+    return jobs
+
+
+def timed(label: str, func) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.2f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--charts", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp(prefix="bench_plots_")
+    try:
+        jobs = make_jobs(args.charts, output_dir)
+        print(f"{args.charts} gráficos, {args.workers} processo(s)")
+        timed("pyplot (anterior)", lambda: [render_pyplot(*job) for job in jobs])
+        fresh = PlotGenerator(skip_unchanged=False)
+        timed("PlotGenerator (Agg, modelos)", lambda: [fresh.render(*job) for job in jobs])
+        for name in os.listdir(output_dir):
+            os.remove(os.path.join(output_dir, name))
+        timed(f"render_many ({args.workers} processos)", lambda: render_many(jobs, n_workers=args.workers))
+        timed("render_many, séries inalteradas", lambda: render_many(jobs, n_workers=args.workers))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
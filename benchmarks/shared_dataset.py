@@ -0,0 +1,113 @@
+"""
+Benchmark de memória dos dados limpos compartilhados entre processos.
+
+Sobe N processos ao mesmo tempo (como várias instâncias do Streamlit ou do
+relatório em lote) que carregam os dados e calculam as métricas de uma
+localidade, e mede em cada um o tempo de carga e a memória acrescentada pela
+carga: residente (RSS), proporcional (PSS, páginas compartilhadas divididas
+entre os processos) e privada. Compara o formato de origem (CSV ou Parquet),
+em que cada processo tem a sua cópia, com o arquivo Arrow mapeado em memória,
+e confere que as métricas são idênticas. A memória vem de /proc (Linux).
+
+Uso: python -m benchmarks.shared_dataset --data data/processed/OpenSUS_limpo.csv --processes 4
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from src.config import DATA_PROCESSING_CONFIG
+from src.data_store import get_processed_data_path, read_processed_data, write_processed_data
+
+FIELDS = {"Rss": "rss", "Pss": "pss", "Private_Clean": "private", "Private_Dirty": "private"}
+
+
+def memory_mb() -> Optional[Dict[str, float]]:
+    """RSS, PSS e memória privada do processo, em MB (None fora do Linux)."""
+    try:
+        with open("/proc/self/smaps_rollup", encoding="utf-8") as handle:
+            lines = handle.read().splitlines()
+    except OSError:
+        return None
+    usage = {"rss": 0.0, "pss": 0.0, "private": 0.0}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in FIELDS:
+            usage[FIELDS[name]] += int(value.split()[0]) / 1024
+    return usage
+
+
+def worker(path: str, location: str, city: Optional[str], barrier, results) -> None:
+    import pyarrow.ipc  # noqa: F401 (importado antes da medição nos dois formatos: conta apenas os dados)
+    from src.metrics_calculator import MetricsCalculator
+    before = memory_mb()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        calculator = MetricsCalculator(cleaned_data_path=path, location=location, city=city)
+        bundle = calculator.compute_all()
+    elapsed = time.perf_counter() - start
+    # Todos os processos medem com os dados carregados ao mesmo tempo, para o PSS dividir as páginas
+    barrier.wait()
+    after = memory_mb()
+    dates = calculator.df['data_notificacao'].to_numpy()
+    results.put({
+        "seconds": elapsed, "rows": len(calculator.df), "metrics": repr(sorted(bundle["metrics"].items())),
+        "mapped": not dates.flags.writeable,
+        **({key: after[key] - before[key] for key in after} if before and after else {}),
+    })
+    barrier.wait()
+
+
+def run_processes(path: Path, processes: int, location: str, city: Optional[str]) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(processes), context.Queue()
+    workers = [context.Process(target=worker, args=(str(path), location, city, barrier, results))
+               for _ in range(processes)]
+    for process in workers:
+        process.start()
+    rows = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+    summary = {"seconds": max(row["seconds"] for row in rows), "rows": rows[0]["rows"],
+               "metrics": {row["metrics"] for row in rows}, "mapped": all(row["mapped"] for row in rows)}
+    for key in ("rss", "pss", "private"):
+        summary[key] = sum(row[key] for row in rows) if key in rows[0] else None
+    return summary
+
+
+def _mb(value: Optional[float]) -> str:
+    return f"{value:>8.1f}MB" if value is not None else f"{'-':>10}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=str(get_processed_data_path({**DATA_PROCESSING_CONFIG, "output_format": "csv"})),
+                        help="Dados limpos de origem (CSV ou Parquet).")
+    parser.add_argument("--arrow", default=str(DATA_PROCESSING_CONFIG["arrow_output_path"]),
+                        help="Arquivo Arrow publicado a partir de --data antes da medição.")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--location", default="Brasil", help="Localidade no formato 'UF' ou 'Cidade, UF'.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_processed_data(read_processed_data(Path(args.data)), Path(args.arrow), file_format="arrow")
+    print(f"Arquivo Arrow publicado em {time.perf_counter() - start:.2f}s ({os.path.getsize(args.arrow) / 2**20:.1f}MB): {args.arrow}")
+
+    city, _, uf = args.location.rpartition(",")
+    location, city = uf.strip() or args.location, city.strip() or None
+    print(f"\n{args.processes} processo(s), localidade '{args.location}' (memória somada entre os processos)")
+    print(f"{'formato':<10} {'linhas':>9} {'carga':>8} {'RSS':>10} {'PSS':>10} {'privada':>10}  mapeado")
+    summaries = {}
+    for label, path in (("origem", args.data), ("arrow", args.arrow)):
+        summary = summaries[label] = run_processes(Path(path), args.processes, location, city)
+        print(f"{label:<10} {summary['rows']:>9} {summary['seconds']:>7.2f}s {_mb(summary['rss'])} "
+              f"{_mb(summary['pss'])} {_mb(summary['private'])}  {summary['mapped']}")
+    metrics = summaries["origem"]["metrics"] | summaries["arrow"]["metrics"]
+    print(f"\nMétricas idênticas entre formatos e processos: {len(metrics) == 1}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Suíte de benchmarks do pipeline, das métricas, dos gráficos e do PDF.
+
+Gera (ou reutiliza) um CSV bruto sintético (benchmarks.synthetic_data) e mede,
+para cada etapa, o melhor tempo entre `--repeat` execuções e o pico de memória
+alocada em uma execução extra sob tracemalloc (memória do Python e do NumPy;
+buffers internos do Arrow não entram na conta):
+- carga do arquivo bruto e cada etapa do SragDataProcessor;
+- gravação em CSV/Parquet/Arrow, cubo de métricas e releitura dos dados limpos;
+- cada método do MetricsCalculator, o índice de datas e compute_all;
+- renderização dos gráficos e geração do PDF.
+
+Os resultados podem ser salvos como linha de base (benchmarks/baselines/<nome>.json)
+e comparados em execuções futuras na mesma máquina; com --max-regression, o
+comando termina com erro se alguma etapa ficar mais lenta que o limite.
+
+Uso:
+  python -m benchmarks.suite --rows 200000 --save-baseline local
+  python -m benchmarks.suite --rows 200000 --compare local --max-regression 0.25
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import pandas as pd
+from benchmarks.synthetic_data import write_synthetic_csv
+from src.config import DATA_PROCESSING_CONFIG
+from src.data_processor import SragDataProcessor
+from src.data_store import DATASET_CACHE, read_processed_data, write_processed_data
+from src.metrics_calculator import MetricsCalculator
+from src.metrics_cube import build_metrics_cube
+from src.plot_generator import PlotGenerator
+from src.agents.pdf_generator_agent.tools import PDFGeneratorTool
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+METRIC_METHODS = [
+    "get_daily_cases", "get_monthly_cases", "calculate_mortality_rate", "calculate_icu_rate",
+    "calculate_vaccination_rate", "calculate_case_increase_rate", "calculate_avg_notification_time",
+    "get_case_proportions", "get_lethality_by_age_group", "calculate_flu_vaccination_rate",
+    "calculate_invasive_ventilation_rate", "compute_all",
+]
+
+PIPELINE_STEPS = ["select_and_rename_features", "clean_and_convert_types", "_normalize_age", "handle_missing_values"]
+
+# (nome, preparação que devolve o argumento da etapa, etapa medida)
+Benchmark = Tuple[str, Callable[[], Any], Callable[[Any], Any]]
+
+
+def measure(setup: Callable[[], Any], run: Callable[[Any], Any], repeat: int) -> Dict[str, float]:
+    """Melhor tempo de `repeat` execuções e pico de memória (MB) de uma execução sob tracemalloc."""
+    best = float("inf")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            argument = setup()
+            start = time.perf_counter()
+            run(argument)
+            best = min(best, time.perf_counter() - start)
+        argument = setup()
+        tracemalloc.start()
+        try:
+            run(argument)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {"seconds": round(best, 6), "peak_mb": round(peak / 2**20, 3)}
+
+
+def pipeline_benchmarks(config: Dict[str, Any]) -> List[Benchmark]:
+    """Uma etapa do pipeline por benchmark, cada uma partindo de uma cópia do estado anterior."""
+    processor = SragDataProcessor(config=config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor.load_data()
+    snapshots = {}
+    for step in PIPELINE_STEPS:
+        snapshots[step] = processor.df.copy()
+        with contextlib.redirect_stdout(io.StringIO()):
+            getattr(processor, step)()
+    cleaned = processor.df
+    # Arquivos limpos lidos pelos benchmarks de leitura e de métricas
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_processed_data(cleaned, config["output_file_path"], file_format="csv")
+        write_processed_data(cleaned, config["parquet_output_path"], file_format="parquet",
+                             partition_cols=config.get("partition_columns"))
+        write_processed_data(cleaned, config["arrow_output_path"], file_format="arrow")
+
+    def from_snapshot(step: str) -> Callable[[], SragDataProcessor]:
+        def setup() -> SragDataProcessor:
+            fresh = SragDataProcessor(config=config)
+            fresh.df = snapshots[step].copy()
+            return fresh
+        return setup
+
+    benchmarks: List[Benchmark] = [("pipeline:load_data", lambda: SragDataProcessor(config=config),
+                                    lambda fresh: fresh.load_data())]
+    benchmarks += [(f"pipeline:{step.lstrip('_')}", from_snapshot(step),
+                    lambda fresh, step=step: getattr(fresh, step)()) for step in PIPELINE_STEPS]
+    benchmarks += [
+        ("store:write_csv", lambda: cleaned,
+         lambda df: write_processed_data(df, config["output_file_path"], file_format="csv")),
+        ("store:write_parquet", lambda: cleaned,
+         lambda df: write_processed_data(df, config["parquet_output_path"], file_format="parquet",
+                                         partition_cols=config.get("partition_columns"))),
+        ("store:write_arrow", lambda: cleaned,
+         lambda df: write_processed_data(df, config["arrow_output_path"], file_format="arrow")),
+        ("store:build_metrics_cube", lambda: cleaned, build_metrics_cube),
+        ("store:read_csv", lambda: config["output_file_path"], read_processed_data),
+        ("store:read_parquet", lambda: config["parquet_output_path"], read_processed_data),
+        ("store:read_arrow", lambda: config["arrow_output_path"], read_processed_data),
+    ]
+    return benchmarks
+
+
+def metrics_benchmarks(cleaned_path: Path, locations: List[Tuple[str, Optional[str]]]) -> List[Benchmark]:
+    """Carga por localidade (cache frio), índice de datas e cada método do MetricsCalculator."""
+    def cold_load() -> None:
+        DATASET_CACHE.clear()
+
+    benchmarks: List[Benchmark] = []
+    for location, city in locations:
+        label = f"{city}, {location}" if city else location
+        benchmarks.append((f"metrics[{label}]:load", cold_load,
+                           lambda _, location=location, city=city: MetricsCalculator(cleaned_path, location, city)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            calculator = MetricsCalculator(cleaned_path, location, city)
+
+        def reset_index(calculator=calculator) -> MetricsCalculator:
+            calculator._date_index = None
+            return calculator
+
+        benchmarks.append((f"metrics[{label}]:date_index", reset_index, lambda calc: calc.date_index))
+        benchmarks += [(f"metrics[{label}]:{method}", lambda calculator=calculator: calculator,
+                        lambda calc, method=method: getattr(calc, method)()) for method in METRIC_METHODS]
+    return benchmarks
+
+
+def artifact_benchmarks(cleaned_path: Path, output_dir: Path) -> List[Benchmark]:
+    """Gráficos diário e mensal (sempre renderizados) e o PDF com texto e gráficos."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        plot_data = MetricsCalculator(cleaned_path).compute_all()["plot_data"]
+    plotter = PlotGenerator(skip_unchanged=False)
+    plot_paths = {"daily_cases_plot": str(output_dir / "daily.png"), "monthly_cases_plot": str(output_dir / "monthly.png")}
+    report_text = "\n\n".join(f"Seção {i + 1}. " + "Análise das métricas de SRAG na localidade. " * 20 for i in range(8))
+    return [
+        ("plots:daily", lambda: plot_data["casos_diarios"],
+         lambda series: plotter.render("daily", series, plot_paths["daily_cases_plot"])),
+        ("plots:monthly", lambda: plot_data["casos_mensais"],
+         lambda series: plotter.render("monthly", series, plot_paths["monthly_cases_plot"])),
+        ("pdf:create_report_pdf", lambda: plot_paths,
+         lambda paths: PDFGeneratorTool().create_report_pdf(report_text, paths, str(output_dir / "relatorio.pdf"))),
+    ]
+
+
+def run_suite(raw_path: Path, work_dir: Path, repeat: int, only: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    config = {
+        **DATA_PROCESSING_CONFIG, "file_path": raw_path,
+        "output_file_path": work_dir / "OpenSUS_limpo.csv",
+        "parquet_output_path": work_dir / "OpenSUS_limpo_parquet",
+        "arrow_output_path": work_dir / "OpenSUS_limpo.arrow",
+    }
+    benchmarks = pipeline_benchmarks(config)
+    cleaned_path = config["output_file_path"]
+    benchmarks += metrics_benchmarks(cleaned_path, [("Brasil", None), ("SP", None), ("SP", "Presidente Prudente")])
+    benchmarks += artifact_benchmarks(cleaned_path, work_dir)
+
+    results = {}
+    for name, setup, run in benchmarks:
+        if only and only not in name:
+            continue
+        results[name] = measure(setup, run, repeat)
+        print(f"{name:<58} {results[name]['seconds'] * 1000:>11.2f}ms {results[name]['peak_mb']:>10.1f}MB")
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], max_regression: Optional[float]) -> List[str]:
+    """Imprime a razão atual/linha de base e retorna as etapas acima do limite de regressão."""
+    regressions = []
+    print(f"\n{'etapa':<58} {'tempo':>8} {'memória':>8}")
+    for name, current in results.items():
+        reference = baseline["results"].get(name)
+        if not reference:
+            continue
+        time_ratio = current["seconds"] / reference["seconds"] if reference["seconds"] else float("inf")
+        memory_ratio = current["peak_mb"] / reference["peak_mb"] if reference["peak_mb"] else 1.0
+        flag = ""
+        if max_regression is not None and time_ratio > 1 + max_regression:
+            regressions.append(name)
+            flag = "  REGRESSÃO"
+        print(f"{name:<58} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--raw", default=None, help="CSV bruto já existente (em vez de gerar um sintético).")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default=None, help="Executa apenas as etapas cujo nome contém este texto.")
+    parser.add_argument("--output", default=None, help="Grava os resultados desta execução em JSON.")
+    parser.add_argument("--save-baseline", default=None, help="Salva os resultados como linha de base com este nome.")
+    parser.add_argument("--compare", default=None, help="Compara com a linha de base salva com este nome.")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Fração de aumento de tempo tolerada na comparação (ex.: 0.25); acima dela o comando falha.")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="srag_bench_"))
+    try:
+        raw_path = Path(args.raw) if args.raw else work_dir / "OpenSUS_sintetico.csv"
+        if not args.raw:
+            start = time.perf_counter()
+            write_synthetic_csv(raw_path, args.rows, seed=args.seed)
+            print(f"Dados sintéticos: {args.rows} registros (semente {args.seed}) em {time.perf_counter() - start:.1f}s\n")
+        print(f"{'etapa':<58} {'tempo':>13} {'pico':>12}")
+        results = run_suite(raw_path, work_dir, args.repeat, args.only)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "gerado_em": datetime.now().isoformat(timespec="seconds"), "rows": args.rows if not args.raw else None,
+            "raw": args.raw, "seed": args.seed, "repeat": args.repeat, "python": platform.python_version(),
+            "pandas": pd.__version__, "platform": platform.platform(), "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    for path in [args.output, BASELINE_DIR / f"{args.save_baseline}.json" if args.save_baseline else None]:
+        if path:
+            os.makedirs(Path(path).parent, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as handle:
+                json.dump(report, handle, ensure_ascii=False, indent=2)
+            print(f"\nResultados salvos em: {path}")
+
+    if args.compare:
+        with open(BASELINE_DIR / f"{args.compare}.json", encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if baseline["meta"].get("rows") != report["meta"]["rows"]:
+            print(f"AVISO: linha de base com {baseline['meta'].get('rows')} registros; esta execução usa {report['meta']['rows']}.")
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} etapa(s) acima do limite de regressão: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
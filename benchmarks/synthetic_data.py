@@ -0,0 +1,191 @@
+"""
+Gerador de dados sintéticos no formato do OpenDataSUS (SRAG).
+
+Produz um CSV bruto com as colunas de DATA_PROCESSING_CONFIG["relevant_features"]
+(mesmo separador, codificação e formato de datas do arquivo original), com
+distribuições realistas: UFs ponderadas pela população, sazonalidade no inverno,
+idades em dias/meses/anos, internação, UTI, ventilação e óbito dependentes da
+idade, e cerca de 5% de campos em branco. A mesma semente gera sempre o mesmo
+arquivo; os registros são escritos em blocos, então a escala vai de dezenas de
+milhares a dezenas de milhões de linhas com memória constante.
+
+Uso: python -m benchmarks.synthetic_data --rows 1000000 --output data/raw/OpenSUS_sintetico.csv
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+from src.config import DATA_PROCESSING_CONFIG
+from src.dataset_index import epi_weeks
+
+# UF: (peso ~ população em milhões, municípios; o primeiro é a capital)
+UF_MUNICIPALITIES = {
+    "AC": (0.9, ["RIO BRANCO", "CRUZEIRO DO SUL"]), "AL": (3.1, ["MACEIO", "ARAPIRACA"]),
+    "AP": (0.7, ["MACAPA", "SANTANA"]), "AM": (3.9, ["MANAUS", "PARINTINS"]),
+    "BA": (14.1, ["SALVADOR", "FEIRA DE SANTANA", "VITORIA DA CONQUISTA"]),
+    "CE": (8.8, ["FORTALEZA", "CAUCAIA", "JUAZEIRO DO NORTE"]), "DF": (2.8, ["BRASILIA"]),
+    "ES": (3.8, ["VITORIA", "VILA VELHA", "SERRA"]), "GO": (7.1, ["GOIANIA", "APARECIDA DE GOIANIA", "ANAPOLIS"]),
+    "MA": (6.8, ["SAO LUIS", "IMPERATRIZ"]), "MT": (3.7, ["CUIABA", "VARZEA GRANDE"]),
+    "MS": (2.8, ["CAMPO GRANDE", "DOURADOS"]), "MG": (20.5, ["BELO HORIZONTE", "UBERLANDIA", "CONTAGEM", "JUIZ DE FORA"]),
+    "PA": (8.1, ["BELEM", "ANANINDEUA", "SANTAREM"]), "PB": (4.0, ["JOAO PESSOA", "CAMPINA GRANDE"]),
+    "PR": (11.4, ["CURITIBA", "LONDRINA", "MARINGA"]), "PE": (9.1, ["RECIFE", "JABOATAO DOS GUARARAPES", "CARUARU"]),
+    "PI": (3.3, ["TERESINA", "PARNAIBA"]), "RJ": (16.1, ["RIO DE JANEIRO", "SAO GONCALO", "NITEROI", "DUQUE DE CAXIAS"]),
+    "RN": (3.3, ["NATAL", "MOSSORO"]), "RS": (10.9, ["PORTO ALEGRE", "CAXIAS DO SUL", "PELOTAS"]),
+    "RO": (1.6, ["PORTO VELHO", "JI-PARANA"]), "RR": (0.6, ["BOA VISTA"]),
+    "SC": (7.6, ["FLORIANOPOLIS", "JOINVILLE", "BLUMENAU"]),
+    "SP": (44.4, ["SAO PAULO", "CAMPINAS", "GUARULHOS", "PRESIDENTE PRUDENTE", "RIBEIRAO PRETO"]),
+    "SE": (2.2, ["ARACAJU", "NOSSA SENHORA DO SOCORRO"]), "TO": (1.5, ["PALMAS", "ARAGUAINA"]),
+}
+
+# Códigos do dicionário de dados do SIVEP-Gripe e suas frequências aproximadas
+SEX_CODES, SEX_P = ["M", "F", "I"], [0.52, 0.475, 0.005]
+RACE_CODES, RACE_P = [1, 2, 3, 4, 5, 9], [0.40, 0.06, 0.01, 0.35, 0.005, 0.175]
+CLASSIFICATION_CODES, CLASSIFICATION_P = [1, 2, 3, 4, 5], [0.08, 0.17, 0.01, 0.50, 0.24]
+SYMPTOM_P = {"FEBRE": 0.62, "TOSSE": 0.75, "DISPNEIA": 0.72, "DESC_RESP": 0.60, "SATURACAO": 0.58}
+COMORBIDITY_P = {"FATOR_RISC": 0.55, "CARDIOPATI": 0.30, "DIABETES": 0.20, "OBESIDADE": 0.07}
+BLANK_RATE = 0.05
+
+
+def _yes_no_ignored(rng: np.random.Generator, p_yes, rows: int, p_ignored: float = 0.08) -> np.ndarray:
+    """Códigos 1 (sim) / 2 (não) / 9 (ignorado), com `p_yes` escalar ou por registro."""
+    draw = rng.random(rows)
+    codes = np.where(draw < p_yes * (1 - p_ignored), 1, 2)
+    codes[rng.random(rows) < p_ignored] = 9
+    return codes
+
+
+def _blank(rng: np.random.Generator, values: np.ndarray, rate: float = BLANK_RATE) -> pd.Series:
+    """Torna vazios (NaN) cerca de `rate` dos valores, como os campos não preenchidos da notificação."""
+    series = pd.Series(values, dtype="object" if values.dtype.kind in "OUS" else "float64")
+    return series.mask(rng.random(len(values)) < rate)
+
+
+def _days(values: np.ndarray) -> np.ndarray:
+    return np.asarray(values).astype(np.int64).astype("timedelta64[D]")
+
+
+def _date_strings(dates: np.ndarray) -> np.ndarray:
+    return np.datetime_as_string(dates.astype("datetime64[D]"), unit="D").astype(object)
+
+
+def generate_raw_chunk(rng: np.random.Generator, rows: int, start: str = "2023-01-01",
+                       days: int = 730) -> pd.DataFrame:
+    """Gera `rows` notificações de SRAG entre `start` e `start + days`, no layout do arquivo bruto."""
+    # Notificações com pico no inverno (maio a julho)
+    day_offsets = np.arange(days)
+    first_day = (np.datetime64(start, "D") - np.datetime64(start[:4] + "-01-01", "D")).astype(np.int64)
+    day_of_year = (first_day + day_offsets) % 365
+    seasonal = 1 + 0.8 * np.cos(2 * np.pi * (day_of_year - 170) / 365)
+    notified = np.datetime64(start, "D") + rng.choice(day_offsets, rows, p=seasonal / seasonal.sum())
+    symptoms = notified - _days(np.minimum(rng.gamma(2.0, 2.5, rows), 60))
+
+    weights = np.array([weight for weight, _ in UF_MUNICIPALITIES.values()])
+    ufs = np.array(list(UF_MUNICIPALITIES))[rng.choice(len(weights), rows, p=weights / weights.sum())]
+    municipalities = np.empty(rows, dtype=object)
+    for uf, (_, cities) in UF_MUNICIPALITIES.items():
+        in_uf = ufs == uf
+        # A capital concentra cerca de metade das notificações da UF
+        city_p = np.array([0.5] + [0.5 / (len(cities) - 1)] * (len(cities) - 1)) if len(cities) > 1 else [1.0]
+        municipalities[in_uf] = np.array(cities, dtype=object)[rng.choice(len(cities), in_uf.sum(), p=city_p)]
+
+    # Idade: bebês (dias/meses), crianças e adultos, com concentração em idosos
+    age_years = np.clip(np.where(rng.random(rows) < 0.25, rng.exponential(3, rows), rng.normal(62, 20, rows)), 0, 105)
+    age_type = np.where(age_years < 1 / 12, 1, np.where(age_years < 2, 2, 3))
+    age_value = np.where(age_type == 1, age_years * 365.25, np.where(age_type == 2, age_years * 12, age_years)).astype(int)
+    birth = notified - _days(age_years * 365.25)
+    sex = rng.choice(SEX_CODES, rows, p=SEX_P)
+    pregnant = np.where((sex == "F") & (age_years >= 15) & (age_years < 50),
+                        rng.choice([1, 2, 3, 4, 5, 9], rows, p=[0.01, 0.015, 0.02, 0.005, 0.9, 0.05]),
+                        np.where(age_years < 10, 6, rng.choice([5, 6, 9], rows, p=[0.2, 0.75, 0.05])))
+
+    elderly = np.clip((age_years - 40) / 50, 0, 1)
+    hospital = _yes_no_ignored(rng, 0.92, rows, p_ignored=0.02)
+    icu = np.where(hospital == 1, _yes_no_ignored(rng, 0.25 + 0.15 * elderly, rows), rng.choice([2, 9], rows, p=[0.7, 0.3]))
+    ventilation = np.where(icu == 1, rng.choice([1, 2, 3, 9], rows, p=[0.35, 0.45, 0.15, 0.05]),
+                           rng.choice([1, 2, 3, 9], rows, p=[0.03, 0.40, 0.47, 0.10]))
+    death_p = np.clip(0.04 + 0.25 * elderly + 0.30 * (icu == 1) + 0.25 * (ventilation == 1), 0, 0.9)
+    outcome = np.where(rng.random(rows) < 0.06, 9, np.where(rng.random(rows) < death_p, 2, 1))
+    covid_vaccine = _yes_no_ignored(rng, 0.35 + 0.45 * elderly, rows, p_ignored=0.15)
+    flu_vaccine = _yes_no_ignored(rng, 0.20 + 0.40 * elderly, rows, p_ignored=0.20)
+
+    hospitalized_at = notified - _days(rng.integers(0, 3, rows))
+    icu_at = hospitalized_at + _days(rng.integers(0, 4, rows))
+    outcome_at = notified + _days(np.minimum(rng.gamma(2.0, 5.0, rows), 120))
+    _, weeks = epi_weeks(notified)
+
+    columns = {
+        "DT_NOTIFIC": pd.Series(_date_strings(notified)),
+        "DT_SIN_PRI": _blank(rng, _date_strings(symptoms), 0.01),
+        "SEM_NOT": pd.Series(weeks),
+        "SG_UF_NOT": pd.Series(ufs),
+        "ID_MUNICIP": pd.Series(municipalities),
+        "CS_SEXO": pd.Series(sex),
+        "DT_NASC": _blank(rng, _date_strings(birth), 0.03),
+        "NU_IDADE_N": _blank(rng, age_value, 0.01),
+        "CS_RACA": _blank(rng, rng.choice(RACE_CODES, rows, p=RACE_P)),
+        "CS_GESTANT": _blank(rng, pregnant),
+    }
+    columns.update({name: _blank(rng, _yes_no_ignored(rng, p, rows)) for name, p in SYMPTOM_P.items()})
+    columns.update({name: _blank(rng, _yes_no_ignored(rng, p * (0.5 + elderly), rows)) for name, p in COMORBIDITY_P.items()})
+    columns.update({
+        "HOSPITAL": _blank(rng, hospital, 0.02),
+        "DT_INTERNA": pd.Series(np.where(hospital == 1, _date_strings(hospitalized_at), None)),
+        "UTI": _blank(rng, icu),
+        "DT_ENTUTI": pd.Series(np.where(icu == 1, _date_strings(icu_at), None)),
+        "SUPORT_VEN": _blank(rng, ventilation),
+        "CLASSI_FIN": _blank(rng, rng.choice(CLASSIFICATION_CODES, rows, p=CLASSIFICATION_P), 0.10),
+        "PCR_SARS2": pd.Series(np.where(rng.random(rows) < 0.15, 1.0, np.nan)),
+        "EVOLUCAO": _blank(rng, outcome, 0.08),
+        "DT_EVOLUCA": pd.Series(np.where(outcome != 9, _date_strings(outcome_at), None)),
+        "VACINA_COV": _blank(rng, covid_vaccine, 0.10),
+        "TP_IDADE": _blank(rng, age_type, 0.01),
+        "VACINA": _blank(rng, flu_vaccine, 0.10),
+    })
+    relevant = DATA_PROCESSING_CONFIG["relevant_features"]
+    # Inteiros com NaN viram float na geração; no CSV devem aparecer como no original ("1", não "1.0")
+    frame = pd.DataFrame({name: columns[name] for name in relevant})
+    return frame.astype({name: "Int64" for name in relevant if frame[name].dtype.kind == "f"})
+
+
+def iter_raw_chunks(rows: int, seed: int = 42, chunk_rows: int = 1_000_000, start: str = "2023-01-01",
+                    days: int = 730) -> Iterator[pd.DataFrame]:
+    """Blocos do arquivo sintético; cada bloco usa um gerador derivado da semente, em ordem."""
+    children = np.random.SeedSequence(seed).spawn((rows + chunk_rows - 1) // chunk_rows)
+    for position, child in enumerate(children):
+        size = min(chunk_rows, rows - position * chunk_rows)
+        yield generate_raw_chunk(np.random.default_rng(child), size, start=start, days=days)
+
+
+def write_synthetic_csv(output_path: Path, rows: int, seed: int = 42, chunk_rows: int = 1_000_000,
+                        start: str = "2023-01-01", days: int = 730) -> Path:
+    """Grava o CSV bruto sintético (separador ';', ISO-8859-1), bloco a bloco."""
+    output_path = Path(output_path)
+    os.makedirs(output_path.parent, exist_ok=True)
+    separator = DATA_PROCESSING_CONFIG.get("separator", ";")
+    for position, chunk in enumerate(iter_raw_chunks(rows, seed, chunk_rows, start, days)):
+        chunk.to_csv(output_path, sep=separator, index=False, encoding="ISO-8859-1",
+                     mode="w" if position == 0 else "a", header=position == 0)
+    return output_path
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--start", default="2023-01-01", help="Primeira data de notificação.")
+    parser.add_argument("--days", type=int, default=730, help="Dias cobertos pelas notificações.")
+    parser.add_argument("--output", default=str(Path("data") / "raw" / "OpenSUS_sintetico.csv"))
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    path = write_synthetic_csv(Path(args.output), args.rows, seed=args.seed, chunk_rows=args.chunk_rows,
+                               start=args.start, days=args.days)
+    print(f"{args.rows} registros sintéticos gravados em {path} em {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,11 +26,79 @@
 # if __name__ == "__main__":
 #     main()
 
+import argparse
 from src.data_processor import SragDataProcessor
+from src.incremental_ingest import IncrementalIngestor
 from src.config import DATA_PROCESSING_CONFIG
 
 if __name__ == "__main__":
-    processor = SragDataProcessor(config=DATA_PROCESSING_CONFIG)
-    processor.run_pipeline()
-    processor.save_processed_data()
-    print("\nArquivo 'OpenSUS_limpo.csv' foi atualizado com sucesso com as novas colunas!")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pipeline de preparação dos dados de SRAG.")
+    parser.add_argument("--format", choices=["csv", "parquet", "arrow"], default=DATA_PROCESSING_CONFIG.get("output_format", "csv"),
+                        help="Formato de saída dos dados limpos.")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Processa o arquivo bruto em blocos, com uso de memória limitado.")
+    parser.add_argument("--chunk-size", type=int, default=DATA_PROCESSING_CONFIG.get("chunk_size"),
+                        help="Número de registros por bloco no modo --streaming.")
+    parser.add_argument("--workers", type=int, default=DATA_PROCESSING_CONFIG.get("n_workers", 1),
+                        help="Processos usados na limpeza dos dados (1 = serial).")
+    parser.add_argument("--cube", action="store_true",
+                        help="Também gera o cubo de métricas pré-agregadas.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Ingere apenas os grupos (UF, ano, semana) novos ou alterados desde a última execução.")
+    parser.add_argument("--raw", default=None,
+                        help="Arquivo bruto (extração semanal) a ingerir; padrão: o arquivo da configuração.")
+    parser.add_argument("--reports", action="store_true",
+                        help="Gera em lote os relatórios do Brasil, de todas as UFs e dos municípios em --cities.")
+    parser.add_argument("--cities", nargs="*", default=[],
+                        help="Municípios adicionais do lote, no formato 'Cidade, UF'.")
+    parser.add_argument("--report-workers", type=int, default=None,
+                        help="Processos para gráficos e PDFs no modo --reports (padrão: número de CPUs).")
+    parser.add_argument("--network-concurrency", type=int, default=None,
+                        help="Localidades buscando notícias/consultando o LLM ao mesmo tempo no modo --reports.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mede tempo e memória de cada etapa e de cada conversão de coluna e grava um relatório JSON.")
+    parser.add_argument("--profile-output", default=str(DATA_PROCESSING_CONFIG["profile_output_path"]),
+                        help="Arquivo do relatório do modo --profile.")
+    parser.add_argument("--profile-no-memory", action="store_true",
+                        help="No modo --profile, mede apenas tempos (sem a segunda passagem com tracemalloc).")
+    parser.add_argument("--profile-compare", default=None,
+                        help="Relatório de perfil anterior para comparar com esta execução (modo --profile).")
+    parser.add_argument("--no-report-cache", action="store_true",
+                        help="No modo --reports, gera todos os relatórios mesmo que estejam no cache.")
+    args = parser.parse_args()
+
+    if args.reports:
+        from src.batch_reports import run_batch_reports
+        summaries = run_batch_reports(municipalities=args.cities, process_workers=args.report_workers,
+                                      network_concurrency=args.network_concurrency,
+                                      use_cache=not args.no_report_cache)
+        failed = [summary for summary in summaries if summary["status"] == "erro"]
+        raise SystemExit(1 if failed else 0)
+
+    if args.incremental:
+        ingestor = IncrementalIngestor({**DATA_PROCESSING_CONFIG, "output_format": args.format})
+        summary = ingestor.ingest(args.raw)
+        print(f"\nIngestão incremental concluída: {summary['grupos_alterados']} grupo(s), "
+              f"{summary['linhas_processadas']} registro(s) processados.")
+        raise SystemExit(0)
+
+    processing_config = {**DATA_PROCESSING_CONFIG, "file_path": args.raw or DATA_PROCESSING_CONFIG["file_path"]}
+    if args.profile:
+        from src.pipeline_profiler import profile_pipeline
+        profile_pipeline(processing_config, file_format=args.format, output_path=args.profile_output,
+                         n_workers=args.workers, streaming=args.streaming, chunk_size=args.chunk_size,
+                         build_cube=args.cube, measure_memory=not args.profile_no_memory,
+                         baseline_path=args.profile_compare)
+        raise SystemExit(0)
+
+    processor = SragDataProcessor(config=processing_config)
+    if args.streaming:
+        processor.run_streaming_pipeline(chunk_size=args.chunk_size, file_format=args.format, build_cube=args.cube)
+    else:
+        processor.run_pipeline(n_workers=args.workers)
+        processor.save_processed_data(file_format=args.format)
+        if args.cube:
+            processor.build_metrics_cube()
+    if args.cube:
+        processor.save_metrics_cube()
+    print(f"\nDados limpos ({args.format}) atualizados com sucesso com as novas colunas!")
\ No newline at end of file
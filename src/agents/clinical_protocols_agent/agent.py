@@ -1,6 +1,11 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List
 from .prompts import clinical_agent_prompt
 from .tools import clinical_protocol_search_tool
-from src.llm_provider import invoke_llm_with_fallback
+from src.llm_provider import ainvoke_llm_with_fallback, invoke_llm_with_fallback
 
 def create_clinical_protocol_agent():
     """
@@ -14,4 +19,85 @@ def create_clinical_protocol_agent():
         )
     return agent_logic
 
-clinical_protocol_agent = create_clinical_protocol_agent()
\ No newline at end of file
+clinical_protocol_agent = create_clinical_protocol_agent()
+
+async def aclinical_protocol_agent(input_dict):
+    """Versão assíncrona do sub-agente: busca e resumo sem bloquear o event loop."""
+    tool_result = await clinical_protocol_search_tool.ainvoke(input_dict["disease"])
+    return await ainvoke_llm_with_fallback(
+        prompt_template=clinical_agent_prompt,
+        input_dict={"context": tool_result, "disease": input_dict["disease"]}
+    )
+
+def lookup_protocols(diseases: List[str], max_concurrency: int = 4, timeout: float = 60.0) -> Dict[str, str]:
+    """
+    Consulta o sub-agente para cada doença em paralelo, com no máximo `max_concurrency`
+    chamadas simultâneas. O nó inteiro tem `timeout` segundos a partir da submissão:
+    doenças que falham ou não terminam nesse prazo (inclusive as que ainda aguardam
+    na fila) são omitidas e as demais são retornadas.
+    """
+    diseases = list(dict.fromkeys(diseases))
+    if not diseases:
+        return {}
+
+    def run(disease: str) -> str:
+        print(f"Invocando sub-agente para '{disease}'")
+        return clinical_protocol_agent({"disease": disease})
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(diseases))),
+                                  thread_name_prefix="protocolos")
+    # Cada consulta herda o contexto do nó (trecho atual do trace da execução)
+    futures = {executor.submit(contextvars.copy_context().run, run, disease): disease for disease in diseases}
+    deadline = time.monotonic() + timeout
+    summaries = {}
+    pending = set(futures)
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                for future in (future for future in futures if future in pending):
+                    print(f"AVISO: consulta de protocolos para '{futures[future]}' excedeu {timeout}s e foi ignorada.")
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                disease = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    print(f"AVISO: consulta de protocolos para '{disease}' falhou. Erro: {e}")
+                    continue
+                if summary:
+                    summaries[disease] = summary
+    finally:
+        # Chamadas em andamento não podem ser interrompidas; as da fila são canceladas e o nó não espera
+        executor.shutdown(wait=False, cancel_futures=True)
+    return {disease: summaries[disease] for disease in diseases if disease in summaries}
+
+async def alookup_protocols(diseases: List[str], max_concurrency: int = 4, timeout: float = 60.0) -> Dict[str, str]:
+    """Versão assíncrona de lookup_protocols: as mesmas regras de concorrência, prazo e falhas."""
+    diseases = list(dict.fromkeys(diseases))
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def limited(disease: str) -> str:
+        async with semaphore:
+            print(f"Invocando sub-agente para '{disease}'")
+            return await aclinical_protocol_agent({"disease": disease})
+
+    async def run(disease: str) -> str:
+        # O prazo conta a partir da submissão, incluindo a espera pelo semáforo
+        try:
+            return await asyncio.wait_for(limited(disease), timeout)
+        except asyncio.TimeoutError:
+            print(f"AVISO: consulta de protocolos para '{disease}' excedeu {timeout}s e foi ignorada.")
+        except asyncio.CancelledError as e:
+            # Só o cancelamento deste nó se propaga; o que vem de outra tarefa (ex.: uma busca
+            # compartilhada cancelada) é uma falha desta doença, como no caminho síncrono
+            if asyncio.current_task().cancelling():
+                raise
+            print(f"AVISO: consulta de protocolos para '{disease}' falhou. Erro: {e!r}")
+        except Exception as e:
+            print(f"AVISO: consulta de protocolos para '{disease}' falhou. Erro: {e}")
+        return None
+
+    results = await asyncio.gather(*(run(disease) for disease in diseases))
+    return {disease: summary for disease, summary in zip(diseases, results) if summary}
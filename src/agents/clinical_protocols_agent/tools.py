@@ -1,17 +1,27 @@
-from langchain.tools import tool
-from langchain_tavily import TavilySearch
+from langchain.tools import StructuredTool
+from src.tools.search_cache import SEARCH_CACHE
+from src.instrumentation import traced
 
-@tool
-def clinical_protocol_search_tool(disease_name: str) -> str:
+def _protocol_query(disease_name: str) -> str:
+    print(f"Ferramenta do Sub-Agente: Buscando protocolos para '{disease_name}'")
+    
+    # Guardrail na query é para garantir a qualidade das fontes
+    return f"protocolo de tratamento ou manejo clínico para '{disease_name}' site:gov.br/saude OR site:msdmanuals.com/pt-br OR site:scielo.br"
+
+@traced("clinical_protocol_search")
+def clinical_protocol_search(disease_name: str) -> str:
     """
     Busca informações sobre tratamentos e protocolos clínicos para uma doença respiratória específica
     em fontes médicas confiáveis, como o Ministério da Saúde do Brasil e manuais médicos.
     A entrada deve ser o nome da doença (ex: 'Influenza A').
     """
-    print(f"Ferramenta do Sub-Agente: Buscando protocolos para '{disease_name}'")
-    
-    # Guardrail na query é para garantir a qualidade das fontes
-    query = f"protocolo de tratamento ou manejo clínico para '{disease_name}' site:gov.br/saude OR site:msdmanuals.com/pt-br OR site:scielo.br"
-    tavily_search = TavilySearch(max_results=3)
-    results = tavily_search.invoke(query)
-    return results
\ No newline at end of file
+    results = SEARCH_CACHE.search(_protocol_query(disease_name), max_results=3)
+    return results
+
+@traced("clinical_protocol_search")
+async def aclinical_protocol_search(disease_name: str) -> str:
+    """Versão assíncrona de clinical_protocol_search."""
+    return await SEARCH_CACHE.asearch(_protocol_query(disease_name), max_results=3)
+
+clinical_protocol_search_tool = StructuredTool.from_function(
+    func=clinical_protocol_search, coroutine=aclinical_protocol_search, name="clinical_protocol_search_tool")
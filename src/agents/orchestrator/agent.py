@@ -1,20 +1,29 @@
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import Annotated, Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, TypedDict
 from dotenv import load_dotenv
-from langgraph.graph import StateGraph, END
-from pathlib import Path
-import os
-from datetime import datetime
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, START, END
+from langchain_core.runnables import RunnableLambda
+import asyncio
+import time
 from src.metrics_calculator import MetricsCalculator
 from src.tools.news_fetcher import news_search_tool
-from src.plot_generator import PlotGenerator
-from src.config import DATA_PROCESSING_CONFIG
-from src.agents.clinical_protocols_agent.agent import clinical_protocol_agent
-from src.agents.pdf_generator_agent.tools import PDFGeneratorTool
+from src.plot_generator import render_location_plots
+from src.config import AGENT_CONFIG, DATA_PROCESSING_CONFIG
+from src.data_store import get_processed_data_path
+from src.report_cache import REPORT_CACHE
+from src.instrumentation import span, trace_run
+from src.agents.clinical_protocols_agent.agent import alookup_protocols, lookup_protocols
+from src.agents.pdf_generator_agent.tools import render_report_pdf
 from .prompts import final_report_prompt, disease_extraction_prompt
-from src.llm_provider import invoke_llm_with_fallback
+from src.llm_provider import (ainvoke_llm_with_fallback, astream_llm_with_fallback, invoke_llm_with_fallback,
+                              stream_llm_with_fallback)
 
 load_dotenv()
 
+def merge_timings(left: Optional[Dict[str, float]], right: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """Combina os tempos por nó vindos de ramos executados em paralelo."""
+    return {**(left or {}), **(right or {})}
+
 class ReportState(TypedDict):
     topic: str
     city: Optional[str]
@@ -25,80 +34,132 @@ class ReportState(TypedDict):
     plot_image_paths: Dict[str, str]
     report_text: str
     pdf_report_path: str
+    node_timings: Annotated[Dict[str, float], merge_timings]
+
+class MetricsBranchOutput(TypedDict):
+    metrics: Dict[str, Any]
+    plot_data: Dict[str, Any]
+    plot_image_paths: Dict[str, str]
+    node_timings: Annotated[Dict[str, float], merge_timings]
+
+class NewsBranchOutput(TypedDict):
+    news: List[Dict[str, Any]]
+    clinical_protocols: Dict[str, str]
+    node_timings: Annotated[Dict[str, float], merge_timings]
+
+def timed_node(name: str, node: Callable[[ReportState], Dict[str, Any]],
+               anode: Optional[Callable[[ReportState], Any]] = None) -> RunnableLambda:
+    """
+    Envolve um nó do grafo registrando sua duração em `node_timings` e um trecho "node"
+    no trace da execução (src/instrumentation.py). O nó resultante atende tanto `invoke`
+    (versão síncrona) quanto `ainvoke` (versão assíncrona `anode`; sem ela, a versão
+    síncrona roda em uma thread para não bloquear o event loop).
+    """
+    def timed_update(update: Dict[str, Any], start: float) -> Dict[str, Any]:
+        elapsed = round(time.perf_counter() - start, 4)
+        print(f"   - Tempo do nó '{name}': {elapsed:.2f}s")
+        return {**update, "node_timings": {name: elapsed}}
+
+    def traced(state: ReportState) -> Dict[str, Any]:
+        with span(name, kind="node"):
+            return node(state)
+
+    def wrapper(state: ReportState) -> Dict[str, Any]:
+        get_stream_writer()({"event": "node_start", "node": name})
+        start = time.perf_counter()
+        return timed_update(traced(state), start)
+
+    async def awrapper(state: ReportState) -> Dict[str, Any]:
+        get_stream_writer()({"event": "node_start", "node": name})
+        start = time.perf_counter()
+        if anode:
+            with span(name, kind="node"):
+                update = await anode(state)
+        else:
+            update = await asyncio.to_thread(traced, state)
+        return timed_update(update, start)
+
+    return RunnableLambda(wrapper, afunc=awrapper, name=name)
 
 def calculate_metrics_node(state: ReportState) -> Dict[str, Any]:
     print("Nó (Orquestrador): Calcular Métricas")
     topic = state.get("topic", "Brasil")
     city = state.get("city")
+    use_cube = DATA_PROCESSING_CONFIG.get("metrics_source") == "cube"
     calculator = MetricsCalculator(
-        cleaned_data_path=DATA_PROCESSING_CONFIG['output_file_path'],
+        cleaned_data_path=get_processed_data_path(DATA_PROCESSING_CONFIG),
         location=topic,
-        city=city
+        city=city,
+        cube_path=DATA_PROCESSING_CONFIG["cube_output_path"] if use_cube else None
     )
-    metrics = {
-        "taxa_mortalidade": calculator.calculate_mortality_rate(), "taxa_uti": calculator.calculate_icu_rate(),
-        "taxa_vacinacao": calculator.calculate_vaccination_rate(), "taxa_aumento_casos": calculator.calculate_case_increase_rate(),
-        "tempo_medio_notificacao": calculator.calculate_avg_notification_time(),
-        "proporcao_casos": calculator.get_case_proportions(),
-        "letalidade_por_idade": calculator.get_lethality_by_age_group(),
-        "taxa_ventilacao_invasiva": calculator.calculate_invasive_ventilation_rate()
-    }
-    plot_data = { "casos_diarios": calculator.get_daily_cases(), "casos_mensais": calculator.get_monthly_cases() }
+    results = calculator.compute_all()
+    metrics, plot_data = results["metrics"], results["plot_data"]
     print("Concluído.")
     return {"metrics": metrics, "plot_data": plot_data}
 
 def generate_plots_node(state: ReportState) -> Dict[str, Any]:
     print("Nó (Orquestrador): Gerar Gráficos")
-    topic = (state.get("topic") or "Brasil").strip().upper().replace(" ", "_")
-    city = (state.get("city") or "").strip().upper().replace(" ", "_")
-    plot_identifier = f"{topic}_{city}" if city else topic
-    plot_data = state.get("plot_data", {})
-    daily_data, monthly_data = plot_data.get("casos_diarios"), plot_data.get("casos_mensais")
-    plotter = PlotGenerator()
-    image_paths = {}
-    output_dir = Path("output")
-    os.makedirs(output_dir, exist_ok=True)
-    if daily_data is not None and not daily_data.empty:
-        safe_name = "".join(c for c in plot_identifier if c.isalnum() or c in ('_', '-')).rstrip()
-        path = plotter.generate_daily_cases_plot(daily_data, output_dir / f"daily_cases_{safe_name}.png")
-        image_paths["daily_cases_plot"] = str(path)
-    if monthly_data is not None and not monthly_data.empty:
-        safe_name = "".join(c for c in plot_identifier if c.isalnum() or c in ('_', '-')).rstrip()
-        path = plotter.generate_monthly_cases_plot(monthly_data, output_dir / f"monthly_cases_{safe_name}.png")
-        image_paths["monthly_cases_plot"] = str(path)
+    image_paths = render_location_plots(state.get("topic"), state.get("city"), state.get("plot_data", {}))
     print("   - Concluído.")
     return {"plot_image_paths": image_paths}
 
-def fetch_news_node(state: ReportState) -> Dict[str, Any]:
-    print("Nó (Orquestrador): Buscar Notícias")
+def _news_search_query(state: ReportState) -> str:
     topic = state.get("topic", "Brasil")
     city = state.get("city")
-    search_query = f"{city}, {topic}" if city and city.lower() != topic.lower() else topic
-    search_results = news_search_tool.invoke({"location": search_query})
+    return f"{city}, {topic}" if city and city.lower() != topic.lower() else topic
+
+def fetch_news_node(state: ReportState) -> Dict[str, Any]:
+    print("Nó (Orquestrador): Buscar Notícias")
+    search_results = news_search_tool.invoke({"location": _news_search_query(state)})
+    print("Concluído.")
+    return {"news": search_results}
+
+async def afetch_news_node(state: ReportState) -> Dict[str, Any]:
+    print("Nó (Orquestrador): Buscar Notícias")
+    search_results = await news_search_tool.ainvoke({"location": _news_search_query(state)})
     print("Concluído.")
     return {"news": search_results}
 
+def _parse_diseases(diseases_str: Optional[str]) -> List[str]:
+    diseases = [d.strip() for d in (diseases_str or "").split(',') if d.strip()]
+    print(f"Doenças identificadas nas notícias: {diseases}")
+    return diseases
+
+def _protocol_lookup_options() -> Dict[str, Any]:
+    return {"max_concurrency": AGENT_CONFIG.get("protocol_max_concurrency", 4),
+            "timeout": AGENT_CONFIG.get("protocol_timeout_seconds", 60)}
+
 def clinical_protocol_node(state: ReportState) -> Dict[str, str]:
     print("Nó (Orquestrador): Delegando para o Sub-Agente de Protocolos Clínicos")
     
     protocol_summaries = {}
     news_context = state.get("news", {}).get("results", [])
     if news_context:
-        diseases_str = invoke_llm_with_fallback(
+        diseases = _parse_diseases(invoke_llm_with_fallback(
             prompt_template=disease_extraction_prompt,
             input_dict={"news": news_context}
-        )
-        diseases = [d.strip() for d in diseases_str.split(',') if d.strip()]
-        print(f"Doenças identificadas nas notícias: {diseases}")
+        ))
         if diseases:
-            for disease in diseases:
-                print(f"Invocando sub-agente para '{disease}'")
-                summary_content = clinical_protocol_agent({"disease": disease})
-                protocol_summaries[disease] = summary_content      
+            protocol_summaries = lookup_protocols(diseases, **_protocol_lookup_options())
+            print(f"Protocolos obtidos para {len(protocol_summaries)} de {len(diseases)} doença(s).")
     return {"clinical_protocols": protocol_summaries}
 
-def generate_report_node(state: ReportState) -> Dict[str, Any]:
-    print("Nó (Orquestrador): Gerar Relatório Final")
+async def aclinical_protocol_node(state: ReportState) -> Dict[str, str]:
+    print("Nó (Orquestrador): Delegando para o Sub-Agente de Protocolos Clínicos")
+
+    protocol_summaries = {}
+    news_context = state.get("news", {}).get("results", [])
+    if news_context:
+        diseases = _parse_diseases(await ainvoke_llm_with_fallback(
+            prompt_template=disease_extraction_prompt,
+            input_dict={"news": news_context}
+        ))
+        if diseases:
+            protocol_summaries = await alookup_protocols(diseases, **_protocol_lookup_options())
+            print(f"Protocolos obtidos para {len(protocol_summaries)} de {len(diseases)} doença(s).")
+    return {"clinical_protocols": protocol_summaries}
+
+def _report_prompt_input(state: ReportState) -> Dict[str, Any]:
     metrics, news, protocols = state.get("metrics", {}), state.get("news", {}).get("results", []), state.get("clinical_protocols", {})
     topic, city = state.get("topic"), state.get("city")
     full_topic = f"{city}, {topic}" if city and city.lower() != topic.lower() else topic
@@ -116,40 +177,167 @@ def generate_report_node(state: ReportState) -> Dict[str, Any]:
         "metrics_invasive_ventilation": metrics.get("taxa_ventilacao_invasiva"),
         "news_context": news_context, "protocols_context": protocols_context
     }
-    
-    response_content = invoke_llm_with_fallback(
+    return prompt_input
+
+def _report_token_writer() -> Callable[[Optional[str]], None]:
+    """Publica os trechos do relatório como eventos do modo de stream "custom" do grafo."""
+    writer = get_stream_writer()
+    def on_token(text: Optional[str]) -> None:
+        writer({"event": "report_token", "text": text} if text is not None else {"event": "report_reset"})
+    return on_token
+
+def generate_report_node(state: ReportState) -> Dict[str, Any]:
+    print("Nó (Orquestrador): Gerar Relatório Final")
+    response_content = stream_llm_with_fallback(
         prompt_template=final_report_prompt,
-        input_dict=prompt_input
+        input_dict=_report_prompt_input(state),
+        on_token=_report_token_writer()
     )
     print("Relatório final gerado.")
     return {"report_text": response_content}
 
+async def agenerate_report_node(state: ReportState) -> Dict[str, Any]:
+    print("Nó (Orquestrador): Gerar Relatório Final")
+    response_content = await astream_llm_with_fallback(
+        prompt_template=final_report_prompt,
+        input_dict=_report_prompt_input(state),
+        on_token=_report_token_writer()
+    )
+    print("Relatório final gerado.")
+    return {"report_text": response_content}
+
+def research_report_text(state: ReportState) -> Dict[str, Any]:
+    """
+    Etapas de rede do relatório fora do grafo (notícias → protocolos → texto final),
+    sem streaming; usada pela geração em lote (src/batch_reports.py).
+    """
+    with span("fetch_news", kind="node"):
+        state = {**state, **fetch_news_node(state)}
+    with span("clinical_protocol_search", kind="node"):
+        state.update(clinical_protocol_node(state))
+    print("Nó (Orquestrador): Gerar Relatório Final")
+    with span("generate_report", kind="node"):
+        state["report_text"] = invoke_llm_with_fallback(prompt_template=final_report_prompt,
+                                                        input_dict=_report_prompt_input(state))
+    return {key: state[key] for key in ("news", "clinical_protocols", "report_text")}
+
 def generate_pdf_node(state: ReportState) -> Dict[str, str]:
     print("Nó (Orquestrador): Gerando Relatório em PDF")
-    report_text, plot_paths, topic = state.get("report_text"), state.get("plot_image_paths"), state.get("topic", "relatorio").strip()
-    city = (state.get("city") or "").strip()
-    full_topic = f"{city}_{topic}" if city else topic
-    pdf_tool = PDFGeneratorTool()
-    safe_topic_name = "".join(c for c in full_topic if c.isalnum() or c in ('_', '-')).rstrip()
-    output_path = f"output/relatorio_srag_{safe_topic_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    final_path = pdf_tool.create_report_pdf(report_text, plot_paths, output_path)
+    final_path = render_report_pdf(state.get("topic", "relatorio"), state.get("city"),
+                                   state.get("report_text"), state.get("plot_image_paths"))
     return {"pdf_report_path": final_path}
 
 
+def build_branch(nodes: List[tuple], output_schema: type):
+    """
+    Compila uma sequência de nós `(nome, nó síncrono, nó assíncrono ou None)` como
+    subgrafo, executado como um único ramo do orquestrador.
+    """
+    branch = StateGraph(ReportState, output_schema=output_schema)
+    for name, node, anode in nodes:
+        branch.add_node(name, timed_node(name, node, anode))
+    names = [name for name, _, _ in nodes]
+    branch.add_edge(START, names[0])
+    for previous, following in zip(names, names[1:]):
+        branch.add_edge(previous, following)
+    branch.add_edge(names[-1], END)
+    return branch.compile()
+
+
 print("Montando o Agente Orquestrador com LangGraph")
+# Métricas → gráficos e notícias → protocolos são independentes: os dois ramos rodam
+# em paralelo e se juntam antes do relatório, que espera pelos dois.
+# O grafo compilado atende `app.invoke` e `await app.ainvoke`: no modo assíncrono, as
+# chamadas de rede (notícias, protocolos e LLM) usam as versões nativas assíncronas e
+# o cálculo de métricas, os gráficos e o PDF rodam em threads.
+metrics_branch = build_branch([("calculate_metrics", calculate_metrics_node, None),
+                               ("generate_plots", generate_plots_node, None)], MetricsBranchOutput)
+news_branch = build_branch([("fetch_news", fetch_news_node, afetch_news_node),
+                            ("clinical_protocol_search", clinical_protocol_node, aclinical_protocol_node)],
+                           NewsBranchOutput)
+
 workflow = StateGraph(ReportState)
-workflow.add_node("calculate_metrics", calculate_metrics_node)
-workflow.add_node("generate_plots", generate_plots_node)
-workflow.add_node("fetch_news", fetch_news_node)
-workflow.add_node("clinical_protocol_search", clinical_protocol_node)
-workflow.add_node("generate_report", generate_report_node)
-workflow.add_node("generate_pdf", generate_pdf_node)
-workflow.set_entry_point("calculate_metrics")
-workflow.add_edge("calculate_metrics", "generate_plots")
-workflow.add_edge("generate_plots", "fetch_news")
-workflow.add_edge("fetch_news", "clinical_protocol_search")
-workflow.add_edge("clinical_protocol_search", "generate_report")
+workflow.add_node("metrics_branch", metrics_branch)
+workflow.add_node("news_branch", news_branch)
+workflow.add_node("generate_report", timed_node("generate_report", generate_report_node, agenerate_report_node))
+workflow.add_node("generate_pdf", timed_node("generate_pdf", generate_pdf_node))
+workflow.add_edge(START, "metrics_branch")
+workflow.add_edge(START, "news_branch")
+workflow.add_edge(["metrics_branch", "news_branch"], "generate_report")
 workflow.add_edge("generate_report", "generate_pdf")
 workflow.add_edge("generate_pdf", END)
 app = workflow.compile()
-print("Agente Orquestrador compilado com sucesso.")
\ No newline at end of file
+print("Agente Orquestrador compilado com sucesso.")
+
+
+def _report_event(namespace: tuple, mode: str, chunk: Dict[str, Any], state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Converte um item de `app.stream` em eventos para a interface, acumulando o estado final."""
+    if mode == "custom":
+        return [chunk]
+    events = []
+    for node, update in chunk.items():
+        # As atualizações dos ramos repetem as dos nós internos, já emitidas
+        if not namespace and node in ("metrics_branch", "news_branch"):
+            continue
+        update = update or {}
+        state.update({key: value for key, value in update.items() if key != "node_timings"})
+        state["node_timings"] = merge_timings(state.get("node_timings"), update.get("node_timings"))
+        events.append({"event": "node_end", "node": node, "update": update})
+    return events
+
+def _cached_report_events(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Eventos equivalentes aos de uma execução, para um relatório vindo do cache."""
+    return [
+        {"event": "node_end", "node": "calculate_metrics", "update": {"metrics": state.get("metrics") or {}}},
+        {"event": "node_end", "node": "generate_plots", "update": {"plot_image_paths": state.get("plot_image_paths") or {}}},
+        {"event": "report_token", "text": state.get("report_text") or ""},
+        {"event": "done", "state": state},
+    ]
+
+def run_report(initial_input: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Gera o relatório completo com `app.invoke`, consultando antes o cache de relatórios
+    (mesma localidade, mesma versão dos dados e mesma janela de notícias).
+    """
+    topic, city = initial_input.get("topic"), initial_input.get("city")
+    cached = REPORT_CACHE.get(topic, city) if use_cache else None
+    if cached is not None:
+        return cached
+    with trace_run("report", topic=topic, city=city, mode="invoke"):
+        final_state = app.invoke(initial_input)
+    return REPORT_CACHE.put(topic, city, final_state) if use_cache else final_state
+
+def stream_report(initial_input: Dict[str, Any], use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Executa o grafo em modo streaming. Produz eventos `node_start` e `node_end` (com a
+    atualização do nó, ex.: métricas e gráficos assim que ficam prontos), `report_token`
+    com cada trecho do relatório e `report_reset` se o provedor mudar no meio da resposta.
+    O último evento é `done`, com o estado final. Relatórios em cache são devolvidos de imediato.
+    """
+    topic, city = initial_input.get("topic"), initial_input.get("city")
+    cached = REPORT_CACHE.get(topic, city) if use_cache else None
+    if cached is not None:
+        yield from _cached_report_events(cached)
+        return
+    state = dict(initial_input)
+    with trace_run("report", topic=topic, city=city, mode="stream"):
+        for namespace, mode, chunk in app.stream(initial_input, stream_mode=["updates", "custom"], subgraphs=True):
+            yield from _report_event(namespace, mode, chunk, state)
+    yield {"event": "done", "state": REPORT_CACHE.put(topic, city, state) if use_cache else state}
+
+async def astream_report(initial_input: Dict[str, Any], use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """Versão assíncrona de stream_report."""
+    topic, city = initial_input.get("topic"), initial_input.get("city")
+    cached = await asyncio.to_thread(REPORT_CACHE.get, topic, city) if use_cache else None
+    if cached is not None:
+        for event in _cached_report_events(cached):
+            yield event
+        return
+    state = dict(initial_input)
+    with trace_run("report", topic=topic, city=city, mode="astream"):
+        async for namespace, mode, chunk in app.astream(initial_input, stream_mode=["updates", "custom"], subgraphs=True):
+            for event in _report_event(namespace, mode, chunk, state):
+                yield event
+    if use_cache:
+        state = await asyncio.to_thread(REPORT_CACHE.put, topic, city, state)
+    yield {"event": "done", "state": state}
@@ -1,6 +1,7 @@
 from fpdf import FPDF
 from datetime import datetime
 import os
+from src.instrumentation import traced
 
 class PDFGeneratorTool:
     """
@@ -32,4 +33,17 @@ class PDFGeneratorTool:
                 pdf.image(plot_paths["monthly_cases_plot"], w=180)
         pdf.output(output_path)
         print(f"PDF salvo com sucesso em: {output_path}")
-        return output_path
\ No newline at end of file
+        return output_path
+
+
+@traced("render_report_pdf")
+def render_report_pdf(topic: str, city: str, report_text: str, plot_paths: dict) -> str:
+    """
+    Gera o PDF do relatório de uma localidade em output/, com nome único por localidade e horário.
+    Função de módulo para poder rodar em outro processo (ver src/batch_reports.py).
+    """
+    topic, city = (topic or "relatorio").strip(), (city or "").strip()
+    full_topic = f"{city}_{topic}" if city else topic
+    safe_topic_name = "".join(c for c in full_topic if c.isalnum() or c in ('_', '-')).rstrip()
+    output_path = f"output/relatorio_srag_{safe_topic_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return PDFGeneratorTool().create_report_pdf(report_text, plot_paths, output_path)
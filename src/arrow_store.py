@@ -0,0 +1,143 @@
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.dataset_index import sort_by_date
+
+ARROW_SUFFIXES = (".arrow", ".feather")
+# Metadado das colunas gravadas com as sentinelas do pandas sob os nulos (NaT, código -1, NaN);
+# nas colunas anuláveis do pandas (Int64, Float64) também o tipo, para recriar a máscara na leitura
+PANDAS_LAYOUT = {b"layout": b"pandas"}
+
+
+def is_arrow_store(path: Path) -> bool:
+    """Indica se o caminho aponta para um arquivo Arrow IPC (Feather v2) mapeado em memória."""
+    return Path(path).suffix in ARROW_SUFFIXES
+
+
+def _validity(valid: np.ndarray):
+    import pyarrow as pa
+    return None if valid.all() else pa.array(valid).buffers()[1]
+
+
+def _arrow_column(series: pd.Series) -> Tuple[Any, Optional[Dict[bytes, bytes]]]:
+    """
+    Coluna Arrow com o mesmo layout físico do pandas, para a leitura sem cópia: datas em
+    int64 com NaT, categorias como códigos do pandas (-1 = ausente) em um dicionário,
+    floats com NaN e inteiros anuláveis (Int64) como valores mais bitmap de validade.
+    Os valores ausentes também são marcados no bitmap, então outros leitores de Arrow
+    veem nulos normais. Retorna a coluna e o metadado do layout (None se não o segue).
+    """
+    import pyarrow as pa
+    n = len(series)
+    if pd.api.types.is_datetime64_ns_dtype(series.dtype) and series.dt.tz is None:
+        values = series.to_numpy()
+        valid = ~np.isnat(values)
+        return pa.Array.from_buffers(pa.timestamp("ns"), n, [_validity(valid), pa.py_buffer(values.view(np.int64))],
+                                     null_count=n - int(valid.sum())), PANDAS_LAYOUT
+    if isinstance(series.array, (pd.arrays.IntegerArray, pd.arrays.FloatingArray)):
+        numpy_dtype = series.dtype.numpy_dtype
+        values = series.to_numpy(dtype=numpy_dtype, na_value=0)
+        valid = series.notna().to_numpy()
+        array = pa.Array.from_buffers(pa.from_numpy_dtype(numpy_dtype), n, [_validity(valid), pa.py_buffer(values)],
+                                      null_count=n - int(valid.sum()))
+        return array, {**PANDAS_LAYOUT, b"dtype": str(series.dtype).encode()}
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        series = series.astype("category")
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        valid = codes >= 0
+        indices = pa.Array.from_buffers(pa.from_numpy_dtype(codes.dtype), n, [_validity(valid), pa.py_buffer(codes)],
+                                        null_count=n - int(valid.sum()))
+        dictionary = pa.array(series.cat.categories.to_numpy(dtype=object), type=pa.string())
+        return pa.DictionaryArray.from_arrays(indices, dictionary, safe=False), PANDAS_LAYOUT
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind == "f":
+        values = series.to_numpy()
+        valid = ~np.isnan(values)
+        return pa.Array.from_buffers(pa.from_numpy_dtype(values.dtype), n, [_validity(valid), pa.py_buffer(values)],
+                                     null_count=n - int(valid.sum())), PANDAS_LAYOUT
+    # Demais tipos (booleanos, texto misto) seguem a conversão padrão
+    if series.dtype == object:
+        series = series.astype(str)
+    return pa.array(series), None
+
+
+def write_arrow_dataset(df: pd.DataFrame, output_path: Path) -> Path:
+    """
+    Publica os dados limpos, já ordenados por data de notificação, em um único arquivo
+    Arrow IPC sem compressão e com um único lote por coluna, para que qualquer processo
+    possa mapeá-lo em memória e ler as colunas sem cópia (ver read_arrow_dataset).
+    O arquivo é gravado ao lado e trocado atomicamente: processos que mapearam a versão
+    anterior continuam lendo-a até recarregar.
+    """
+    import pyarrow as pa
+    output_path = Path(output_path)
+    df = sort_by_date(df)
+    arrays, fields = [], []
+    for col in df.columns:
+        array, layout = _arrow_column(df[col])
+        arrays.append(array)
+        fields.append(pa.field(str(col), array.type, metadata=layout))
+    table = pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+    os.makedirs(output_path.parent, exist_ok=True)
+    temporary = output_path.with_name(f".{output_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with pa.OSFile(str(temporary), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temporary, output_path)
+    except PermissionError as e:
+        raise PermissionError(f"Não foi possível substituir {output_path}: o arquivo está mapeado por outro "
+                              f"processo (no Windows, encerre os processos que o leem antes de publicar).") from e
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+    return output_path
+
+
+def _pandas_column(column, field) -> pd.Series:
+    """Converte uma coluna Arrow em Series, apontando para o buffer mapeado sempre que o layout permite."""
+    import pyarrow as pa
+    metadata = field.metadata or {}
+    # Sem o layout do pandas, os valores sob os nulos são arbitrários e só a conversão padrão é segura
+    if column.num_chunks != 1 or (column.null_count and metadata.get(b"layout") != PANDAS_LAYOUT[b"layout"]):
+        return column.to_pandas()
+    chunk = column.chunk(0)
+    kind = chunk.type
+    if b"dtype" in metadata:
+        dtype = np.dtype(kind.to_pandas_dtype())
+        values = np.frombuffer(chunk.buffers()[1], dtype=dtype, count=len(chunk), offset=chunk.offset * dtype.itemsize)
+        validity = chunk.buffers()[0]
+        # A máscara do pandas é um byte por linha: só ela é criada, os valores continuam no mapa
+        mask = np.zeros(len(chunk), dtype=bool) if validity is None else ~np.unpackbits(
+            np.frombuffer(validity, dtype=np.uint8), count=chunk.offset + len(chunk), bitorder="little"
+        )[chunk.offset:].astype(bool)
+        masked = pd.arrays.IntegerArray if dtype.kind in "iu" else pd.arrays.FloatingArray
+        return pd.Series(masked(values, mask, copy=False), copy=False).astype(metadata[b"dtype"].decode(), copy=False)
+    if pa.types.is_dictionary(kind) and pa.types.is_integer(kind.index_type):
+        codes = np.frombuffer(chunk.indices.buffers()[1], dtype=kind.index_type.to_pandas_dtype(),
+                              count=len(chunk), offset=chunk.offset * kind.index_type.bit_width // 8)
+        categories = pd.Index(chunk.dictionary.to_pylist(), dtype=object)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=categories, validate=False), copy=False)
+    if (pa.types.is_timestamp(kind) and kind.unit == "ns" and kind.tz is None) or pa.types.is_floating(kind) \
+            or (pa.types.is_integer(kind) and not chunk.null_count):
+        dtype = np.dtype("datetime64[ns]") if pa.types.is_timestamp(kind) else np.dtype(kind.to_pandas_dtype())
+        values = np.frombuffer(chunk.buffers()[1], dtype=dtype, count=len(chunk), offset=chunk.offset * dtype.itemsize)
+        return pd.Series(values, copy=False)
+    return column.to_pandas()
+
+
+def read_arrow_dataset(path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Mapeia o arquivo em memória e monta o DataFrame sobre os buffers mapeados: datas,
+    códigos das categorias e números não são copiados, e as páginas do arquivo ficam no
+    cache do sistema operacional, compartilhadas por todos os processos que o leem.
+    Apenas as colunas pedidas são tocadas. Os arrays são somente leitura.
+    """
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    if columns is not None:
+        table = table.select([col for col in columns if col in table.column_names])
+    return pd.DataFrame({name: _pandas_column(table.column(name), table.schema.field(name))
+                         for name in table.column_names}, copy=False)
@@ -0,0 +1,176 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from src.config import BATCH_REPORT_CONFIG, DATA_PROCESSING_CONFIG
+from src.data_store import DATASET_CACHE, get_processed_data_path
+from src.dataset_index import LocationIndex, normalize_municipality
+from src.metrics_calculator import METRIC_COLUMNS, STATE_MAP, location_uf
+from src.metrics_cube import build_metrics_cube, compute_all_from_cube
+from src.plot_generator import render_location_plots
+from src.agents.pdf_generator_agent.tools import render_report_pdf
+from src.report_cache import REPORT_CACHE
+from src.instrumentation import trace_run
+
+
+def parse_municipality(value: str) -> Dict[str, str]:
+    """"Cidade, UF" → {"topic": "UF", "city": "Cidade"}."""
+    city, _, topic = value.rpartition(",")
+    if not city.strip() or not topic.strip():
+        raise ValueError(f"Município inválido: '{value}'. Use o formato 'Cidade, UF'.")
+    return {"topic": topic.strip(), "city": city.strip()}
+
+
+def _label(target: Dict[str, Any]) -> str:
+    return f"{target['city']}, {target['topic']}" if target.get("city") else target["topic"]
+
+
+def batch_targets(municipalities: Optional[List[str]] = None, include_national: bool = True) -> List[Dict[str, Any]]:
+    """Localidades do lote: Brasil (opcional), as 27 UFs do STATE_MAP e os municípios pedidos."""
+    targets = [{"topic": "Brasil", "city": None}] if include_national else []
+    targets += [{"topic": name.title(), "city": None} for name in STATE_MAP]
+    targets += [parse_municipality(value) for value in municipalities or []]
+    return list({_label(target): target for target in targets}.values())
+
+
+class BatchReportGenerator:
+    """
+    Gera os relatórios de várias localidades em uma única execução:
+    - os dados são carregados uma vez e agregados em um cubo compartilhado, do qual
+      saem as métricas de todas as localidades;
+    - gráficos e PDFs (CPU) rodam em um pool de processos;
+    - notícias, protocolos e LLM (rede) rodam em um pool de threads limitado a
+      `network_concurrency` localidades ao mesmo tempo;
+    - relatórios já presentes no cache de relatórios não são gerados de novo.
+    """
+    def __init__(self, process_workers: Optional[int] = None, network_concurrency: int = 4,
+                 use_cache: bool = True):
+        self.process_workers = process_workers or os.cpu_count() or 1
+        self.network_concurrency = max(1, network_concurrency)
+        self.use_cache = use_cache
+
+    def _shared_cube(self):
+        """Cubo de métricas (UF × município × data) e seu índice de localidades, em cache por versão dos dados."""
+        if DATA_PROCESSING_CONFIG.get("metrics_source") == "cube":
+            return DATASET_CACHE.derived(DATA_PROCESSING_CONFIG["cube_output_path"], "location_index", LocationIndex)
+        _, cube = DATASET_CACHE.derived(get_processed_data_path(DATA_PROCESSING_CONFIG), "metrics_cube",
+                                        build_metrics_cube, columns=METRIC_COLUMNS)
+        return cube, LocationIndex(cube)
+
+    def compute_metrics(self, targets: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Métricas e séries de cada localidade a partir do cubo compartilhado."""
+        print(f"Calculando métricas de {len(targets)} localidade(s) a partir dos dados compartilhados...")
+        cube, index = self._shared_cube()
+        states = {}
+        for target in targets:
+            start = time.perf_counter()
+            city = normalize_municipality(target["city"]) if target.get("city") else None
+            positions = index.positions(uf=location_uf(target["topic"]), city=city)
+            results = compute_all_from_cube(cube if positions is None else cube.take(positions))
+            states[_label(target)] = {**target, **results,
+                                      "node_timings": {"calculate_metrics": round(time.perf_counter() - start, 4)}}
+        return states
+
+    def run(self, targets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Gera os relatórios e retorna um resumo por localidade (status, PDF e tempos)."""
+        from src.agents.orchestrator.agent import research_report_text
+
+        summaries: Dict[str, Dict[str, Any]] = {}
+        pending = []
+        for target in targets:
+            cached = REPORT_CACHE.get(target["topic"], target.get("city")) if self.use_cache else None
+            if cached is not None:
+                summaries[_label(target)] = {**target, "status": "cache", "pdf_report_path": cached.get("pdf_report_path")}
+            else:
+                pending.append(target)
+        print(f"Lote: {len(targets)} localidade(s), {len(targets) - len(pending)} no cache, {len(pending)} a gerar.")
+        if not pending:
+            return [summaries[_label(target)] for target in targets]
+
+        states = self.compute_metrics(pending)
+
+        def fail(label: str, error: Any) -> None:
+            print(f"ERRO no relatório de '{label}': {error}")
+            summaries[label] = {"topic": states[label]["topic"], "city": states[label].get("city"),
+                                "status": "erro", "erro": str(error), "node_timings": states[label]["node_timings"]}
+
+        def research(label: str) -> Dict[str, Any]:
+            start = time.perf_counter()
+            with trace_run("batch_report", topic=states[label]["topic"], city=states[label].get("city")):
+                update = research_report_text(states[label])
+            return {**update, "node_timings": {"research_and_write": round(time.perf_counter() - start, 4)}}
+
+        # Os processos são criados na primeira submissão, antes das threads de rede
+        with ProcessPoolExecutor(max_workers=self.process_workers) as processes:
+            plot_futures = {label: processes.submit(render_location_plots, state["topic"], state.get("city"),
+                                                    state["plot_data"])
+                            for label, state in states.items()}
+            pdf_futures = {}
+            with ThreadPoolExecutor(max_workers=self.network_concurrency) as network:
+                research_futures = {network.submit(research, label): label for label in states}
+                for future in as_completed(research_futures):
+                    label = research_futures[future]
+                    state = states[label]
+                    try:
+                        update = future.result()
+                        state["node_timings"].update(update.pop("node_timings"))
+                        state.update(update)
+                        if not state.get("report_text"):
+                            raise RuntimeError("nenhum provedor de LLM gerou o relatório")
+                        state["plot_image_paths"] = plot_futures[label].result()
+                    except Exception as e:
+                        fail(label, e)
+                        continue
+                    pdf_futures[processes.submit(render_report_pdf, state["topic"], state.get("city"),
+                                                 state["report_text"], state["plot_image_paths"])] = label
+
+            for future in as_completed(pdf_futures):
+                label = pdf_futures[future]
+                state = states[label]
+                try:
+                    state["pdf_report_path"] = future.result()
+                except Exception as e:
+                    fail(label, e)
+                    continue
+                if self.use_cache:
+                    state = REPORT_CACHE.put(state["topic"], state.get("city"), state)
+                summaries[label] = {"topic": state["topic"], "city": state.get("city"), "status": "gerado",
+                                    "pdf_report_path": state["pdf_report_path"], "node_timings": state["node_timings"]}
+        return [summaries[_label(target)] for target in targets]
+
+
+def write_batch_summary(summaries: List[Dict[str, Any]], elapsed: float, output_path: Path) -> Path:
+    """Grava o resumo do lote em JSON."""
+    output_path = Path(output_path)
+    os.makedirs(output_path.parent, exist_ok=True)
+    statuses = [summary["status"] for summary in summaries]
+    report = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"), "duracao_segundos": round(elapsed, 2),
+        "total": len(summaries), "gerados": statuses.count("gerado"), "cache": statuses.count("cache"),
+        "erros": statuses.count("erro"), "relatorios": summaries,
+    }
+    with open(output_path, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2, default=str)
+    return output_path
+
+
+def run_batch_reports(municipalities: Optional[List[str]] = None, process_workers: Optional[int] = None,
+                      network_concurrency: Optional[int] = None, use_cache: bool = True) -> List[Dict[str, Any]]:
+    """Ponto de entrada do lote (main.py --reports), com os padrões de BATCH_REPORT_CONFIG."""
+    config = BATCH_REPORT_CONFIG
+    start = time.perf_counter()
+    targets = batch_targets(config.get("municipalities", []) + list(municipalities or []),
+                            include_national=config.get("include_national", True))
+    generator = BatchReportGenerator(
+        process_workers=process_workers or config.get("process_workers"),
+        network_concurrency=network_concurrency or config.get("network_concurrency", 4),
+        use_cache=use_cache,
+    )
+    summaries = generator.run(targets)
+    elapsed = time.perf_counter() - start
+    summary_path = write_batch_summary(summaries, elapsed, config["summary_path"])
+    print(f"Lote concluído em {elapsed:.1f}s. Resumo salvo em: {summary_path}")
+    return summaries
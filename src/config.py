@@ -16,6 +16,35 @@ DATA_PROCESSING_CONFIG = {
     "output_file_path": PROJECT_ROOT / "data" / "processed" / "OpenSUS_limpo.csv",
     "separator": ";",
 
+    # "csv" mantém o OpenSUS_limpo.csv; "parquet" grava um dataset colunar particionado;
+    # "arrow" publica um arquivo Arrow IPC que cada processo mapeia em memória e lê sem cópia
+    "output_format": "csv",
+    "parquet_output_path": PROJECT_ROOT / "data" / "processed" / "OpenSUS_limpo_parquet",
+    "arrow_output_path": PROJECT_ROOT / "data" / "processed" / "OpenSUS_limpo.arrow",
+    "partition_columns": ["uf_notificacao", "ano_notificacao"],
+
+    # Cubo de contagens pré-agregadas; com "metrics_source": "cube" o relatório é calculado a partir dele
+    "cube_output_path": PROJECT_ROOT / "data" / "processed" / "OpenSUS_cubo.parquet",
+    "metrics_source": "rows",
+
+    # Relatório do modo --profile do main.py (tempo e memória por etapa e por coluna)
+    "profile_output_path": PROJECT_ROOT / "output" / "pipeline_profile.json",
+
+    # Manifesto da ingestão incremental: digests por (UF, ano, semana) já ingeridos e marca d'água
+    "ingest_manifest_path": PROJECT_ROOT / "data" / "processed" / "ingest_manifest.json",
+
+    # Cache em processo dos dados limpos: além de mtime/tamanho, confirma mudanças pelo hash do conteúdo
+    "cache_hash_contents": False,
+    # Processos usados na limpeza de run_pipeline (1 = serial)
+    "n_workers": 1,
+    # Tamanho do bloco de leitura usado por run_streaming_pipeline
+    "chunk_size": 250_000,
+    # Tipos fixos na leitura do arquivo bruto, para que todos os blocos sejam inferidos igualmente
+    "raw_data_types": {
+        "DT_NOTIFIC": str, "DT_SIN_PRI": str, "DT_NASC": str, "DT_INTERNA": str,
+        "DT_ENTUTI": str, "DT_EVOLUCA": str, "SG_UF_NOT": str, "ID_MUNICIP": str, "CS_SEXO": str,
+    },
+
     "relevant_features": [
         "DT_NOTIFIC", "DT_SIN_PRI", "SEM_NOT", "SG_UF_NOT", "ID_MUNICIP",
         "CS_SEXO", "DT_NASC", "NU_IDADE_N", "CS_RACA", "CS_GESTANT", "FEBRE",
@@ -74,4 +103,72 @@ DATA_PROCESSING_CONFIG = {
         "gestante": CATEGORICAL_MAPPING_CONFIG["gestante"],
         "classificacao_final": CATEGORICAL_MAPPING_CONFIG["classificacao_final"]
     }
-}
\ No newline at end of file
+}
+AGENT_CONFIG = {
+    # Consultas de protocolos clínicos (uma por doença) executadas em paralelo
+    "protocol_max_concurrency": 4,
+    # Prazo do nó de protocolos (buscas + resumos, desde a submissão); doenças que não terminam ficam fora do relatório
+    "protocol_timeout_seconds": 60,
+}
+
+LLM_CACHE_CONFIG = {
+    # Cache persistente das respostas do LLM; "enabled": False desativa (use_cache=False ignora por chamada)
+    "enabled": True,
+    "path": PROJECT_ROOT / "data" / "cache" / "llm_responses.sqlite",
+    "ttl_seconds": 24 * 60 * 60,
+    "max_entries": 5_000,
+}
+
+SEARCH_CONFIG = {
+    # "tavily" usa a API real; "fake" usa respostas locais determinísticas (testes, execução sem rede)
+    "backend": "tavily",
+    # Cache das buscas por consulta normalizada
+    "ttl_seconds": 60 * 60,
+    "max_entries": 256,
+}
+
+LLM_PROVIDER_CONFIG = {
+    # Circuit breaker: falhas seguidas que desativam um provedor e por quanto tempo ele é pulado
+    "failure_threshold": 3,
+    "cooldown_seconds": 5 * 60,
+}
+
+REPORT_CACHE_CONFIG = {
+    # Relatórios completos por localidade + versão dos dados + janela das notícias
+    "enabled": True,
+    "path": PROJECT_ROOT / "output" / "report_cache",
+    "news_bucket_hours": 24,
+    "max_age_hours": 7 * 24,
+    "max_entries": 200,
+}
+
+PLOT_CONFIG = {
+    # Não renderiza de novo um gráfico cujo PNG já corresponde à série (hash em <arquivo>.png.sha256)
+    "skip_unchanged": True,
+    # Processos usados por render_many (None = número de CPUs)
+    "render_workers": None,
+}
+
+INSTRUMENTATION_CONFIG = {
+    # Rastreamento por execução do relatório: tempo, CPU, memória e chamadas externas por nó/ferramenta/LLM
+    "enabled": True,
+    # Pico de memória via tracemalloc; desligado por padrão porque deixa gráficos, PDF e
+    # conversões do pandas várias vezes mais lentos, distorcendo os tempos medidos
+    "trace_memory": False,
+    # Um JSON por execução em trace_dir, mais o resumo em trace_dir/history.jsonl (percentis entre execuções)
+    "write_files": True,
+    "trace_dir": PROJECT_ROOT / "output" / "traces",
+    # Execuções mantidas: em memória, JSONs em trace_dir e linhas de history.jsonl (reescrito acima do dobro)
+    "max_history": 500,
+}
+
+BATCH_REPORT_CONFIG = {
+    # Geração em lote: relatórios de todas as UFs (e do Brasil) mais os municípios listados ("Cidade, UF")
+    "include_national": True,
+    "municipalities": [],
+    # Processos para gráficos e PDFs (None = número de CPUs)
+    "process_workers": None,
+    # Localidades com busca de notícias, protocolos e LLM em andamento ao mesmo tempo
+    "network_concurrency": 4,
+    "summary_path": PROJECT_ROOT / "output" / "batch_reports.json",
+}
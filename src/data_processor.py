@@ -1,11 +1,27 @@
+import numpy as np
 import pandas as pd
-from typing import Dict, Any
-import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, Any, Optional
+from src.data_store import MISSING_CATEGORY, categorical_dtype, get_processed_data_path, write_processed_data
+from src.metrics_cube import build_metrics_cube, combine_cubes, save_metrics_cube
+from src.instrumentation import span
+
+def _clean_partition(config: Dict[str, Any], df: pd.DataFrame) -> pd.DataFrame:
+    """Executa as etapas de limpeza sobre uma partição de linhas (usada pelos processos do pool)."""
+    processor = SragDataProcessor(config=config)
+    processor.df = df
+    (processor.clean_and_convert_types()
+              ._normalize_age()
+              .handle_missing_values())
+    return processor.df
+
 
 class SragDataProcessor:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.df = None
+        self.cube = None
 
     def load_data(self) -> "SragDataProcessor":
         """Carrega os dados do arquivo CSV especificado na configuração."""
@@ -13,7 +29,10 @@ class SragDataProcessor:
             file_path = self.config["file_path"]
             separator = self.config.get("separator", ",")
             print(f"Carregando dados de: {file_path}")
-            self.df = pd.read_csv(file_path, sep=separator, low_memory=False, encoding='ISO-8859-1')
+            relevant_features = set(self.config["relevant_features"])
+            self.df = pd.read_csv(file_path, sep=separator, low_memory=False, encoding='ISO-8859-1',
+                                  usecols=lambda col: col in relevant_features,
+                                  dtype=self.config.get("raw_data_types"))
             print(" Dados carregados com sucesso.")
             return self
         except FileNotFoundError:
@@ -40,20 +59,25 @@ class SragDataProcessor:
         """Limpa, converte tipos de dados e decodifica variáveis categóricas."""
         print("Limpando e convertendo tipos de dados")
         
+        # Cada coluna é um trecho medido: o modo --profile do main.py mostra o custo por coluna
         date_columns = self.config.get("date_columns", [])
         for col in date_columns:
             if col in self.df.columns:
-                self.df[col] = pd.to_datetime(self.df[col], errors='coerce')
+                with span(col, kind="column", conversion="data"):
+                    self.df[col] = pd.to_datetime(self.df[col], errors='coerce')
         
+        # Colunas decodificadas viram categóricas com categorias fixas (códigos int8 em memória)
         categorical_maps = self.config.get("categorical_maps", {})
         for col, mapping in categorical_maps.items():
             if col in self.df.columns:
-                self.df[col] = self.df[col].map(mapping)
+                with span(col, kind="column", conversion="categorica"):
+                    self.df[col] = self.df[col].map(mapping).astype(categorical_dtype(mapping))
         
         data_types = self.config.get("data_types", {})
         for col, dtype in data_types.items():
             if col in self.df.columns:
-                self.df[col] = pd.to_numeric(self.df[col], errors='coerce').astype(dtype)
+                with span(col, kind="column", conversion="numerica"):
+                    self.df[col] = pd.to_numeric(self.df[col], errors='coerce').astype(dtype)
         
         print("Tipos de dados convertidos e normalizados.")
         return self
@@ -69,43 +93,134 @@ class SragDataProcessor:
             self.df['idade_anos_corrigida'] = self.df.get('idade', pd.Series(dtype=float))
             return self
 
-        def convert_age(row):
-            age, age_type = row['idade'], row['tipo_idade']
-            if pd.isna(age) or pd.isna(age_type): return age
-            if age_type == 1: return age / 365.25 
-            if age_type == 2: return age / 12    
-            return age
-
-        self.df['idade_anos_corrigida'] = self.df.apply(convert_age, axis=1)
+        # Divisor por unidade: 1 = dias, 2 = meses, demais (3 = anos) mantêm o valor.
+        # Idade ausente propaga NaN; tipo ausente mantém a idade original.
+        age = self.df['idade'].to_numpy(dtype=float, na_value=np.nan)
+        age_type = self.df['tipo_idade'].to_numpy(dtype=float, na_value=np.nan)
+        divisor = np.select([age_type == 1, age_type == 2], [365.25, 12.0], default=1.0)
+        self.df['idade_anos_corrigida'] = age / divisor
         print("Coluna 'idade_anos_corrigida' criada com sucesso.")
         return self
 
     def handle_missing_values(self) -> "SragDataProcessor":
         """Trata valores ausentes (NaN/NaT) no DataFrame."""
         print("Tratando valores ausentes")
-        categorical_cols = self.df.select_dtypes(include=['object']).columns
-        fill_value = "Não Informado"
+        # As colunas decodificadas entram mesmo quando um bloco as tem inteiramente vazias
+        mapped_cols = [col for col in self.config.get("categorical_maps", {}) if col in self.df.columns]
+        categorical_cols = self.df.select_dtypes(include=['object']).columns.union(mapped_cols, sort=False)
+        fill_value = MISSING_CATEGORY
         self.df[categorical_cols] = self.df[categorical_cols].fillna(fill_value)
         print(f"Valores nulos em colunas categóricas preenchidos com '{fill_value}'.")
         return self
 
-    def save_processed_data(self) -> "SragDataProcessor":
-        """Salva o DataFrame processado em um novo arquivo CSV."""
+    def save_processed_data(self, file_format: Optional[str] = None) -> "SragDataProcessor":
+        """
+        Salva o DataFrame processado em CSV ou em um dataset Parquet
+        particionado por UF e ano, conforme 'output_format' na configuração.
+        """
         if self.df is None: raise ValueError("Não há dados para salvar.")
         print("Salvando dados limpos")
-        output_path = self.config["output_file_path"]
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        self.df.to_csv(output_path, index=False, sep=';', encoding='utf-8')
+        file_format = file_format or self.config.get("output_format", "csv")
+        output_path = get_processed_data_path({**self.config, "output_format": file_format})
+        write_processed_data(self.df, output_path, file_format=file_format,
+                             partition_cols=self.config.get("partition_columns"))
         print(f"Arquivo limpo salvo em: {output_path}")
         return self
 
-    def run_pipeline(self) -> pd.DataFrame:
-        """Orquestra e executa o pipeline completo de preparação de dados."""
+    def build_metrics_cube(self) -> "SragDataProcessor":
+        """Agrega os dados limpos no cubo de contagens usado pelo modo cubo do MetricsCalculator."""
+        if self.df is None: raise ValueError("Não há dados para agregar.")
+        print("Construindo cubo de métricas")
+        self.cube = build_metrics_cube(self.df)
+        print(f"Cubo com {len(self.cube)} células a partir de {len(self.df)} registros.")
+        return self
+
+    def save_metrics_cube(self) -> "SragDataProcessor":
+        """Salva o cubo de métricas em Parquet."""
+        if self.cube is None: raise ValueError("Não há cubo para salvar.")
+        output_path = save_metrics_cube(self.cube, self.config["cube_output_path"])
+        print(f"Cubo de métricas salvo em: {output_path}")
+        return self
+
+    def _step(self, name: str, *args) -> "SragDataProcessor":
+        """Executa a etapa `name` como um trecho medido (tempo e memória por etapa no modo --profile)."""
+        with span(name, kind="step") as step:
+            getattr(self, name)(*args)
+            step.set(rows=len(self.df) if self.df is not None else 0)
+        return self
+
+    def clean_in_parallel(self, n_workers: int) -> "SragDataProcessor":
+        """
+        Divide os dados em faixas contíguas de linhas e executa limpeza, normalização
+        de idade e tratamento de ausentes em `n_workers` processos. As partições são
+        concatenadas na ordem original, com o mesmo resultado do caminho serial.
+        """
+        print(f"Limpando dados em paralelo com {n_workers} processos")
+        bounds = np.linspace(0, len(self.df), n_workers + 1).astype(int)
+        partitions = [self.df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            cleaned = list(executor.map(_clean_partition, repeat(self.config), partitions))
+        self.df = pd.concat(cleaned) if cleaned else self.df
+        print("Limpeza paralela concluída.")
+        return self
+
+    def run_pipeline(self, n_workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        Orquestra e executa o pipeline completo de preparação de dados.
+        Com n_workers > 1 (ou "n_workers" na configuração), a limpeza roda em um pool de processos.
+        """
         print("\nINICIANDO PIPELINE DE PREPARAÇÃO DE DADOS")
-        (self.load_data()
-             .select_and_rename_features()
-             .clean_and_convert_types()
-             ._normalize_age()
-             .handle_missing_values())
+        n_workers = n_workers or self.config.get("n_workers", 1)
+        self._step("load_data")._step("select_and_rename_features")
+        if n_workers > 1:
+            self._step("clean_in_parallel", n_workers)
+        else:
+            (self._step("clean_and_convert_types")
+                 ._step("_normalize_age")
+                 ._step("handle_missing_values"))
         print("PIPELINE DE PREPARAÇÃO DE DADOS FINALIZADO\n")
-        return self.df
\ No newline at end of file
+        return self.df
+
+    def run_streaming_pipeline(self, chunk_size: Optional[int] = None, file_format: Optional[str] = None,
+                               build_cube: bool = False) -> "SragDataProcessor":
+        """
+        Executa o pipeline em blocos de tamanho fixo, lendo apenas as colunas relevantes
+        e gravando cada bloco limpo incrementalmente na saída. O uso de memória fica
+        limitado ao tamanho do bloco, independentemente do tamanho do arquivo bruto.
+        Com build_cube=True, os cubos parciais de cada bloco são somados em self.cube.
+        """
+        file_format = file_format or self.config.get("output_format", "csv")
+        if file_format == "arrow":
+            raise ValueError("O pipeline em blocos não grava Arrow; use --format arrow sem --streaming.")
+        print("\nINICIANDO PIPELINE DE PREPARAÇÃO DE DADOS EM BLOCOS")
+        chunk_size = chunk_size or self.config.get("chunk_size", 250_000)
+        output_path = get_processed_data_path({**self.config, "output_format": file_format})
+        relevant_features = set(self.config["relevant_features"])
+
+        reader = pd.read_csv(self.config["file_path"], sep=self.config.get("separator", ","),
+                             encoding='ISO-8859-1', usecols=lambda col: col in relevant_features,
+                             dtype=self.config.get("raw_data_types"), chunksize=chunk_size)
+        total_rows = 0
+        partial_cubes = []
+        for chunk_number, chunk in enumerate(reader):
+            print(f"Processando bloco {chunk_number + 1} ({len(chunk)} registros)")
+            self.df = chunk
+            (self._step("select_and_rename_features")
+                 ._step("clean_and_convert_types")
+                 ._step("_normalize_age")
+                 ._step("handle_missing_values"))
+            with span("write_processed_data", kind="step"):
+                write_processed_data(self.df, output_path, file_format=file_format,
+                                     partition_cols=self.config.get("partition_columns"),
+                                     append=chunk_number > 0)
+            if build_cube:
+                with span("build_metrics_cube", kind="step"):
+                    partial_cubes.append(build_metrics_cube(self.df))
+            total_rows += len(self.df)
+
+        self.df = None
+        if partial_cubes:
+            self.cube = combine_cubes(partial_cubes)
+        print(f"Arquivo limpo salvo em: {output_path} ({total_rows} registros)")
+        print("PIPELINE DE PREPARAÇÃO DE DADOS EM BLOCOS FINALIZADO\n")
+        return self
@@ -0,0 +1,313 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import pandas as pd
+from src.arrow_store import is_arrow_store, read_arrow_dataset, write_arrow_dataset
+from src.config import DATA_PROCESSING_CONFIG
+from src.dataset_index import LocationIndex, sort_by_date
+from src.instrumentation import count_call, span
+
+DATE_COLUMNS = ['data_notificacao', 'data_primeiros_sintomas', 'data_nascimento',
+                'data_internacao', 'data_entrada_uti', 'data_evolucao']
+MISSING_CATEGORY = "Não Informado"
+
+
+def categorical_dtype(mapping: Dict[Any, str]) -> pd.CategoricalDtype:
+    """Categorias fixas de uma coluna decodificada: os valores do mapeamento e 'Não Informado'."""
+    return pd.CategoricalDtype(list(dict.fromkeys([*mapping.values(), MISSING_CATEGORY])))
+
+
+def categorical_dtypes(columns: List[str]) -> Dict[str, pd.CategoricalDtype]:
+    """Tipos categóricos das colunas decodificadas presentes em `columns`."""
+    categorical_maps = DATA_PROCESSING_CONFIG.get("categorical_maps", {})
+    return {col: categorical_dtype(categorical_maps[col]) for col in columns if col in categorical_maps}
+
+
+def is_parquet_store(path: Path) -> bool:
+    """Indica se o caminho aponta para um dataset Parquet (diretório particionado ou arquivo .parquet)."""
+    path = Path(path)
+    return path.is_dir() or path.suffix == ".parquet"
+
+
+def get_processed_data_path(config: Dict[str, Any]) -> Path:
+    """Retorna o caminho dos dados limpos de acordo com o formato de saída configurado."""
+    if config.get("output_format", "csv") == "parquet":
+        return Path(config["parquet_output_path"])
+    if config.get("output_format") == "arrow":
+        return Path(config["arrow_output_path"])
+    return Path(config["output_file_path"])
+
+
+def _to_storage_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte colunas de texto para categóricas antes da escrita colunar."""
+    df = df.copy()
+    for col in df.select_dtypes(include=['object']).columns:
+        # Colunas com tipos mistos são gravadas como texto, como ocorreria no CSV
+        values = df[col] if pd.api.types.infer_dtype(df[col]) == "string" else df[col].astype(str)
+        df[col] = values.astype("category")
+    return df
+
+
+def _to_arrow_table(df: pd.DataFrame):
+    """Converte para Arrow com dicionários de índice int32, garantindo o mesmo schema entre blocos."""
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = [
+        pa.field(field.name, pa.dictionary(pa.int32(), field.type.value_type))
+        if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def write_processed_data(df: pd.DataFrame, output_path: Path, file_format: str = "csv",
+                         partition_cols: Optional[List[str]] = None, append: bool = False) -> Path:
+    """
+    Salva o DataFrame limpo como CSV (';', UTF-8), como dataset Parquet
+    particionado por UF e ano da notificação ou como arquivo Arrow mapeável em
+    memória. Com append=True o bloco é acrescentado à saída existente, o que
+    permite gravar o pipeline em partes (exceto em Arrow, publicado de uma vez).
+    """
+    output_path = Path(output_path)
+    if file_format == "csv":
+        os.makedirs(output_path.parent, exist_ok=True)
+        df.to_csv(output_path, index=False, sep=';', encoding='utf-8',
+                  mode='a' if append else 'w', header=not append)
+        return output_path
+    if file_format == "arrow":
+        if append:
+            raise ValueError("O arquivo Arrow é publicado de uma vez e não aceita gravação em blocos.")
+        return write_arrow_dataset(df, output_path)
+    if file_format != "parquet":
+        raise ValueError(f"Formato de saída não suportado: '{file_format}'.")
+
+    import pyarrow.parquet as pq
+    # Notificações sem data vão para uma partição própria, em vez da partição nula do Hive
+    year = df['data_notificacao'].dt.strftime('%Y').fillna(MISSING_CATEGORY)
+    df = df.assign(ano_notificacao=year.astype("category"))
+    table = _to_arrow_table(_to_storage_dtypes(df))
+    if not append and output_path.exists():
+        shutil.rmtree(output_path) if output_path.is_dir() else output_path.unlink()
+    os.makedirs(output_path, exist_ok=True)
+    pq.write_to_dataset(table, output_path, partition_cols=partition_cols or None,
+                        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet")
+    return output_path
+
+
+def _partitioning(path: Path):
+    """Partições Hive (UF e ano) sempre lidas como texto, sem inferência de tipo por diretório."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    if not Path(path).is_dir():
+        return None
+    schema = pa.schema([(col, pa.string()) for col in DATA_PROCESSING_CONFIG.get("partition_columns", [])])
+    return ds.partitioning(schema, flavor="hive")
+
+
+def _parquet_columns(path: Path) -> List[str]:
+    import pyarrow.dataset as ds
+    return ds.dataset(path, format="parquet", partitioning=_partitioning(path)).schema.names
+
+
+def _csv_columns(path: Path) -> List[str]:
+    return pd.read_csv(path, sep=';', encoding='utf-8', nrows=0).columns.tolist()
+
+
+def read_processed_data(path: Path, columns: Optional[List[str]] = None, uf: Optional[str] = None,
+                        filters: Optional[List[Tuple]] = None) -> pd.DataFrame:
+    """
+    Lê os dados limpos. Em Parquet, apenas as colunas pedidas são lidas e o filtro
+    de UF (e os `filters` adicionais, ex.: por ano) é aplicado sobre as partições,
+    sem tocar nos arquivos das demais. Em Arrow, o arquivo é mapeado em memória e as
+    colunas apontam para as páginas compartilhadas entre processos, sem cópia.
+    """
+    path = Path(path)
+    if is_arrow_store(path):
+        df = read_arrow_dataset(path, columns=columns)
+        if uf and "uf_notificacao" in df.columns:
+            df = df[df['uf_notificacao'].str.upper() == uf].copy()
+        return df
+    if is_parquet_store(path):
+        available = _parquet_columns(path)
+        if columns is not None:
+            columns = [col for col in columns if col in available]
+        filters = list(filters or [])
+        if uf and "uf_notificacao" in available:
+            filters.append(("uf_notificacao", "==", uf))
+        df = pd.read_parquet(path, columns=columns, filters=filters or None, partitioning=_partitioning(path))
+        # Cada arquivo traz o próprio dicionário; as colunas decodificadas voltam às categorias fixas
+        return df.astype(categorical_dtypes(df.columns))
+
+    available = _csv_columns(path)
+    if columns is not None:
+        columns = [col for col in columns if col in available]
+    date_cols = [col for col in DATE_COLUMNS if col in (columns or available)]
+    df = pd.read_csv(path, sep=';', usecols=columns, parse_dates=date_cols, encoding='utf-8',
+                     dtype=categorical_dtypes(columns or available))
+    if uf and "uf_notificacao" in df.columns:
+        df = df[df['uf_notificacao'].str.upper() == uf].copy()
+    return df
+
+
+def _file_fingerprint(path: Path) -> Tuple:
+    """Assinatura barata (mtime + tamanho) do arquivo ou de todos os arquivos do dataset."""
+    if path.is_dir():
+        return tuple(
+            (str(file.relative_to(path)), file.stat().st_mtime_ns, file.stat().st_size)
+            for file in sorted(path.rglob("*")) if file.is_file()
+        )
+    stat = path.stat()
+    return ((path.name, stat.st_mtime_ns, stat.st_size),)
+
+
+def dataset_fingerprint(path: Path) -> str:
+    """Identificador da versão do dataset (mtime + tamanho de todos os arquivos)."""
+    path = Path(path)
+    fingerprint = _file_fingerprint(path) if path.exists() else ()
+    return hashlib.sha256(repr(fingerprint).encode("utf-8")).hexdigest()
+
+
+def _content_hash(path: Path) -> str:
+    """Hash SHA-256 do conteúdo, usado para confirmar mudanças quando mtime/tamanho variam."""
+    digest = hashlib.sha256()
+    files = sorted(f for f in path.rglob("*") if f.is_file()) if path.is_dir() else [path]
+    for file in files:
+        with open(file, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """
+    Cache em processo dos dados limpos já carregados, tipados e ordenados por data de
+    notificação (ver DateIndex), compartilhado entre instâncias do MetricsCalculator e
+    execuções do grafo. Cada entrada é invalidada quando o arquivo muda (mtime/tamanho
+    e, opcionalmente, hash do conteúdo).
+    Os DataFrames devolvidos são compartilhados e não devem ser modificados.
+    """
+    def __init__(self, hash_contents: bool = False):
+        self.hash_contents = hash_contents
+        self._entries: Dict[Tuple, Dict[str, Any]] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load_seconds = 0.0
+        self.last_load_seconds = 0.0
+
+    def _key_lock(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _is_current(self, entry: Dict[str, Any], path: Path, fingerprint: Tuple) -> bool:
+        if entry["fingerprint"] == fingerprint:
+            return True
+        if self.hash_contents and entry["content_hash"] == _content_hash(path):
+            entry["fingerprint"] = fingerprint
+            return True
+        return False
+
+    def get(self, path: Path, columns: Optional[List[str]] = None,
+            uf: Optional[str] = None) -> pd.DataFrame:
+        """Retorna os dados do cache ou os carrega do disco se o arquivo mudou."""
+        path = Path(path).resolve()
+        key = (str(path), tuple(columns) if columns is not None else None, uf)
+        with self._key_lock(key):
+            fingerprint = _file_fingerprint(path)
+            entry = self._entries.get(key)
+            if entry is not None and self._is_current(entry, path, fingerprint):
+                with self._lock:
+                    self.hits += 1
+                count_call("dataset_cache_hit")
+                return entry["df"]
+
+            start = time.perf_counter()
+            count_call("dataset_read")
+            with span("read_dataset", path=path.name, uf=uf):
+                df = sort_by_date(read_processed_data(path, columns=columns, uf=uf))
+            elapsed = time.perf_counter() - start
+            self._entries[key] = {
+                "fingerprint": fingerprint,
+                "content_hash": _content_hash(path) if self.hash_contents else None,
+                "df": df,
+                "derived": {},
+            }
+            with self._lock:
+                self.misses += 1
+                self.load_seconds += elapsed
+                self.last_load_seconds = elapsed
+            print(f"  Dados carregados do disco em {elapsed:.2f}s (cache: {self.misses} carga(s), {self.hits} acerto(s)).")
+            return df
+
+    def derived(self, path: Path, name: str, builder: Callable[[pd.DataFrame], Any],
+                columns: Optional[List[str]] = None, uf: Optional[str] = None) -> Tuple[pd.DataFrame, Any]:
+        """
+        Retorna os dados e uma estrutura derivada deles (ex.: um índice), construída
+        uma única vez por versão do dataset e descartada junto com a entrada.
+        """
+        df = self.get(path, columns=columns, uf=uf)
+        path = Path(path).resolve()
+        key = (str(path), tuple(columns) if columns is not None else None, uf)
+        with self._key_lock(key):
+            entry = self._entries[key]
+            if entry["df"] is not df:
+                return df, builder(df)
+            if name not in entry["derived"]:
+                entry["derived"][name] = builder(df)
+            return df, entry["derived"][name]
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de acertos, faltas e tempo de carga acumulado."""
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                "load_seconds": round(self.load_seconds, 4),
+                "last_load_seconds": round(self.last_load_seconds, 4),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._key_locks.clear()
+            self.hits = self.misses = 0
+            self.load_seconds = self.last_load_seconds = 0.0
+
+
+DATASET_CACHE = DatasetCache(hash_contents=DATA_PROCESSING_CONFIG.get("cache_hash_contents", False))
+
+
+def load_processed_data(path: Path, columns: Optional[List[str]] = None,
+                        uf: Optional[str] = None) -> pd.DataFrame:
+    """
+    Versão em cache de read_processed_data. Em Parquet cada UF é uma entrada (leitura
+    por partição); em CSV e Arrow o arquivo é carregado uma única vez e a UF é filtrada em memória.
+    """
+    if is_parquet_store(Path(path)):
+        return DATASET_CACHE.get(path, columns=columns, uf=uf)
+    df = DATASET_CACHE.get(path, columns=columns)
+    if uf and "uf_notificacao" in df.columns:
+        df = df[df['uf_notificacao'].str.upper() == uf]
+    return df
+
+
+def load_location_data(path: Path, columns: Optional[List[str]] = None,
+                       uf: Optional[str] = None, city: Optional[str] = None) -> pd.DataFrame:
+    """
+    Retorna as linhas de uma UF e/ou município usando o LocationIndex da versão
+    em cache do dataset: o custo é proporcional ao resultado, não ao dataset.
+    `city` deve estar normalizada com normalize_municipality.
+    """
+    partition_uf = uf if is_parquet_store(Path(path)) else None
+    df, index = DATASET_CACHE.derived(path, "location_index", LocationIndex, columns=columns, uf=partition_uf)
+    positions = index.positions(uf=uf, city=city)
+    return df if positions is None else df.take(positions)
+
+
+def get_dataset_cache_stats() -> Dict[str, Any]:
+    return DATASET_CACHE.stats()
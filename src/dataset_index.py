@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Hashable, Optional, Tuple
+from unidecode import unidecode
+
+
+def normalize_uf(value) -> str:
+    return str(value).upper()
+
+
+def normalize_municipality(value) -> str:
+    return unidecode(str(value).lower())
+
+
+class _GroupedPositions:
+    """
+    Layout agrupado de posições: as linhas são ordenadas (de forma estável) pelo
+    código do grupo e cada grupo vira um intervalo contíguo em `order`. Consultar
+    um grupo custa O(tamanho do resultado) e as posições saem em ordem crescente.
+    """
+    def __init__(self, codes: np.ndarray, keys: list):
+        dtype = np.int32 if len(codes) < np.iinfo(np.int32).max else np.int64
+        self.order = np.argsort(codes, kind="stable").astype(dtype, copy=False)
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(keys)))])
+        self.ranges: Dict[Hashable, Tuple[int, int]] = {
+            key: (int(bounds[code]), int(bounds[code + 1])) for code, key in enumerate(keys)
+        }
+
+    def get(self, key: Hashable) -> np.ndarray:
+        start, end = self.ranges.get(key, (0, 0))
+        return self.order[start:end]
+
+
+def _normalized_codes(series: pd.Series, normalize) -> Tuple[np.ndarray, list]:
+    """Normaliza apenas os valores distintos da coluna e devolve um código por linha."""
+    raw_codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    normalized = [normalize(value) for value in uniques]
+    keys = list(dict.fromkeys(normalized))
+    key_codes = {key: code for code, key in enumerate(keys)}
+    mapping = np.array([key_codes[value] for value in normalized], dtype=np.int64)
+    return mapping[raw_codes], keys
+
+
+class LocationIndex:
+    """
+    Índice de localidades construído uma única vez por versão do dataset:
+    UF normalizada, município normalizado (sem acentos, minúsculo) e o par
+    UF + município apontam para as posições das linhas correspondentes.
+    """
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        uf_codes, uf_keys = _normalized_codes(df['uf_notificacao'], normalize_uf)
+        city_codes, city_keys = _normalized_codes(df['municipio_notificacao'], normalize_municipality)
+        pair_codes = uf_codes * len(city_keys) + city_codes
+        pair_codes, pair_uniques = pd.factorize(pair_codes)
+        pair_keys = [(uf_keys[code // len(city_keys)], city_keys[code % len(city_keys)]) for code in pair_uniques]
+
+        self._by_uf = _GroupedPositions(uf_codes, uf_keys)
+        self._by_city = _GroupedPositions(city_codes, city_keys)
+        self._by_uf_city = _GroupedPositions(pair_codes, pair_keys)
+
+    def positions(self, uf: Optional[str] = None, city: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Posições das linhas da localidade. `uf` deve vir em maiúsculas e `city`
+        já normalizada; retorna None quando nenhum filtro é pedido (todas as linhas).
+        """
+        if uf and city:
+            return self._by_uf_city.get((uf, city))
+        if uf:
+            return self._by_uf.get(uf)
+        if city:
+            return self._by_city.get(city)
+        return None
+
+
+DATE_COLUMN = "data_notificacao"
+
+
+def sort_by_date(df: pd.DataFrame, column: str = DATE_COLUMN) -> pd.DataFrame:
+    """
+    Ordena o frame (de forma estável) pela data de notificação, com datas ausentes ao final.
+    Não copia nada se o frame já estiver ordenado.
+    """
+    if column not in df.columns or not pd.api.types.is_datetime64_any_dtype(df[column]):
+        return df
+    dates = df[column].to_numpy()
+    valid = ~np.isnat(dates)
+    n_valid = int(valid.sum())
+    if valid[:n_valid].all() and (np.diff(dates[:n_valid]) >= np.timedelta64(0)).all():
+        return df
+    # O NumPy ordena NaT depois de todas as datas
+    order = np.argsort(dates, kind="stable")
+    return df.take(order).reset_index(drop=True)
+
+
+def epi_weeks(dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ano e semana epidemiológica (domingo a sábado, como SEM_NOT no SINAN) de cada data:
+    a semana 1 é a que contém 4 de janeiro e o ano é o da quarta-feira da semana.
+    """
+    days = np.asarray(dates).astype('datetime64[D]')
+    week_start = days - ((days.astype(np.int64) + 4) % 7).astype('timedelta64[D]')
+    years = (week_start + np.timedelta64(3, 'D')).astype('datetime64[Y]')
+    jan4 = years.astype('datetime64[D]') + np.timedelta64(3, 'D')
+    first_week_start = jan4 - ((jan4.astype(np.int64) + 4) % 7).astype('timedelta64[D]')
+    weeks = (week_start - first_week_start).astype(np.int64) // 7 + 1
+    return years.astype(np.int64) + 1970, weeks
+
+
+class DateIndex:
+    """
+    Índice de datas sobre um frame ordenado por `data_notificacao` (ver sort_by_date):
+    guarda as datas distintas com o deslocamento da primeira linha de cada uma, a
+    contagem acumulada de casos e os deslocamentos de cada semana epidemiológica.
+    Qualquer janela de datas vira, por busca binária, uma fatia contígua de linhas.
+    Com `weights` (ex.: n_casos do cubo), os casos são a soma dos pesos em vez do número de linhas.
+    """
+    def __init__(self, dates: pd.Series, weights: Optional[np.ndarray] = None):
+        values = dates.to_numpy(dtype='datetime64[ns]')
+        self.n_valid = int((~np.isnat(values)).sum())
+        self.dates = values[:self.n_valid]
+        if np.isnat(self.dates).any() or (np.diff(self.dates) < np.timedelta64(0)).any():
+            raise ValueError("DateIndex requer o frame ordenado por data, com datas ausentes ao final.")
+
+        starts = np.flatnonzero(np.concatenate([[True], self.dates[1:] != self.dates[:-1]])) if self.n_valid else np.array([], dtype=np.int64)
+        self.unique_dates = self.dates[starts]
+        self.offsets = np.append(starts, self.n_valid)
+        if weights is None:
+            self.date_counts = np.diff(self.offsets)
+        else:
+            weights = np.asarray(weights)[:self.n_valid]
+            self.date_counts = np.add.reduceat(weights, starts) if self.n_valid else np.array([], dtype=weights.dtype)
+        self.cumulative = np.concatenate([[0], np.cumsum(self.date_counts)])
+
+        years, weeks = epi_weeks(self.unique_dates)
+        week_keys = years * 100 + weeks
+        week_starts = np.flatnonzero(np.concatenate([[True], week_keys[1:] != week_keys[:-1]])) if len(week_keys) else np.array([], dtype=np.int64)
+        self.weeks = list(zip(years[week_starts].tolist(), weeks[week_starts].tolist()))
+        # Posição (em unique_dates) da primeira data de cada semana, e o fim
+        self.week_date_offsets = np.append(week_starts, len(self.unique_dates))
+        self._week_positions = {week: position for position, week in enumerate(self.weeks)}
+
+    @property
+    def empty(self) -> bool:
+        return self.n_valid == 0
+
+    @property
+    def last_date(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self.unique_dates[-1]) if not self.empty else None
+
+    def _date_bounds(self, start=None, end=None) -> Tuple[int, int]:
+        """Intervalo [lo, hi) em unique_dates das datas entre `start` e `end` (inclusive)."""
+        lo = 0 if start is None else int(np.searchsorted(self.unique_dates, np.datetime64(pd.Timestamp(start), 'ns'), 'left'))
+        hi = len(self.unique_dates) if end is None else int(np.searchsorted(self.unique_dates, np.datetime64(pd.Timestamp(end), 'ns'), 'right'))
+        return lo, max(lo, hi)
+
+    def slice(self, start=None, end=None) -> slice:
+        """Fatia de linhas com data entre `start` e `end` (inclusive; None = sem limite)."""
+        lo, hi = self._date_bounds(start, end)
+        return slice(int(self.offsets[lo]), int(self.offsets[hi]))
+
+    def count(self, start=None, end=None) -> int:
+        """Casos entre `start` e `end`, em O(log n)."""
+        lo, hi = self._date_bounds(start, end)
+        return self.cumulative[hi] - self.cumulative[lo]
+
+    def last_days(self, days: int) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """Janela (início, fim) dos últimos `days` dias até a data mais recente, inclusive."""
+        if self.empty:
+            return None, None
+        return self.last_date - pd.Timedelta(days=days), self.last_date
+
+    def daily_counts(self, start=None, end=None) -> pd.Series:
+        """Casos por data (apenas datas com notificações) entre `start` e `end`."""
+        lo, hi = self._date_bounds(start, end)
+        return pd.Series(self.date_counts[lo:hi], index=pd.DatetimeIndex(self.unique_dates[lo:hi], name=DATE_COLUMN))
+
+    def monthly_counts(self) -> pd.Series:
+        """Casos por mês, do primeiro ao último mês com dados (meses vazios com zero), indexados pelo fim do mês."""
+        if self.empty:
+            return pd.Series(dtype=np.int64)
+        months = self.unique_dates.astype('datetime64[M]').astype(np.int64)
+        counts = np.bincount(months - months[0], weights=self.date_counts).astype(np.int64)
+        month_ends = pd.date_range(pd.Timestamp(self.unique_dates[0]), periods=len(counts), freq='ME', name=DATE_COLUMN)
+        return pd.Series(counts, index=month_ends)
+
+    def week_slice(self, year: int, week: int) -> slice:
+        """Fatia de linhas da semana epidemiológica (`year`, `week`); vazia se não houver dados."""
+        position = self._week_positions.get((year, week))
+        if position is None:
+            return slice(0, 0)
+        lo, hi = self.week_date_offsets[position], self.week_date_offsets[position + 1]
+        return slice(int(self.offsets[lo]), int(self.offsets[hi]))
+
+    def weekly_counts(self) -> pd.Series:
+        """Casos por semana epidemiológica com dados, indexados por (ano, semana)."""
+        counts = self.cumulative[self.week_date_offsets[1:]] - self.cumulative[self.week_date_offsets[:-1]]
+        index = pd.MultiIndex.from_tuples(self.weeks, names=["ano_epidemiologico", "semana_epidemiologica"])
+        return pd.Series(counts, index=index)
@@ -0,0 +1,239 @@
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set
+import numpy as np
+import pandas as pd
+from src.data_processor import SragDataProcessor
+from src.data_store import get_processed_data_path, read_processed_data, write_processed_data
+from src.metrics_cube import build_metrics_cube, save_metrics_cube
+
+MISSING_KEY = "Não Informado"
+
+
+def notification_group_keys(uf: pd.Series, notification_date: pd.Series, week: pd.Series) -> pd.Series:
+    """
+    Chave de grupo 'UF|ano|semana_notificacao' usada para comparar extrações.
+    A mesma função é aplicada às linhas brutas e às já processadas.
+    """
+    uf_key = uf.astype(object).where(uf.notna(), MISSING_KEY).astype(str)
+    year_key = notification_date.dt.strftime('%Y').fillna(MISSING_KEY)
+    week_key = week.astype("Int64").astype(str).replace("<NA>", MISSING_KEY)
+    return uf_key + "|" + year_key + "|" + week_key
+
+
+class IncrementalIngestor:
+    """
+    Ingestão incremental de novas extrações semanais do OpenDataSUS.
+
+    Cada extração é resumida por grupo (UF, ano, semana_notificacao) em um digest
+    independente da ordem das linhas (quantidade + soma dos hashes das linhas).
+    Apenas os grupos novos ou alterados em relação ao manifesto são reprocessados
+    e substituídos no dataset limpo e no cubo de métricas; os demais permanecem intactos.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.manifest_path = Path(config["ingest_manifest_path"])
+        self.output_path = get_processed_data_path(config)
+        self.file_format = config.get("output_format", "csv")
+
+    def _read_raw(self, raw_path: Path, as_text: bool) -> Iterator[pd.DataFrame]:
+        relevant_features = set(self.config["relevant_features"])
+        return pd.read_csv(raw_path, sep=self.config.get("separator", ","), encoding='ISO-8859-1',
+                           usecols=lambda col: col in relevant_features,
+                           dtype=str if as_text else self.config.get("raw_data_types"),
+                           chunksize=self.config.get("chunk_size", 250_000))
+
+    @staticmethod
+    def _raw_group_keys(chunk: pd.DataFrame) -> pd.Series:
+        return notification_group_keys(
+            chunk['SG_UF_NOT'],
+            pd.to_datetime(chunk['DT_NOTIFIC'], errors='coerce'),
+            pd.to_numeric(chunk['SEM_NOT'], errors='coerce'),
+        )
+
+    def load_manifest(self) -> Dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {"groups": {}, "extracts": [], "watermark": {}}
+        with open(self.manifest_path, encoding='utf-8') as handle:
+            return json.load(handle)
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        os.makedirs(self.manifest_path.parent, exist_ok=True)
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding='utf-8') as handle:
+            json.dump(manifest, handle, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def compute_group_digests(self, raw_path: Path) -> Dict[str, str]:
+        """Primeira passagem: digest por grupo, lendo o arquivo bruto em blocos como texto."""
+        partials = []
+        for chunk in self._read_raw(raw_path, as_text=True):
+            hashes = pd.util.hash_pandas_object(chunk[sorted(chunk.columns)], index=False).to_numpy()
+            # Somas das metades de 32 bits em int64: exatas e independentes da ordem das linhas
+            partials.append(pd.DataFrame({
+                "key": self._raw_group_keys(chunk).to_numpy(), "linhas": 1,
+                "hi": (hashes >> np.uint64(32)).astype(np.int64),
+                "lo": (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64),
+            }).groupby("key").sum())
+        if not partials:
+            return {}
+        totals = pd.concat(partials).groupby(level=0).sum()
+        return {key: f"{row.linhas}:{row.hi:x}:{row.lo:x}" for key, row in zip(totals.index, totals.itertuples())}
+
+    def _process_delta(self, raw_path: Path, changed: Set[str]) -> pd.DataFrame:
+        """Segunda passagem: lê apenas as linhas dos grupos alterados e aplica o pipeline de limpeza."""
+        delta_chunks = []
+        for chunk in self._read_raw(raw_path, as_text=False):
+            selected = chunk[self._raw_group_keys(chunk).isin(changed).to_numpy()]
+            if not selected.empty:
+                delta_chunks.append(selected)
+        if not delta_chunks:
+            return pd.DataFrame()
+        processor = SragDataProcessor(config=self.config)
+        processor.df = pd.concat(delta_chunks, ignore_index=True)
+        (processor.select_and_rename_features()
+                  .clean_and_convert_types()
+                  ._normalize_age()
+                  .handle_missing_values())
+        return processor.df
+
+    @staticmethod
+    def _processed_group_keys(df: pd.DataFrame) -> pd.Series:
+        return notification_group_keys(df['uf_notificacao'], df['data_notificacao'], df['semana_notificacao'])
+
+    def _temporary_sibling(self) -> Path:
+        """Caminho temporário ao lado da saída (mesmo sistema de arquivos, para o os.replace)."""
+        return self.output_path.with_name(f".{self.output_path.name}.tmp-{uuid.uuid4().hex}")
+
+    def _replace_store_file(self, merged: pd.DataFrame) -> None:
+        """Grava o dataset inteiro (CSV ou Arrow) em um arquivo temporário e só então o troca pelo atual."""
+        temporary = self._temporary_sibling()
+        try:
+            write_processed_data(merged, temporary, file_format=self.file_format)
+            os.replace(temporary, self.output_path)
+        finally:
+            if temporary.exists():
+                temporary.unlink()
+
+    def _replace_partition(self, partition_dir: Path, partition: Optional[pd.DataFrame]) -> None:
+        """
+        Grava a partição reconstruída em um diretório temporário e só depois do sucesso a troca
+        pela atual; uma falha na gravação mantém a partição anterior intacta.
+        """
+        staging = self._temporary_sibling()
+        backup = self._temporary_sibling()
+        try:
+            new_dir = None
+            if partition is not None:
+                write_processed_data(partition, staging, file_format="parquet",
+                                     partition_cols=self.config.get("partition_columns"))
+                new_dir = next(path for path in staging.glob("*/*") if path.is_dir())
+                partition_dir = self.output_path / new_dir.relative_to(staging)
+            if partition_dir.exists():
+                os.replace(partition_dir, backup)
+            if new_dir is not None:
+                os.makedirs(partition_dir.parent, exist_ok=True)
+                try:
+                    os.replace(new_dir, partition_dir)
+                except OSError:
+                    if backup.exists():
+                        os.replace(backup, partition_dir)
+                    raise
+        finally:
+            for path in (staging, backup):
+                if path.exists():
+                    shutil.rmtree(path)
+
+    def _merge_into_store(self, delta: pd.DataFrame, changed: Set[str]) -> pd.DataFrame:
+        """
+        Substitui os grupos alterados no dataset limpo e retorna as linhas resultantes das
+        partições (UF, ano) afetadas. Em Parquet, apenas essas partições são reescritas.
+        A nova versão é gravada ao lado e trocada pela atual só depois de gravada: uma falha
+        no meio mantém os dados anteriores e o manifesto (gravado ao final) faz a próxima
+        execução refazer os mesmos grupos.
+        """
+        affected_partitions = {tuple(key.split("|")[:2]) for key in changed}
+        if self.file_format != "parquet":
+            current = read_processed_data(self.output_path) if self.output_path.exists() else pd.DataFrame()
+            if not current.empty:
+                current = current[~self._processed_group_keys(current).isin(changed).to_numpy()]
+            merged = pd.concat([current, delta], ignore_index=True)
+            self._replace_store_file(merged)
+            partition_keys = self._processed_group_keys(merged).str.rsplit("|", n=1).str[0]
+            return merged[partition_keys.isin({"|".join(p) for p in affected_partitions}).to_numpy()]
+
+        rewritten = []
+        delta_partitions = (self._processed_group_keys(delta).str.rsplit("|", n=1).str[0]
+                            if not delta.empty else pd.Series(dtype=str))
+        for uf, year in sorted(affected_partitions):
+            partition_dir = self.output_path / f"uf_notificacao={uf}" / f"ano_notificacao={year}"
+            current = pd.DataFrame()
+            if partition_dir.exists():
+                current = read_processed_data(self.output_path, uf=uf, filters=[("ano_notificacao", "==", year)])
+                current = current.drop(columns=["ano_notificacao"])
+                current = current[~self._processed_group_keys(current).isin(changed).to_numpy()]
+            incoming = delta[(delta_partitions == f"{uf}|{year}").to_numpy()] if not delta.empty else delta
+            frames = [frame for frame in (current, incoming) if not frame.empty]
+            partition = pd.concat(frames, ignore_index=True) if frames else None
+            self._replace_partition(partition_dir, partition)
+            if partition is not None:
+                rewritten.append(partition)
+        return pd.concat(rewritten, ignore_index=True) if rewritten else pd.DataFrame()
+
+    def _refresh_cube(self, affected_rows: pd.DataFrame, changed: Set[str]) -> None:
+        """Recalcula no cubo apenas as células das partições (UF, ano) afetadas."""
+        cube_path = Path(self.config["cube_output_path"])
+        if not cube_path.exists():
+            return
+        cube = pd.read_parquet(cube_path)
+        affected_partitions = {"|".join(key.split("|")[:2]) for key in changed}
+        cube_partitions = (cube['uf_notificacao'].astype(str) + "|"
+                           + cube['data_notificacao'].dt.strftime('%Y').fillna(MISSING_KEY))
+        cube = cube[~cube_partitions.isin(affected_partitions).to_numpy()]
+        parts = [cube.astype({"uf_notificacao": object, "municipio_notificacao": object})]
+        if not affected_rows.empty:
+            parts.append(build_metrics_cube(affected_rows))
+        refreshed = pd.concat(parts, ignore_index=True)
+        measure_cols = [col for col in refreshed.columns if col.startswith("n_")]
+        refreshed[measure_cols] = refreshed[measure_cols].fillna(0).astype(np.int64)
+        refreshed["soma_atraso_notificacao"] = refreshed["soma_atraso_notificacao"].fillna(0.0)
+        save_metrics_cube(refreshed.sort_values(["uf_notificacao", "municipio_notificacao", "data_notificacao"],
+                                                ignore_index=True), cube_path)
+        print(f"Cubo de métricas atualizado para {len(affected_partitions)} partição(ões).")
+
+    def ingest(self, raw_path: Optional[Path] = None) -> Dict[str, Any]:
+        """Ingere uma extração: detecta os grupos novos/alterados, processa o delta e atualiza o manifesto."""
+        raw_path = Path(raw_path or self.config["file_path"])
+        print(f"\nINICIANDO INGESTÃO INCREMENTAL DE: {raw_path}")
+        manifest = self.load_manifest()
+        if not manifest["groups"]:
+            print("Manifesto inexistente: todos os grupos da extração serão processados.")
+
+        digests = self.compute_group_digests(raw_path)
+        changed = {key for key, digest in digests.items() if manifest["groups"].get(key) != digest}
+        print(f"{len(digests)} grupos (UF, ano, semana) na extração; {len(changed)} novos ou alterados.")
+
+        delta_rows = 0
+        if changed:
+            delta = self._process_delta(raw_path, changed)
+            delta_rows = len(delta)
+            affected_rows = self._merge_into_store(delta, changed)
+            self._refresh_cube(affected_rows, changed)
+            manifest["groups"].update({key: digests[key] for key in changed})
+
+        known_keys = [key.split("|") for key in manifest["groups"] if MISSING_KEY not in key]
+        if known_keys:
+            year, week = max((int(year), int(week)) for _, year, week in known_keys)
+            manifest["watermark"] = {"ano": year, "semana_notificacao": week}
+        summary = {
+            "arquivo": str(raw_path), "ingerido_em": datetime.now().isoformat(timespec="seconds"),
+            "grupos_alterados": len(changed), "linhas_processadas": delta_rows,
+        }
+        manifest["extracts"].append(summary)
+        self._save_manifest(manifest)
+        print(f"INGESTÃO INCREMENTAL FINALIZADA: {delta_rows} registros processados.\n")
+        return summary
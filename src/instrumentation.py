@@ -0,0 +1,384 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import numpy as np
+from src.config import INSTRUMENTATION_CONFIG
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Trecho em execução no contexto atual; threads do LangGraph e asyncio.to_thread herdam o contexto
+_CURRENT: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("srag_current_span", default=None)
+
+# Pico de memória: o tracemalloc tem um único pico por processo, então ele é lido (e zerado)
+# a cada início/fim de trecho e repassado a todos os trechos abertos naquele momento
+_MEMORY_LOCK = threading.Lock()
+_OPEN_SPANS: "set[Span]" = set()
+_MEMORY_RUNS = 0
+
+
+def _sample_memory_peak() -> None:
+    _, peak = tracemalloc.get_traced_memory()
+    for open_span in _OPEN_SPANS:
+        open_span._memory_peak = max(open_span._memory_peak, peak)
+    tracemalloc.reset_peak()
+
+
+class Span:
+    """
+    Trecho medido de uma execução (o relatório inteiro, um nó do grafo, uma ferramenta ou
+    uma chamada ao LLM): tempo de parede, tempo de CPU da thread que o executou, pico de
+    memória do processo acima do início do trecho e memória retida ao final (se o tracemalloc
+    estiver ativo; em ramos paralelos inclui o que os outros ramos alocaram), contagem de
+    chamadas externas e atributos.
+    """
+    def __init__(self, name: str, kind: str, parent: Optional["Span"] = None, **attributes: Any):
+        self.name = name
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.calls: Counter = Counter()
+        self.children: List["Span"] = []
+        self.error: Optional[str] = None
+        self.started_at = datetime.now().isoformat(timespec="milliseconds")
+        self.wall_seconds: Optional[float] = None
+        self.cpu_seconds: Optional[float] = None
+        self.peak_memory_mb: Optional[float] = None
+        self.memory_delta_mb: Optional[float] = None
+        self._lock = threading.Lock()
+        self._memory_base = self._memory_peak = 0
+        self._traced = False
+        if parent is not None:
+            with parent._lock:
+                parent.children.append(self)
+
+    def start(self) -> "Span":
+        if tracemalloc.is_tracing():
+            with _MEMORY_LOCK:
+                _sample_memory_peak()
+                self._memory_base = self._memory_peak = tracemalloc.get_traced_memory()[0]
+                _OPEN_SPANS.add(self)
+                self._traced = True
+        self._start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        return self
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.wall_seconds = round(time.perf_counter() - self._start, 6)
+        self.cpu_seconds = round(time.thread_time() - self._cpu_start, 6)
+        if self._traced and tracemalloc.is_tracing():
+            with _MEMORY_LOCK:
+                _sample_memory_peak()
+                _OPEN_SPANS.discard(self)
+                current = tracemalloc.get_traced_memory()[0]
+            self.peak_memory_mb = round(max(0, self._memory_peak - self._memory_base) / 2**20, 3)
+            self.memory_delta_mb = round((current - self._memory_base) / 2**20, 3)
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def count(self, kind: str, n: int = 1) -> None:
+        with self._lock:
+            self.calls[kind] += n
+
+    def set(self, **attributes: Any) -> None:
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def total_calls(self) -> Counter:
+        """Chamadas externas deste trecho e de todos os trechos internos."""
+        with self._lock:
+            total, children = Counter(self.calls), list(self.children)
+        for child in children:
+            total.update(child.total_calls())
+        return total
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name, "kind": self.kind, "started_at": self.started_at,
+            "wall_seconds": self.wall_seconds, "cpu_seconds": self.cpu_seconds,
+            "peak_memory_mb": self.peak_memory_mb, "memory_delta_mb": self.memory_delta_mb,
+            "calls": dict(self.total_calls()),
+            "attributes": self.attributes, "error": self.error,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+def current_span() -> Optional[Span]:
+    return _CURRENT.get()
+
+
+def count_call(kind: str, n: int = 1) -> None:
+    """Conta uma chamada externa (ex.: "search_api", "llm_api") no trecho atual, se houver um."""
+    active = _CURRENT.get()
+    if active is not None:
+        active.count(kind, n)
+
+
+@contextmanager
+def span(name: str, kind: str = "tool", **attributes: Any) -> Iterator[Span]:
+    """
+    Mede o bloco como um trecho filho do trecho atual. Fora de uma execução rastreada
+    (trace_run) o trecho é medido e descartado, então os chamadores não precisam testar.
+    """
+    parent = _CURRENT.get()
+    current = Span(name, kind, parent, **attributes).start()
+    token = _CURRENT.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(e)
+        raise
+    else:
+        current.finish()
+    finally:
+        _reset(token)
+
+
+def traced(name: str, kind: str = "tool") -> Callable:
+    """Decorador: cada chamada da função (síncrona ou assíncrona) vira um trecho `span(name, kind)`."""
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _reset(token: contextvars.Token) -> None:
+    try:
+        _CURRENT.reset(token)
+    except ValueError:
+        # Gerador encerrado em outro contexto (ex.: stream abandonado e coletado depois)
+        pass
+
+
+def _summary(run_id: str, root: Span) -> Dict[str, Any]:
+    """Linha do histórico: uma amostra por trecho, usada nos percentis entre execuções."""
+    samples = [{"name": f"{item.kind}:{item.name}", "wall_seconds": item.wall_seconds,
+                "cpu_seconds": item.cpu_seconds, "peak_memory_mb": item.peak_memory_mb}
+               for item in root.walk()]
+    llm_spans = [item for item in root.walk() if item.kind == "llm"]
+    tokens = Counter()
+    for item in llm_spans:
+        tokens.update(item.attributes.get("tokens") or {})
+    return {
+        "run_id": run_id, "name": root.name, "started_at": root.started_at, "attributes": root.attributes,
+        "wall_seconds": root.wall_seconds, "error": root.error, "calls": dict(root.total_calls()),
+        "llm": {"calls": len(llm_spans), "retries": sum(item.attributes.get("retries", 0) for item in llm_spans),
+                "providers": dict(Counter(item.attributes.get("provider") or "nenhum" for item in llm_spans)),
+                "tokens": dict(tokens)},
+        "spans": samples,
+    }
+
+
+class TraceRecorder:
+    """
+    Guarda as execuções rastreadas: cada uma vira um JSON com a árvore completa de trechos
+    em `trace_dir`, e um resumo por execução é anexado a `history.jsonl` (e mantido em
+    memória, até `max_history`) para o cálculo de percentis entre execuções.
+    Em disco ficam os `max_history` JSONs mais recentes; o histórico é reescrito com as
+    últimas `max_history` linhas quando passa do dobro disso.
+    """
+    def __init__(self, trace_dir: Path, max_history: int = 500, write_files: bool = True):
+        self.trace_dir = Path(trace_dir)
+        self.write_files = write_files
+        self.history: deque = deque(maxlen=max_history)
+        self._lock = threading.Lock()
+        self._history_lines: Optional[int] = None
+
+    @property
+    def history_path(self) -> Path:
+        return self.trace_dir / "history.jsonl"
+
+    def record(self, root: Span) -> Dict[str, Any]:
+        run_id = uuid.uuid4().hex[:12]
+        summary = _summary(run_id, root)
+        with self._lock:
+            self.history.append(summary)
+        if self.write_files:
+            try:
+                os.makedirs(self.trace_dir, exist_ok=True)
+                path = self.trace_dir / f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{run_id}.json"
+                with open(path, "w", encoding="utf-8") as handle:
+                    json.dump({"run_id": run_id, **root.to_dict(), "summary": summary},
+                              handle, ensure_ascii=False, indent=2, default=str)
+                with self._lock:
+                    self._append_history(summary)
+                    self._prune_traces()
+                summary["trace_path"] = str(path)
+                print(f"Trace da execução salvo em: {path}")
+            except OSError as e:
+                print(f"AVISO: não foi possível gravar o trace da execução. Erro: {e}")
+        return summary
+
+    def _append_history(self, summary: Dict[str, Any]) -> None:
+        if self._history_lines is None:
+            try:
+                with open(self.history_path, encoding="utf-8") as handle:
+                    self._history_lines = sum(1 for _ in handle)
+            except FileNotFoundError:
+                self._history_lines = 0
+        with open(self.history_path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+        self._history_lines += 1
+        keep = self.history.maxlen
+        if keep and self._history_lines > 2 * keep:
+            with open(self.history_path, encoding="utf-8") as handle:
+                lines = deque(handle, maxlen=keep)
+            temporary = self.history_path.with_name(f".{self.history_path.name}.{uuid.uuid4().hex}.tmp")
+            try:
+                with open(temporary, "w", encoding="utf-8") as handle:
+                    handle.writelines(lines)
+                os.replace(temporary, self.history_path)
+            finally:
+                if temporary.exists():
+                    temporary.unlink()
+            self._history_lines = len(lines)
+
+    def _prune_traces(self) -> None:
+        """Remove os JSONs de trace além dos `max_history` mais recentes (o nome começa pela data)."""
+        if not self.history.maxlen:
+            return
+        traces = sorted(self.trace_dir.glob("trace_*.json"), key=lambda path: path.name)
+        for path in traces[:-self.history.maxlen]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def load_history(self, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Resumos gravados em disco (ou os em memória, sem arquivo), limitados às `last`
+        execuções mais recentes (padrão: `max_history`).
+        """
+        last = last or self.history.maxlen
+        if self.write_files and self.history_path.exists():
+            with open(self.history_path, encoding="utf-8") as handle:
+                lines = deque((line for line in handle if line.strip()), maxlen=last)
+            runs = [json.loads(line) for line in lines]
+        else:
+            with self._lock:
+                runs = list(self.history)
+        return runs[-last:] if last else runs
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    points = np.percentile(np.asarray(values, dtype=float), PERCENTILES)
+    return {f"p{p}": round(float(value), 4) for p, value in zip(PERCENTILES, points)}
+
+
+def aggregate_traces(runs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Percentis de tempo de parede, CPU e memória por trecho ("node:fetch_news", "llm:invoke"...)."""
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    for run in runs:
+        for sample in run.get("spans", []):
+            metrics = samples.setdefault(sample["name"], {"wall_seconds": [], "cpu_seconds": [], "peak_memory_mb": []})
+            for key, values in metrics.items():
+                if sample.get(key) is not None:
+                    values.append(sample[key])
+    return {
+        name: {"amostras": len(metrics["wall_seconds"]),
+               **{key: _percentiles(values) for key, values in metrics.items() if values}}
+        for name, metrics in sorted(samples.items())
+    }
+
+
+TRACE_RECORDER = TraceRecorder(INSTRUMENTATION_CONFIG["trace_dir"],
+                               max_history=INSTRUMENTATION_CONFIG.get("max_history", 500),
+                               write_files=INSTRUMENTATION_CONFIG.get("write_files", True))
+
+
+@contextmanager
+def measured_root(name: str, kind: str = "run", trace_memory: bool = True, **attributes: Any) -> Iterator[Span]:
+    """
+    Abre um trecho raiz: os trechos abertos dentro do bloco, inclusive em threads que
+    herdam o contexto, formam sua árvore. Com `trace_memory`, liga o tracemalloc durante o bloco.
+    """
+    global _MEMORY_RUNS
+    # O tracemalloc é ligado pela primeira raiz medida e desligado pela última;
+    # se já estava ativo por outro motivo (ex.: benchmarks), é apenas lido
+    uses_memory = False
+    if trace_memory:
+        with _MEMORY_LOCK:
+            if _MEMORY_RUNS or not tracemalloc.is_tracing():
+                if _MEMORY_RUNS == 0:
+                    tracemalloc.start()
+                _MEMORY_RUNS += 1
+                uses_memory = True
+    root = Span(name, kind, None, **attributes).start()
+    token = _CURRENT.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.finish(e)
+        raise
+    else:
+        root.finish()
+    finally:
+        _reset(token)
+        if uses_memory:
+            with _MEMORY_LOCK:
+                _MEMORY_RUNS -= 1
+                if _MEMORY_RUNS == 0:
+                    tracemalloc.stop()
+                    _OPEN_SPANS.clear()
+
+
+@contextmanager
+def trace_run(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Rastreia uma execução completa (ex.: um relatório) e grava sua árvore de trechos ao final.
+    Com INSTRUMENTATION_CONFIG["enabled"] = False não mede nada e produz None.
+    """
+    if not INSTRUMENTATION_CONFIG.get("enabled", True):
+        yield None
+        return
+    root = None
+    try:
+        with measured_root(name, trace_memory=INSTRUMENTATION_CONFIG.get("trace_memory", True),
+                           **attributes) as root:
+            yield root
+    finally:
+        if root is not None:
+            TRACE_RECORDER.record(root)
+
+
+def get_trace_stats(last: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    return aggregate_traces(TRACE_RECORDER.load_history(last))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Percentis por trecho das execuções rastreadas.")
+    parser.add_argument("--last", type=int, default=None, help="Considera apenas as N execuções mais recentes.")
+    args = parser.parse_args()
+    runs = TRACE_RECORDER.load_history(args.last)
+    print(f"{len(runs)} execução(ões) em {TRACE_RECORDER.history_path}\n")
+    print(f"{'trecho':<42} {'n':>4} {'p50':>9} {'p90':>9} {'p95':>9} {'p99':>9} {'CPU p50':>9} {'mem p95':>9}")
+    for name, stats in get_trace_stats(args.last).items():
+        wall, cpu, memory = stats.get("wall_seconds", {}), stats.get("cpu_seconds", {}), stats.get("peak_memory_mb", {})
+        print(f"{name:<42} {stats['amostras']:>4} {wall.get('p50', 0):>8.3f}s {wall.get('p90', 0):>8.3f}s "
+              f"{wall.get('p95', 0):>8.3f}s {wall.get('p99', 0):>8.3f}s {cpu.get('p50', 0):>8.3f}s "
+              f"{memory.get('p95', 0):>7.1f}MB")
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from src.config import LLM_CACHE_CONFIG
+
+
+def render_prompt(prompt_template, input_dict: Dict[str, Any]) -> Optional[str]:
+    """Texto final do prompt (template + entradas), ou None se não puder ser formatado."""
+    try:
+        return prompt_template.format_prompt(**input_dict).to_string()
+    except Exception:
+        return None
+
+
+def response_cache_key(rendered_prompt: str, provider: str, model: str) -> str:
+    return hashlib.sha256(f"{provider}\x1f{model}\x1f{rendered_prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Cache persistente (SQLite) das respostas do LLM, por prompt renderizado, provedor e modelo.
+    Entradas expiram após `ttl_seconds`; acima de `max_entries` as menos usadas
+    recentemente são removidas. Pode ser compartilhado entre processos.
+    """
+    def __init__(self, path: Path, ttl_seconds: float = 86_400, max_entries: int = 5_000):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        os.makedirs(self.path.parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                " chave TEXT PRIMARY KEY, provedor TEXT, modelo TEXT, conteudo TEXT,"
+                " criado_em REAL, ultimo_acesso REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acesso ON respostas (ultimo_acesso)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Conexão curta por operação (com commit ao final), segura entre threads e processos."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, *keys: str) -> Optional[str]:
+        """
+        Retorna a primeira resposta válida entre as chaves (ex.: uma por provedor da cadeia
+        de fallback), ou None se todas estiverem ausentes ou expiradas. Conta um acerto ou uma falta.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            for key in keys:
+                row = conn.execute("SELECT conteudo, criado_em FROM respostas WHERE chave = ?", (key,)).fetchone()
+                if row is None:
+                    continue
+                if now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM respostas WHERE chave = ?", (key,))
+                    self.expired += 1
+                    continue
+                conn.execute("UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (now, key))
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, provider: str, model: str, content: str) -> None:
+        """Grava a resposta e aplica o limite de tamanho (LRU)."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?)",
+                         (key, provider, model, content, now, now))
+            excess = conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM respostas WHERE chave IN ("
+                             " SELECT chave FROM respostas ORDER BY ultimo_acesso LIMIT ?)", (excess,))
+                self.evicted += excess
+
+    def stats(self) -> Dict[str, Any]:
+        """Acertos, faltas, expirações e remoções desde o início do processo."""
+        with self._lock, self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits, "misses": self.misses, "expired": self.expired, "evicted": self.evicted,
+                "entries": entries, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM respostas")
+            self.hits = self.misses = self.expired = self.evicted = 0
+
+
+_LLM_CACHE: Optional[LLMResponseCache] = None
+_LLM_CACHE_LOCK = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Cache global do processo, criado no primeiro uso; None quando desativado na configuração."""
+    global _LLM_CACHE
+    if not LLM_CACHE_CONFIG.get("enabled", True):
+        return None
+    with _LLM_CACHE_LOCK:
+        if _LLM_CACHE is None:
+            _LLM_CACHE = LLMResponseCache(LLM_CACHE_CONFIG["path"],
+                                          ttl_seconds=LLM_CACHE_CONFIG.get("ttl_seconds", 86_400),
+                                          max_entries=LLM_CACHE_CONFIG.get("max_entries", 5_000))
+        return _LLM_CACHE
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {}
@@ -1,32 +1,311 @@
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 from langchain_ollama import ChatOllama
 from google.api_core.exceptions import ResourceExhausted, GoogleAPICallError
+from src.config import LLM_PROVIDER_CONFIG
+from src.llm_cache import get_llm_cache, render_prompt, response_cache_key
+from src.instrumentation import count_call, current_span, traced
 
-def invoke_llm_with_fallback(prompt_template, input_dict):
+GEMINI_MODEL = "gemini-1.5-flash"
+GROQ_MODEL = "llama-3.1-8b-instant"
+
+
+class LLMProvider:
     """
-    Tenta invocar a cadeia com o Google Gemini. Se falhar, tenta o Groq.
+    Provedor de LLM com cliente de longa duração (criado no primeiro uso e reutilizado),
+    estatísticas de latência e erros e um circuit breaker: após `failure_threshold` falhas
+    seguidas (ou uma falha de cota, em `trip_errors`) o provedor é pulado por
+    `cooldown_seconds`. Depois da espera ele volta a ser tentado; um sucesso fecha o circuito.
+    """
+    def __init__(self, name: str, label: str, model: str, factory: Callable[[], Any],
+                 fallback_errors: Tuple[Type[BaseException], ...] = (Exception,),
+                 trip_errors: Tuple[Type[BaseException], ...] = (),
+                 failure_threshold: int = 3, cooldown_seconds: float = 300):
+        self.name = name
+        self.label = label
+        self.model = model
+        self.factory = factory
+        self.fallback_errors = fallback_errors
+        self.trip_errors = trip_errors
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._client = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.total_latency = 0.0
+        self.open_until = 0.0
+        self.last_error = None
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self.factory()
+            return self._client
+
+    def is_available(self) -> bool:
+        """Circuito fechado, ou aberto com a espera já encerrada (nova tentativa)."""
+        with self._lock:
+            return time.monotonic() >= self.open_until
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_latency += latency
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self, latency: float, error: BaseException) -> None:
+        """Conta a falha nas estatísticas; só erros do provedor (`fallback_errors`) contam para o circuito."""
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.total_latency += latency
+            self.last_error = f"{type(error).__name__}: {error}"
+            if not isinstance(error, self.fallback_errors):
+                # Erros da chamada (prompt, validação) não dizem nada sobre a saúde do provedor
+                return
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold or isinstance(error, self.trip_errors):
+                self.open_until = time.monotonic() + self.cooldown_seconds
+                print(f"AVISO: {self.label} desativado por {self.cooldown_seconds:.0f}s após falhas consecutivas.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            remaining = max(0.0, self.open_until - time.monotonic())
+            return {
+                "model": self.model, "calls": self.calls, "failures": self.failures,
+                "error_rate": round(self.failures / self.calls, 4) if self.calls else 0.0,
+                "avg_latency_seconds": round(self.total_latency / self.calls, 4) if self.calls else None,
+                "circuit": "open" if remaining > 0 else "closed",
+                "cooldown_remaining_seconds": round(remaining, 1), "last_error": self.last_error,
+            }
+
+
+class ProviderRegistry:
+    """Provedores em ordem de prioridade; a cadeia de fallback pula os que estão com o circuito aberto."""
+    def __init__(self, providers: List[LLMProvider]):
+        self.providers = providers
+
+    def candidates(self) -> List[LLMProvider]:
+        available = [provider for provider in self.providers if provider.is_available()]
+        # Com todos os circuitos abertos, tenta todos mesmo assim em vez de falhar sem chamar nenhum
+        return available or list(self.providers)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {provider.name: provider.stats() for provider in self.providers}
+
+
+LLM_PROVIDERS = ProviderRegistry([
+    LLMProvider("google_gemini", "Google Gemini", GEMINI_MODEL,
+                lambda: ChatGoogleGenerativeAI(model=GEMINI_MODEL, temperature=0.7, max_retries=0),
+                fallback_errors=(ResourceExhausted, GoogleAPICallError), trip_errors=(ResourceExhausted,),
+                failure_threshold=LLM_PROVIDER_CONFIG.get("failure_threshold", 3),
+                cooldown_seconds=LLM_PROVIDER_CONFIG.get("cooldown_seconds", 300)),
+    LLMProvider("groq", "Groq com Llama 3.1", GROQ_MODEL,
+                lambda: ChatGroq(model_name=GROQ_MODEL, temperature=0.7),
+                failure_threshold=LLM_PROVIDER_CONFIG.get("failure_threshold", 3),
+                cooldown_seconds=LLM_PROVIDER_CONFIG.get("cooldown_seconds", 300)),
+])
+
+
+def get_llm_provider_stats() -> Dict[str, Dict[str, Any]]:
+    return LLM_PROVIDERS.stats()
+
+def _cached_response(prompt_template, input_dict, use_cache):
+    """
+    Procura uma resposta em cache para o prompt em qualquer provedor da cadeia de fallback.
+    Retorna (resposta ou None, prompt renderizado ou None se o cache não se aplica).
     """
-    # TENTATIVA 1 GOOGLE GEMINI 
+    if not use_cache:
+        return None, None
     try:
-        print("Tentando LLM primário (Google Gemini)...")
-        llm_gemini = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.7, max_retries=0)
-        chain = prompt_template | llm_gemini
-        response = chain.invoke(input_dict)
-        print("Sucesso com Gemini.")
-        return response.content
-    except (ResourceExhausted, GoogleAPICallError) as e:
-        print(f"AVISO: API do Google Gemini falhou. Acionando fallback 1. Erro: {e}")
+        # O cache é criado no primeiro uso (diretório, conexão e schema) e também pode falhar
+        cache = get_llm_cache()
+        rendered = render_prompt(prompt_template, input_dict) if cache is not None else None
+        if rendered is None:
+            return None, None
+        content = cache.get(*(response_cache_key(rendered, provider.name, provider.model)
+                              for provider in LLM_PROVIDERS.providers))
+        if content is not None:
+            print("Resposta do LLM obtida do cache.")
+            count_call("llm_cache_hit")
+            if current_span() is not None:
+                current_span().set(cache_hit=True)
+            return content, rendered
+    except (sqlite3.Error, OSError) as e:
+        print(f"AVISO: cache de respostas do LLM indisponível. Erro: {e}")
+        return None, None
+    return None, rendered
 
-    # TENTATIVA 2: GROQ
+def _store_response(rendered, provider, model, content):
+    if rendered is None or not content:
+        return
     try:
-        print("Tentando LLM de fallback (Groq com Llama 3.1)")
-    
-        llm_groq = ChatGroq(model_name="llama-3.1-8b-instant", temperature=0.7)
-        chain = prompt_template | llm_groq
-        response = chain.invoke(input_dict)
-        print("Sucesso com Groq.")
+        cache = get_llm_cache()
+        if cache is not None:
+            cache.set(response_cache_key(rendered, provider, model), provider, model, content)
+    except (sqlite3.Error, OSError) as e:
+        print(f"AVISO: não foi possível gravar a resposta no cache do LLM. Erro: {e}")
+
+def _usage(message) -> Dict[str, int]:
+    """Tokens informados pelo provedor (usage_metadata do LangChain), zerados se ausentes."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return {key: int(usage.get(key) or 0) for key in ("input_tokens", "output_tokens", "total_tokens")}
+
+def _trace_attempt(provider: LLMProvider, latency: float, error: Optional[BaseException] = None,
+                   tokens: Optional[Dict[str, int]] = None) -> None:
+    """Registra a tentativa no trecho "llm" atual: provedor, latência, erro, tokens e novas tentativas."""
+    llm_span = current_span()
+    count_call("llm_api")
+    if llm_span is None:
+        return
+    attempts = llm_span.attributes.get("attempts", []) + [{
+        "provider": provider.name, "model": provider.model, "seconds": round(latency, 4),
+        "status": "erro" if error is not None else "ok",
+        **({"error": f"{type(error).__name__}: {error}"} if error is not None else {}),
+    }]
+    llm_span.set(attempts=attempts, retries=len(attempts) - 1)
+    if error is None:
+        llm_span.set(provider=provider.name, model=provider.model, tokens=tokens or {})
+
+def _handle_success(provider: LLMProvider, start: float, tokens: Optional[Dict[str, int]] = None) -> None:
+    latency = time.perf_counter() - start
+    provider.record_success(latency)
+    _trace_attempt(provider, latency, tokens=tokens)
+    print(f"Sucesso com {provider.label}.")
+
+def _handle_failure(provider: LLMProvider, start: float, error: BaseException) -> None:
+    """Registra a falha e relança erros que não acionam o fallback."""
+    latency = time.perf_counter() - start
+    provider.record_failure(latency, error)
+    _trace_attempt(provider, latency, error=error)
+    if not isinstance(error, provider.fallback_errors):
+        raise error
+    print(f"AVISO: API do {provider.label} falhou. Acionando próximo provedor. Erro: {error}")
+
+@traced("invoke", kind="llm")
+def invoke_llm_with_fallback(prompt_template, input_dict, use_cache=True):
+    """
+    Tenta invocar a cadeia com o Google Gemini. Se falhar, tenta o Groq.
+    Provedores com o circuito aberto são pulados. Respostas ficam no cache
+    persistente; use_cache=False ignora o cache na chamada.
+    """
+    cached, rendered = _cached_response(prompt_template, input_dict, use_cache)
+    if cached is not None:
+        return cached
+
+    for provider in LLM_PROVIDERS.candidates():
+        print(f"Tentando LLM {provider.label}...")
+        start = time.perf_counter()
+        try:
+            response = (prompt_template | provider.client).invoke(input_dict)
+        except Exception as e:
+            _handle_failure(provider, start, e)
+            continue
+        _handle_success(provider, start, _usage(response))
+        _store_response(rendered, provider.name, provider.model, response.content)
+        return response.content
+    print("AVISO: todos os provedores de LLM falharam.")
+
+
+@traced("invoke", kind="llm")
+async def ainvoke_llm_with_fallback(prompt_template, input_dict, use_cache=True):
+    """
+    Versão assíncrona de invoke_llm_with_fallback: mesma ordem de provedores,
+    circuit breaker e cache, sem bloquear uma thread durante a chamada de rede.
+    """
+    cached, rendered = _cached_response(prompt_template, input_dict, use_cache)
+    if cached is not None:
+        return cached
+
+    for provider in LLM_PROVIDERS.candidates():
+        print(f"Tentando LLM {provider.label}...")
+        start = time.perf_counter()
+        try:
+            response = await (prompt_template | provider.client).ainvoke(input_dict)
+        except Exception as e:
+            _handle_failure(provider, start, e)
+            continue
+        _handle_success(provider, start, _usage(response))
+        _store_response(rendered, provider.name, provider.model, response.content)
         return response.content
-    except Exception as e_groq:
-        print(f"AVISO: API do Groq falhou. Acionando fallback final. Erro: {e_groq}")
-    
+    print("AVISO: todos os provedores de LLM falharam.")
+
+
+def _chunk_text(chunk) -> str:
+    content = chunk.content
+    return content if isinstance(content, str) else "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+@traced("stream", kind="llm")
+def stream_llm_with_fallback(prompt_template, input_dict, on_token, use_cache=True):
+    """
+    Como invoke_llm_with_fallback, mas entrega a resposta em partes via on_token(texto)
+    à medida que chega, e retorna o texto completo. Se um provedor falhar no meio da
+    resposta, on_token(None) sinaliza que o texto parcial deve ser descartado.
+    """
+    cached, rendered = _cached_response(prompt_template, input_dict, use_cache)
+    if cached is not None:
+        on_token(cached)
+        return cached
+
+    for provider in LLM_PROVIDERS.candidates():
+        print(f"Tentando LLM {provider.label} (streaming)...")
+        start = time.perf_counter()
+        parts, tokens = [], Counter()
+        try:
+            for chunk in (prompt_template | provider.client).stream(input_dict):
+                tokens.update(_usage(chunk))
+                text = _chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    on_token(text)
+        except Exception as e:
+            if parts:
+                on_token(None)
+            _handle_failure(provider, start, e)
+            continue
+        _handle_success(provider, start, dict(tokens))
+        content = "".join(parts)
+        _store_response(rendered, provider.name, provider.model, content)
+        return content
+    print("AVISO: todos os provedores de LLM falharam.")
+
+
+@traced("stream", kind="llm")
+async def astream_llm_with_fallback(prompt_template, input_dict, on_token, use_cache=True):
+    """Versão assíncrona de stream_llm_with_fallback."""
+    cached, rendered = _cached_response(prompt_template, input_dict, use_cache)
+    if cached is not None:
+        on_token(cached)
+        return cached
+
+    for provider in LLM_PROVIDERS.candidates():
+        print(f"Tentando LLM {provider.label} (streaming)...")
+        start = time.perf_counter()
+        parts, tokens = [], Counter()
+        try:
+            async for chunk in (prompt_template | provider.client).astream(input_dict):
+                tokens.update(_usage(chunk))
+                text = _chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    on_token(text)
+        except Exception as e:
+            if parts:
+                on_token(None)
+            _handle_failure(provider, start, e)
+            continue
+        _handle_success(provider, start, dict(tokens))
+        content = "".join(parts)
+        _store_response(rendered, provider.name, provider.model, content)
+        return content
+    print("AVISO: todos os provedores de LLM falharam.")
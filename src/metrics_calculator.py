@@ -1,8 +1,11 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Any, Optional, Dict, Tuple
 from unidecode import unidecode
 from src.config import CATEGORICAL_MAPPING_CONFIG
+from src.data_store import load_location_data
+from src.dataset_index import DateIndex, normalize_municipality, sort_by_date
 
 # State para siglas dos estados
 STATE_MAP = {
@@ -15,64 +18,181 @@ STATE_MAP = {
     "sergipe": "SE", "tocantins": "TO"
 }
 
+# Colunas lidas do dataset limpo; as demais não são usadas por nenhuma métrica
+METRIC_COLUMNS = [
+    "data_notificacao", "data_primeiros_sintomas", "uf_notificacao", "municipio_notificacao",
+    "foi_internado", "internado_uti", "suporte_ventilatorio", "classificacao_final",
+    "evolucao_caso", "vacinado_covid", "vacinado_gripe", "idade_anos_corrigida",
+]
+
+AGE_BINS = [0, 9, 19, 29, 39, 49, 59, 69, 79, 120]
+AGE_LABELS = ['0-9 anos', '10-19 anos', '20-29 anos', '30-39 anos', '40-49 anos', '50-59 anos', '60-69 anos', '70-79 anos', '80+ anos']
+
+
+def equals_mask(series: pd.Series, value: str) -> np.ndarray:
+    """Máscara booleana `series == value`; em colunas categóricas compara os códigos inteiros."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if value not in categories:
+            return np.zeros(len(series), dtype=bool)
+        return series.cat.codes.to_numpy() == categories.get_loc(value)
+    return series.to_numpy() == value
+
+def observed_counts(series: pd.Series) -> pd.Series:
+    """value_counts apenas dos valores presentes (categorias sem registros ficam de fora)."""
+    counts = series.value_counts()
+    return counts[counts > 0]
+
+def empty_metrics_bundle() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Valores padrão das métricas e séries quando não há dados, como nos métodos individuais."""
+    metrics = {
+        "taxa_mortalidade": 0.0, "taxa_uti": 0.0, "taxa_vacinacao": 0.0, "taxa_aumento_casos": 0.0,
+        "tempo_medio_notificacao": None, "proporcao_casos": {}, "letalidade_por_idade": {},
+        "taxa_ventilacao_invasiva": 0.0, "taxa_vacinacao_gripe": 0.0,
+    }
+    plot_data = {"casos_diarios": pd.Series(dtype=float), "casos_mensais": pd.Series(dtype=float)}
+    return metrics, plot_data
+
+
+def apply_counts(counts: Dict[str, Any], metrics: Dict[str, Any]) -> None:
+    """
+    Preenche as taxas a partir das contagens agregadas. As operações seguem a mesma
+    ordem dos métodos individuais, para que os valores arredondados sejam idênticos.
+    """
+    total_cases = counts["n_casos"]
+    if counts["n_desfecho_conhecido"] > 0:
+        metrics["taxa_mortalidade"] = round((counts["n_obitos"] / counts["n_desfecho_conhecido"]) * 100, 2)
+    if counts["n_internados"] > 0:
+        metrics["taxa_uti"] = round((counts["n_internados_uti"] / counts["n_internados"]) * 100, 2)
+    if counts["n_uti"] > 0:
+        metrics["taxa_ventilacao_invasiva"] = round((counts["n_uti_ventilacao_invasiva"] / counts["n_uti"]) * 100, 2)
+    metrics["taxa_vacinacao"] = round((counts["n_vacinados_covid"] / total_cases) * 100, 2)
+    if counts.get("n_vacinados_gripe") is not None:
+        metrics["taxa_vacinacao_gripe"] = round((counts["n_vacinados_gripe"] / total_cases) * 100, 2)
+
+    classification = counts.get("classificacao")
+    if classification is not None:
+        metrics["proporcao_casos"] = (classification / classification.sum() * 100).round(2).to_dict()
+
+    if counts.get("desfecho_por_faixa") is not None and counts["n_desfecho_conhecido"] > 0:
+        group_totals, group_deaths = counts["desfecho_por_faixa"], counts["obitos_por_faixa"]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lethality = np.where(group_totals > 0, group_deaths / group_totals * 100, 0)
+        metrics["letalidade_por_idade"] = pd.Series(lethality, index=AGE_LABELS).round(2).to_dict()
+
+    if counts["n_atraso_notificacao"] > 0:
+        metrics["tempo_medio_notificacao"] = round(counts["soma_atraso_notificacao"] / counts["n_atraso_notificacao"], 1)
+
+
+def apply_date_counts(unique_dates: np.ndarray, date_counts: np.ndarray,
+                      metrics: Dict[str, Any], plot_data: Dict[str, Any]) -> None:
+    """
+    Preenche a variação semanal e as séries diária (últimos 30 dias) e mensal
+    (últimos 12 meses) a partir das contagens por data, ordenadas e sem NaT.
+    """
+    if len(unique_dates) == 0:
+        return
+    last_date = unique_dates[-1]
+    if len(unique_dates) >= 14:
+        last_week_cases = date_counts[unique_dates >= last_date - np.timedelta64(6, 'D')].sum()
+        prev_week = (unique_dates >= last_date - np.timedelta64(13, 'D')) & (unique_dates <= last_date - np.timedelta64(7, 'D'))
+        prev_week_cases = date_counts[prev_week].sum()
+        metrics["taxa_aumento_casos"] = (round(((last_week_cases - prev_week_cases) / prev_week_cases) * 100, 2)
+                                         if prev_week_cases > 0 else float('inf'))
+
+    recent = unique_dates >= last_date - np.timedelta64(30, 'D')
+    plot_data["casos_diarios"] = pd.Series(
+        date_counts[recent], index=pd.DatetimeIndex(unique_dates[recent], name='data_notificacao'))
+
+    months = unique_dates.astype('datetime64[M]').astype(np.int64)
+    monthly_counts = np.bincount(months - months[0], weights=date_counts).astype(np.int64)
+    month_ends = pd.date_range(pd.Timestamp(unique_dates[0]), periods=len(monthly_counts),
+                               freq='ME', name='data_notificacao')
+    plot_data["casos_mensais"] = pd.Series(monthly_counts, index=month_ends).tail(12)
+
+
+def location_uf(location: str) -> Optional[str]:
+    """UF (sigla) de uma localidade por nome ou sigla; None para o Brasil inteiro."""
+    if location.strip().upper() in ["BRASIL", "BR"]:
+        return None
+    normalized_location = unidecode(location.lower().strip())
+    if normalized_location in STATE_MAP:
+        return STATE_MAP[normalized_location]
+    return location.strip().upper()
+
+
 class MetricsCalculator:
-    def __init__(self, cleaned_data_path: Path, location: str = "Brasil", city: Optional[str] = None):
-        self.file_path = cleaned_data_path
+    def __init__(self, cleaned_data_path: Path, location: str = "Brasil", city: Optional[str] = None,
+                 cube_path: Optional[Path] = None):
+        """
+        Com `cube_path`, as métricas são respondidas a partir do cubo pré-agregado
+        (ver src/metrics_cube.py), sem carregar os dados linha a linha.
+        """
+        self.file_path = cube_path or cleaned_data_path
         self.location = location
         self.city = city
+        self.use_cube = cube_path is not None
+        self._bundle = None
+        self._date_index = None
         self.df = self._load_and_filter_data()
 
-    def _get_uf_from_location(self, location_str: str) -> str:
-        normalized_location = unidecode(location_str.lower().strip())
-        if normalized_location in STATE_MAP:
-            return STATE_MAP[normalized_location]
-        return location_str.strip().upper()
 
     def _load_and_filter_data(self) -> pd.DataFrame:
         print(f"Carregando e filtrando dados para: Localidade='{self.location}', Cidade='{self.city}'")
         try:
-            date_cols = ['data_notificacao', 'data_primeiros_sintomas', 'data_nascimento',
-                         'data_internacao', 'data_entrada_uti', 'data_evolucao']
-            full_df = pd.read_csv(self.file_path, sep=';', parse_dates=date_cols, encoding='utf-8')
-            state_df = full_df
-            location_upper = self.location.strip().upper()
-            if location_upper not in ["BRASIL", "BR"]:
-                target_uf = self._get_uf_from_location(self.location)
-                state_df = full_df[full_df['uf_notificacao'].str.upper() == target_uf].copy()
+            target_uf = location_uf(self.location)
+            city_normalized = normalize_municipality(self.city.strip()) if self.city else None
+            columns = None if self.use_cube else METRIC_COLUMNS
+            # Ordenado por data (já vem assim do cache; no cubo a fatia é ordenada aqui) para o DateIndex
+            final_df = sort_by_date(load_location_data(self.file_path, columns=columns, uf=target_uf, city=city_normalized))
             if self.city:
-                city_normalized = unidecode(self.city.lower().strip())
-                state_df['municipio_notificacao'] = state_df['municipio_notificacao'].astype(str)
-                final_df = state_df[state_df['municipio_notificacao'].str.lower().apply(unidecode) == city_normalized].copy()
                 if final_df.empty: 
                     print(f"   AVISO: Nenhum dado para a cidade '{self.city}'.")
                 else: 
                     print(f"  Dados filtrados. {len(final_df)} registros para '{self.city}, {self.location}'.")
                 return final_df
-            if state_df.empty: 
+            if final_df.empty: 
                 print(f"AVISO: Nenhum dado para a localidade '{self.location}'.")
             else: 
-                print(f"  Dados filtrados. {len(state_df)} registros para '{self.location}'.")
-            return state_df
+                print(f"  Dados filtrados. {len(final_df)} registros para '{self.location}'.")
+            return final_df
         except Exception as e:
             print(f"ERRO ao carregar e filtrar dados: {e}")
             raise
 
+    def _cube_bundle(self) -> Dict[str, Any]:
+        """No modo cubo, os métodos individuais leem o resultado (memorizado) de compute_all."""
+        if self._bundle is None:
+            self._bundle = self.compute_all()
+        return self._bundle
+
+    @property
+    def date_index(self) -> DateIndex:
+        """
+        Índice de datas do frame da localidade, construído no primeiro uso. No modo cubo,
+        os casos de cada data são a soma de `n_casos` das células.
+        """
+        if self._date_index is None:
+            dates = self.df['data_notificacao'] if 'data_notificacao' in self.df.columns else pd.Series(dtype='datetime64[ns]')
+            weights = self.df['n_casos'].to_numpy() if self.use_cube and 'n_casos' in self.df.columns else None
+            self._date_index = DateIndex(dates, weights)
+        return self._date_index
+
     def get_daily_cases(self, days: int = 30) -> pd.Series:
-        if self.df.empty or self.df['data_notificacao'].isnull().all(): 
+        index = self.date_index
+        if index.empty:
             return pd.Series(dtype=float)
-        last_date = self.df['data_notificacao'].max()
-        start_date = last_date - pd.Timedelta(days=days)
-        recent_cases_df = self.df[self.df['data_notificacao'] >= start_date]
-        return recent_cases_df.groupby('data_notificacao').size()
+        start_date, last_date = index.last_days(days)
+        return index.daily_counts(start_date, last_date)
 
     def get_monthly_cases(self, months: int = 12) -> pd.Series:
-        if self.df.empty or self.df['data_notificacao'].isnull().all(): 
+        if self.date_index.empty:
             return pd.Series(dtype=float)
-        df_temp = self.df.set_index('data_notificacao')
-        monthly_counts = df_temp.resample('ME').size()
-        return monthly_counts.tail(months)
+        return self.date_index.monthly_counts().tail(months)
 
     def calculate_mortality_rate(self) -> float:
+        if self.use_cube:
+            return self._cube_bundle()["metrics"]["taxa_mortalidade"]
         if self.df.empty: 
             return 0.0
         known_outcomes = self.df[self.df['evolucao_caso'].isin(['Cura', 'Óbito'])]
@@ -82,6 +202,8 @@ class MetricsCalculator:
         return round((deaths / len(known_outcomes)) * 100, 2) if len(known_outcomes) > 0 else 0.0
 
     def calculate_icu_rate(self) -> float:
+        if self.use_cube:
+            return self._cube_bundle()["metrics"]["taxa_uti"]
         if self.df.empty: 
             return 0.0
         hospitalized = self.df[self.df['foi_internado'] == 'Sim']
@@ -91,23 +213,25 @@ class MetricsCalculator:
         return round((icu_cases / len(hospitalized)) * 100, 2) if len(hospitalized) > 0 else 0.0
 
     def calculate_vaccination_rate(self) -> float:
+        if self.use_cube:
+            return self._cube_bundle()["metrics"]["taxa_vacinacao"]
         if self.df.empty: 
             return 0.0
         vaccinated = (self.df['vacinado_covid'] == 'Sim').sum()
         return round((vaccinated / len(self.df)) * 100, 2) if len(self.df) > 0 else 0.0
 
     def calculate_case_increase_rate(self) -> float:
-        if self.df.empty or self.df['data_notificacao'].nunique() < 14: 
+        index = self.date_index
+        if len(index.unique_dates) < 14:
             return 0.0
-        last_date = self.df['data_notificacao'].max()
-        last_week_start = last_date - pd.Timedelta(days=6)
-        prev_week_start = last_date - pd.Timedelta(days=13)
-        prev_week_end = last_date - pd.Timedelta(days=7)
-        last_week_cases = self.df[self.df['data_notificacao'] >= last_week_start].shape[0]
-        prev_week_cases = self.df[(self.df['data_notificacao'] >= prev_week_start) & (self.df['data_notificacao'] <= prev_week_end)].shape[0]
+        last_date = index.last_date
+        last_week_cases = int(index.count(last_date - pd.Timedelta(days=6), last_date))
+        prev_week_cases = int(index.count(last_date - pd.Timedelta(days=13), last_date - pd.Timedelta(days=7)))
         return round(((last_week_cases - prev_week_cases) / prev_week_cases) * 100, 2) if prev_week_cases > 0 else float('inf')
 
     def calculate_avg_notification_time(self) -> Optional[float]:
+        if self.use_cube:
+            return self._cube_bundle()["metrics"]["tempo_medio_notificacao"]
         if self.df.empty: 
             return None
         delta = (self.df['data_notificacao'] - self.df['data_primeiros_sintomas']).dt.days
@@ -115,26 +239,30 @@ class MetricsCalculator:
         return round(delta.mean(), 1) if not delta.isnull().all() else None
 
     def get_case_proportions(self) -> Dict[str, float]:
+        if self.use_cube:
+            return self._cube_bundle()["metrics"]["proporcao_casos"]
         if self.df.empty or 'classificacao_final' not in self.df.columns: 
             return {}
         proportions = self.df['classificacao_final'].value_counts(normalize=True) * 100
-        return proportions.round(2).to_dict()
+        return proportions[proportions > 0].round(2).to_dict()
 
     def get_lethality_by_age_group(self) -> Dict[str, float]:
+        if self.use_cube:
+            return self._cube_bundle()["metrics"]["letalidade_por_idade"]
         if self.df.empty or 'idade_anos_corrigida' not in self.df.columns: 
             return {}
-        age_bins = [0, 9, 19, 29, 39, 49, 59, 69, 79, 120]
-        age_labels = ['0-9 anos', '10-19 anos', '20-29 anos', '30-39 anos', '40-49 anos', '50-59 anos', '60-69 anos', '70-79 anos', '80+ anos']
         df_lethality = self.df[self.df['evolucao_caso'].isin(['Cura', 'Óbito'])].copy()
         if df_lethality.empty: 
             return {}
-        df_lethality['faixa_etaria'] = pd.cut(df_lethality['idade_anos_corrigida'], bins=age_bins, labels=age_labels, right=True)
+        df_lethality['faixa_etaria'] = pd.cut(df_lethality['idade_anos_corrigida'], bins=AGE_BINS, labels=AGE_LABELS, right=True)
         age_groups = df_lethality.groupby('faixa_etaria', observed=False)
         lethality = age_groups.apply(lambda x: (x['evolucao_caso'] == 'Óbito').sum() / len(x) * 100 if len(x) > 0 else 0)
         
         return lethality.round(2).to_dict()
     
     def calculate_flu_vaccination_rate(self) -> float:
+        if self.use_cube:
+            return self._cube_bundle()["metrics"]["taxa_vacinacao_gripe"]
         if self.df.empty or 'vacinado_gripe' not in self.df.columns: 
             return 0.0
         vaccinated = (self.df['vacinado_gripe'] == 'Sim').sum()
@@ -142,6 +270,8 @@ class MetricsCalculator:
         return round((vaccinated / total_cases) * 100, 2) if total_cases > 0 else 0.0
 
     def calculate_invasive_ventilation_rate(self) -> float:
+        if self.use_cube:
+            return self._cube_bundle()["metrics"]["taxa_ventilacao_invasiva"]
         if self.df.empty: 
             return 0.0
         icu_patients = self.df[self.df['internado_uti'] == 'Sim']
@@ -151,4 +281,70 @@ class MetricsCalculator:
         invasive_vent = (icu_patients['suporte_ventilatorio'] == 'Sim, invasivo').sum()
         total_icu = len(icu_patients)
         
-        return round((invasive_vent / total_icu) * 100, 2) if total_icu > 0 else 0.0
\ No newline at end of file
+        return round((invasive_vent / total_icu) * 100, 2) if total_icu > 0 else 0.0
+
+    def compute_all(self) -> Dict[str, Any]:
+        """
+        Calcula todas as métricas do relatório e as séries diária e mensal em uma única
+        passagem, com máscaras e códigos compartilhados. Os resultados são idênticos aos
+        das chamadas individuais dos métodos. No modo cubo, tudo vem das contagens pré-agregadas.
+        """
+        if self.use_cube:
+            from src.metrics_cube import compute_all_from_cube
+            return compute_all_from_cube(self.df)
+
+        df = self.df
+        metrics, plot_data = empty_metrics_bundle()
+        if df.empty:
+            return {"metrics": metrics, "plot_data": plot_data}
+
+        # Máscaras compartilhadas entre as métricas
+        deaths = equals_mask(df['evolucao_caso'], 'Óbito')
+        known_outcomes = deaths | equals_mask(df['evolucao_caso'], 'Cura')
+        hospitalized = equals_mask(df['foi_internado'], 'Sim')
+        icu = equals_mask(df['internado_uti'], 'Sim')
+        delay = (df['data_notificacao'] - df['data_primeiros_sintomas']).dt.days
+        delay = delay[delay >= 0]
+        counts = {
+            "n_casos": len(df), "n_obitos": deaths.sum(), "n_desfecho_conhecido": known_outcomes.sum(),
+            "n_internados": hospitalized.sum(), "n_internados_uti": (hospitalized & icu).sum(), "n_uti": icu.sum(),
+            "n_uti_ventilacao_invasiva": (icu & equals_mask(df['suporte_ventilatorio'], 'Sim, invasivo')).sum(),
+            "n_vacinados_covid": equals_mask(df['vacinado_covid'], 'Sim').sum(),
+            "n_vacinados_gripe": equals_mask(df['vacinado_gripe'], 'Sim').sum() if 'vacinado_gripe' in df.columns else None,
+            "classificacao": observed_counts(df['classificacao_final']) if 'classificacao_final' in df.columns else None,
+            "soma_atraso_notificacao": delay.sum(), "n_atraso_notificacao": delay.count(),
+        }
+        if 'idade_anos_corrigida' in df.columns:
+            age_codes = pd.cut(df['idade_anos_corrigida'].to_numpy()[known_outcomes], bins=AGE_BINS,
+                               labels=AGE_LABELS, right=True).codes
+            in_bins = age_codes >= 0
+            counts["desfecho_por_faixa"] = np.bincount(age_codes[in_bins], minlength=len(AGE_LABELS))
+            counts["obitos_por_faixa"] = np.bincount(age_codes[in_bins & deaths[known_outcomes]], minlength=len(AGE_LABELS))
+        apply_counts(counts, metrics)
+
+        # Datas de notificação: contagens por data já prontas no índice (frame ordenado por data)
+        apply_date_counts(self.date_index.unique_dates, self.date_index.date_counts, metrics, plot_data)
+        return {"metrics": metrics, "plot_data": plot_data}
+
+    def get_cases_between(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Registros (ou células do cubo) notificados entre `start` e `end`, inclusive
+        (None = sem limite): uma fatia contígua do frame, sem máscara sobre todas as linhas.
+        """
+        return self.df.iloc[self.date_index.slice(start, end)]
+
+    def count_cases_between(self, start=None, end=None) -> int:
+        """Número de casos notificados entre `start` e `end`, inclusive."""
+        return int(self.date_index.count(start, end))
+
+    def get_daily_cases_between(self, start=None, end=None) -> pd.Series:
+        """Casos por data de notificação entre `start` e `end` (apenas datas com notificações)."""
+        return self.date_index.daily_counts(start, end)
+
+    def get_epi_week_cases(self, year: int, week: int) -> pd.DataFrame:
+        """Registros (ou células do cubo) de uma semana epidemiológica (domingo a sábado)."""
+        return self.df.iloc[self.date_index.week_slice(year, week)]
+
+    def get_weekly_cases(self, weeks: int = 12) -> pd.Series:
+        """Casos por semana epidemiológica, indexados por (ano, semana), nas últimas `weeks` semanas com dados."""
+        return self.date_index.weekly_counts().tail(weeks)
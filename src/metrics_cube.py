@@ -0,0 +1,116 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+from src.metrics_calculator import (AGE_BINS, AGE_LABELS, apply_counts, apply_date_counts,
+                                    empty_metrics_bundle, equals_mask)
+
+# Dimensões do cubo: cada linha agrega as notificações de um município em uma data
+CUBE_DIMENSIONS = ["uf_notificacao", "municipio_notificacao", "data_notificacao"]
+
+# As dimensões de desfecho (evolução, internação, UTI, ventilação, vacinação,
+# classificação e faixa etária) ficam pré-cruzadas em colunas de contagem,
+# apenas nas combinações usadas pelas métricas.
+CLASSIFICATION_PREFIX = "n_classificacao"
+AGE_KNOWN_PREFIX = "n_desfecho_faixa"
+AGE_DEATHS_PREFIX = "n_obitos_faixa"
+
+
+def measure_column(prefix: str, value: str) -> str:
+    return f"{prefix}[{value}]"
+
+
+def build_metrics_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega os dados limpos em um cubo compacto de contagens por UF × município × data.
+    Todas as métricas do MetricsCalculator são somas (ou razões de somas) destas colunas.
+    """
+    deaths = equals_mask(df['evolucao_caso'], 'Óbito')
+    known_outcomes = deaths | equals_mask(df['evolucao_caso'], 'Cura')
+    hospitalized = equals_mask(df['foi_internado'], 'Sim')
+    icu = equals_mask(df['internado_uti'], 'Sim')
+
+    delay = (df['data_notificacao'] - df['data_primeiros_sintomas']).dt.days
+    valid_delay = (delay >= 0).to_numpy()
+    measures = {
+        "n_casos": np.ones(len(df), dtype=np.int64),
+        "n_obitos": deaths,
+        "n_desfecho_conhecido": known_outcomes,
+        "n_internados": hospitalized,
+        "n_internados_uti": hospitalized & icu,
+        "n_uti": icu,
+        "n_uti_ventilacao_invasiva": icu & equals_mask(df['suporte_ventilatorio'], 'Sim, invasivo'),
+        "n_vacinados_covid": equals_mask(df['vacinado_covid'], 'Sim'),
+        "n_vacinados_gripe": equals_mask(df['vacinado_gripe'], 'Sim') if 'vacinado_gripe' in df.columns else 0,
+        "soma_atraso_notificacao": np.where(valid_delay, delay.to_numpy(dtype=float, na_value=np.nan), 0.0),
+        "n_atraso_notificacao": valid_delay,
+    }
+
+    classification = df['classificacao_final'].astype(object)
+    for value in pd.unique(classification.dropna()):
+        measures[measure_column(CLASSIFICATION_PREFIX, value)] = (classification == value).to_numpy()
+
+    age_codes = pd.cut(df['idade_anos_corrigida'].to_numpy(dtype=float), bins=AGE_BINS,
+                       labels=AGE_LABELS, right=True).codes
+    for code, label in enumerate(AGE_LABELS):
+        in_band = age_codes == code
+        measures[measure_column(AGE_KNOWN_PREFIX, label)] = in_band & known_outcomes
+        measures[measure_column(AGE_DEATHS_PREFIX, label)] = in_band & deaths
+
+    frame = pd.DataFrame(measures, index=df.index).astype({
+        col: np.int64 for col in measures if col != "soma_atraso_notificacao"
+    })
+    dimensions = df[CUBE_DIMENSIONS].astype({"uf_notificacao": object, "municipio_notificacao": object})
+    cube = pd.concat([dimensions, frame], axis=1).groupby(CUBE_DIMENSIONS, dropna=False, sort=True).sum()
+    return cube.reset_index()
+
+
+def combine_cubes(cubes: List[pd.DataFrame]) -> pd.DataFrame:
+    """Soma cubos parciais (ex.: de blocos do pipeline), já que todas as medidas são aditivas."""
+    cube = pd.concat(cubes, ignore_index=True)
+    measure_cols = [col for col in cube.columns if col not in CUBE_DIMENSIONS]
+    cube[measure_cols] = cube[measure_cols].fillna(0)
+    cube = cube.groupby(CUBE_DIMENSIONS, dropna=False, sort=True).sum().reset_index()
+    return cube.astype({col: np.int64 for col in measure_cols if col != "soma_atraso_notificacao"})
+
+
+def save_metrics_cube(cube: pd.DataFrame, output_path: Path) -> Path:
+    """Grava o cubo em um único arquivo Parquet, com UF e município categóricos."""
+    output_path = Path(output_path)
+    os.makedirs(output_path.parent, exist_ok=True)
+    cube.astype({"uf_notificacao": "category", "municipio_notificacao": "category"}).to_parquet(output_path, index=False)
+    return output_path
+
+
+def _prefixed_columns(cube: pd.DataFrame, prefix: str) -> Dict[str, str]:
+    """Mapeia as colunas `prefixo[valor]` do cubo para o respectivo valor."""
+    start = len(prefix) + 1
+    return {col: col[start:-1] for col in cube.columns if col.startswith(f"{prefix}[")}
+
+
+def compute_all_from_cube(cube: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Responde todas as métricas e as séries diária/mensal a partir de uma fatia do cubo,
+    com os mesmos valores de MetricsCalculator.compute_all sobre os dados linha a linha.
+    """
+    metrics, plot_data = empty_metrics_bundle()
+    if cube.empty:
+        return {"metrics": metrics, "plot_data": plot_data}
+
+    totals = cube.drop(columns=CUBE_DIMENSIONS).sum()
+    counts = {col: totals[col] for col in [
+        "n_casos", "n_obitos", "n_desfecho_conhecido", "n_internados", "n_internados_uti", "n_uti",
+        "n_uti_ventilacao_invasiva", "n_vacinados_covid", "n_vacinados_gripe",
+        "soma_atraso_notificacao", "n_atraso_notificacao",
+    ]}
+    classification_cols = _prefixed_columns(cube, CLASSIFICATION_PREFIX)
+    classification = totals[list(classification_cols)].rename(classification_cols)
+    counts["classificacao"] = classification[classification > 0].sort_values(ascending=False, kind="stable")
+    counts["desfecho_por_faixa"] = totals[[measure_column(AGE_KNOWN_PREFIX, label) for label in AGE_LABELS]].to_numpy()
+    counts["obitos_por_faixa"] = totals[[measure_column(AGE_DEATHS_PREFIX, label) for label in AGE_LABELS]].to_numpy()
+    apply_counts(counts, metrics)
+
+    daily = cube.groupby('data_notificacao')['n_casos'].sum()
+    apply_date_counts(daily.index.to_numpy(), daily.to_numpy(), metrics, plot_data)
+    return {"metrics": metrics, "plot_data": plot_data}
@@ -0,0 +1,184 @@
+import json
+import os
+import platform
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.data_processor import SragDataProcessor
+from src.instrumentation import Span, measured_root
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Valores do relatório somados entre repetições de um mesmo trecho (ex.: etapas de cada bloco)
+_SUMMED = ("wall_seconds", "cpu_seconds", "memory_delta_mb")
+
+
+def _merge(rows: "OrderedDict[str, Dict[str, Any]]", key: str, item: Span, **fields: Any) -> None:
+    """Acumula o trecho na linha `key`: tempos e memória retida somados, pico pelo maior valor."""
+    row = rows.setdefault(key, {**fields, "calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                "peak_memory_mb": 0.0, "memory_delta_mb": 0.0})
+    row["calls"] += 1
+    for name in _SUMMED:
+        row[name] = round(row[name] + (getattr(item, name) or 0.0), 6)
+    row["peak_memory_mb"] = max(row["peak_memory_mb"], item.peak_memory_mb or 0.0)
+    if "rows" in item.attributes:
+        # Etapas repetidas por bloco (--streaming) somam os registros de cada bloco
+        row["rows"] = row.get("rows", 0) + item.attributes["rows"]
+
+
+def _max_rss_mb() -> Optional[float]:
+    """Maior memória residente do processo até aqui (inclui buffers fora do tracemalloc, ex.: Arrow)."""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _rows(root: Span) -> Tuple["OrderedDict[str, Dict[str, Any]]", "OrderedDict[str, Dict[str, Any]]"]:
+    """Linhas por etapa e por coluna convertida (na ordem do pipeline, com a etapa de cada coluna)."""
+    steps: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    columns: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def visit(item: Span, step: Optional[str]) -> None:
+        for child in item.children:
+            if child.kind == "step":
+                _merge(steps, child.name, child, step=child.name)
+                visit(child, child.name)
+            elif child.kind == "column":
+                conversion = child.attributes.get("conversion")
+                _merge(columns, f"{conversion}:{child.name}", child, column=child.name,
+                       conversion=conversion, step=step)
+            else:
+                visit(child, step)
+
+    visit(root, None)
+    return steps, columns
+
+
+def profile_report(root: Span, meta: Dict[str, Any], memory_root: Optional[Span] = None) -> Dict[str, Any]:
+    """
+    Relatório do perfil: totais da execução, uma linha por etapa e uma por coluna convertida,
+    com a fração do tempo total de cada uma. Tempos vêm de `root`; pico e memória retida vêm
+    de `memory_root` (passagem com tracemalloc), quando houver.
+    """
+    steps, columns = _rows(root)
+    memory_root = memory_root or root
+    memory_steps, memory_columns = _rows(memory_root) if memory_root.peak_memory_mb is not None else ({}, {})
+    for rows, memory_rows in ((steps, memory_steps), (columns, memory_columns)):
+        for key, row in rows.items():
+            row["peak_memory_mb"] = memory_rows.get(key, {}).get("peak_memory_mb")
+            row["memory_delta_mb"] = memory_rows.get(key, {}).get("memory_delta_mb")
+    total = root.wall_seconds or 0.0
+    for row in [*steps.values(), *columns.values()]:
+        row["share_of_total"] = round(row["wall_seconds"] / total, 4) if total else 0.0
+    unaccounted = total - sum(row["wall_seconds"] for row in steps.values())
+    return {
+        "meta": meta,
+        "total": {"wall_seconds": root.wall_seconds, "cpu_seconds": root.cpu_seconds,
+                  "peak_memory_mb": memory_root.peak_memory_mb, "memory_delta_mb": memory_root.memory_delta_mb,
+                  "max_rss_mb": _max_rss_mb(),
+                  "unaccounted_seconds": round(max(0.0, unaccounted), 6), "error": root.error},
+        "steps": list(steps.values()),
+        "columns": list(columns.values()),
+    }
+
+
+def _mb(value: Optional[float]) -> str:
+    return f"{value:>8.1f}MB" if value is not None else f"{'-':>10}"
+
+
+def print_profile(report: Dict[str, Any], top: int = 10) -> None:
+    total = report["total"]
+    print(f"\nPERFIL DO PIPELINE: {total['wall_seconds']:.2f}s, CPU {total['cpu_seconds']:.2f}s, "
+          f"pico {_mb(total['peak_memory_mb']).strip()} (tracemalloc), RSS máximo {total['max_rss_mb'] or 0:.1f}MB")
+    print(f"{'etapa':<34} {'n':>4} {'tempo':>9} {'%':>6} {'pico':>10} {'retida':>10}")
+    for row in report["steps"]:
+        print(f"{row['step']:<34} {row['calls']:>4} {row['wall_seconds']:>8.3f}s {row['share_of_total'] * 100:>5.1f}% "
+              f"{_mb(row['peak_memory_mb'])} {_mb(row['memory_delta_mb'])}")
+    columns = sorted(report["columns"], key=lambda row: row["wall_seconds"], reverse=True)[:top]
+    if columns:
+        print(f"\n{'coluna (conversão)':<34} {'n':>4} {'tempo':>9} {'%':>6} {'pico':>10} {'retida':>10}")
+        for row in columns:
+            label = f"{row['column']} ({row['conversion']})"
+            print(f"{label:<34} {row['calls']:>4} {row['wall_seconds']:>8.3f}s {row['share_of_total'] * 100:>5.1f}% "
+                  f"{_mb(row['peak_memory_mb'])} {_mb(row['memory_delta_mb'])}")
+
+
+def compare_profiles(baseline: Dict[str, Any], report: Dict[str, Any]) -> None:
+    """Imprime, por etapa e por coluna, a razão de tempo e de pico de memória atual / anterior."""
+    print(f"\n{'comparação com o perfil anterior':<42} {'tempo':>8} {'pico':>8}")
+    for section, label in (("steps", "step"), ("columns", "column")):
+        previous = {(row[label], row.get("conversion")): row for row in baseline.get(section, [])}
+        for row in report[section]:
+            old = previous.get((row[label], row.get("conversion")))
+            if not old:
+                continue
+            time_ratio = row["wall_seconds"] / old["wall_seconds"] if old["wall_seconds"] else float("inf")
+            memory_ratio = row["peak_memory_mb"] / old["peak_memory_mb"] if row["peak_memory_mb"] and old["peak_memory_mb"] else 1.0
+            name = row[label] if label == "step" else f"{row[label]} ({row['conversion']})"
+            print(f"{name:<42} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x")
+
+
+def _run_pipeline(config: Dict[str, Any], file_format: str, n_workers: int, streaming: bool,
+                  chunk_size: Optional[int], build_cube: bool, trace_memory: bool) -> Span:
+    """Uma passagem completa do pipeline (como no main.py) sob um trecho raiz."""
+    processor = SragDataProcessor(config=config)
+    with measured_root("pipeline", kind="run", trace_memory=trace_memory) as root:
+        if streaming:
+            processor.run_streaming_pipeline(chunk_size=chunk_size, file_format=file_format, build_cube=build_cube)
+        else:
+            processor.run_pipeline(n_workers=n_workers)
+            processor._step("save_processed_data", file_format)
+            if build_cube:
+                processor._step("build_metrics_cube")
+        if build_cube:
+            processor._step("save_metrics_cube")
+    return root
+
+
+def profile_pipeline(config: Dict[str, Any], file_format: str, output_path: Path, n_workers: int = 1,
+                     streaming: bool = False, chunk_size: Optional[int] = None, build_cube: bool = False,
+                     measure_memory: bool = True, baseline_path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Executa o pipeline medindo cada etapa e cada conversão de coluna e grava o relatório
+    JSON em `output_path`; com `baseline_path`, compara com um relatório anterior.
+    O tracemalloc deixa algumas operações (ex.: to_numeric, to_csv) dezenas de vezes mais
+    lentas, então tempo e memória vêm de passagens separadas: a primeira mede tempo de parede
+    e CPU e, com `measure_memory`, uma segunda mede pico e memória retida.
+    Com n_workers > 1 a limpeza roda em outros processos e o custo por coluna não é medido.
+    """
+    if n_workers > 1 and not streaming:
+        print("AVISO: com --workers > 1 o custo por coluna não é medido (a limpeza roda em outros processos).")
+    options = dict(file_format=file_format, n_workers=n_workers, streaming=streaming,
+                   chunk_size=chunk_size, build_cube=build_cube)
+    root = _run_pipeline(config, trace_memory=False, **options)
+    memory_root = None
+    if measure_memory:
+        print("\nSegunda passagem, com tracemalloc, para medir a memória de cada etapa")
+        memory_root = _run_pipeline(config, trace_memory=True, **options)
+
+    meta = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"), "raw_file": str(config["file_path"]),
+        "raw_file_bytes": os.path.getsize(config["file_path"]), "output_format": file_format,
+        "mode": "streaming" if streaming else "serial" if n_workers <= 1 else f"parallel({n_workers})",
+        "chunk_size": chunk_size if streaming else None, "build_cube": build_cube,
+        "memory_pass": measure_memory,
+        "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+        "platform": platform.platform(), "cpus": os.cpu_count(),
+    }
+    report = profile_report(root, meta, memory_root)
+    output_path = Path(output_path)
+    os.makedirs(output_path.parent, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2)
+    print_profile(report)
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as handle:
+            compare_profiles(json.load(handle), report)
+    print(f"\nRelatório de perfil salvo em: {output_path}")
+    return report
@@ -1,72 +1,182 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import hashlib
+import threading
 import matplotlib.dates as mdates
+import matplotlib.style
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from pathlib import Path
 import os
+from typing import Any, Dict, List, Optional, Tuple
+from src.config import PLOT_CONFIG
+from src.instrumentation import traced
+
+PLOT_STYLE = "ggplot"
+# Versão da aparência dos gráficos: altere ao mudar estilo/títulos para invalidar os PNGs já gerados
+RENDER_VERSION = "1"
+
+# Modelos dos gráficos: o que não depende dos dados é montado uma única vez por figura
+CHART_SPECS = {
+    "daily": {
+        "title": 'Número Diário de Casos de SRAG (Últimos 30 Dias)', "xlabel": 'Data da Notificação',
+        "date_format": '%d/%m/%Y', "label": 'Nº de Casos Diários', "color": 'skyblue',
+    },
+    "monthly": {
+        "title": 'Número Mensal de Casos de SRAG (Últimos 12 Meses)', "xlabel": 'Mês da Notificação',
+        "date_format": '%b/%Y', "label": 'Nº de Casos Mensais', "color": 'royalblue',
+    },
+}
+
+# O estilo é aplicado via rcParams (globais do processo): uma renderização por vez em cada processo
+_RENDER_LOCK = threading.Lock()
+
+
+def series_hash(kind: str, data: pd.Series) -> str:
+    """Hash do conteúdo da série (índice e valores), do tipo de gráfico e da versão da aparência."""
+    digest = hashlib.sha256(f"{kind}\x1f{RENDER_VERSION}".encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
 
 class PlotGenerator:
     """
-    classe para gerar e salvar gráficos a partir de dados SRAG
+    classe para gerar e salvar gráficos a partir de dados SRAG.
+    Usa apenas a API orientada a objetos do Matplotlib com o backend Agg (sem o estado
+    global do pyplot): cada tipo de gráfico tem uma figura modelo, já estilizada, reutilizada
+    entre chamadas. Com `skip_unchanged`, um PNG cujo arquivo `.sha256` ao lado corresponde
+    à série recebida não é renderizado de novo.
     """
+    def __init__(self, skip_unchanged: bool = True):
+        self.skip_unchanged = skip_unchanged
+        self._templates: Dict[str, Tuple[Figure, Any]] = {}
+
+    def _template(self, kind: str):
+        if kind not in self._templates:
+            spec = CHART_SPECS[kind]
+            fig = Figure(figsize=(12, 6))
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+            ax.set_title(spec["title"], fontsize=16)
+            ax.set_xlabel(spec["xlabel"], fontsize=12)
+            ax.set_ylabel('Número de Casos', fontsize=12)
+            ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+            self._templates[kind] = (fig, ax)
+        return self._templates[kind]
+
+    def _draw(self, kind: str, data: pd.Series, output_path) -> None:
+        spec = CHART_SPECS[kind]
+        fig, ax = self._template(kind)
+        for artist in [*ax.containers, *ax.lines]:
+            artist.remove()
+        if kind == "daily":
+            ax.bar(data.index, data.values, color=spec["color"], label=spec["label"])
+        else:
+            ax.plot(data.index, data.values, marker='o', linestyle='-', color=spec["color"], label=spec["label"])
+        ax.relim()
+        ax.autoscale_view()
+        ax.xaxis.set_major_formatter(mdates.DateFormatter(spec["date_format"]))
+        ax.legend()
+        fig.autofmt_xdate(rotation=45, ha='right')
+        fig.tight_layout()
+        fig.savefig(output_path)
+
+    def render(self, kind: str, data: pd.Series, output_path) -> str:
+        """Renderiza o gráfico `kind` ("daily" ou "monthly") em `output_path`, se a série mudou."""
+        digest_path = Path(f"{output_path}.sha256")
+        digest = series_hash(kind, data)
+        if (self.skip_unchanged and Path(output_path).exists() and digest_path.exists()
+                and digest_path.read_text() == digest):
+            print(f" # Gráfico inalterado, reutilizado: {output_path}")
+            return output_path
+        digest_path.unlink(missing_ok=True)
+        with _RENDER_LOCK, matplotlib.style.context(PLOT_STYLE):
+            self._draw(kind, data, output_path)
+        digest_path.write_text(digest)
+        print(f" # Gráfico salvo em: {output_path}")
+        return output_path
+
     def generate_daily_cases_plot(self, data: pd.Series, output_path: str) -> str:
         """
         Gráfico de barras com os casos diários e o salva como uma imagem..
         """
         print(f"Gerando gráfico de casos diários")
-        plt.style.use('ggplot') 
-        fig, ax = plt.subplots(figsize=(12, 6))
-        ax.bar(data.index, data.values, color='skyblue', label='Nº de Casos Diários')
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
-        plt.xticks(rotation=45, ha='right')
-        ax.set_title('Número Diário de Casos de SRAG (Últimos 30 Dias)', fontsize=16)
-        ax.set_xlabel('Data da Notificação', fontsize=12)
-        ax.set_ylabel('Número de Casos', fontsize=12)
-        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-        ax.legend()
-        plt.tight_layout()
-        plt.savefig(output_path)
-        plt.close(fig)
-        print(f" # Gráfico salvo em: {output_path}")
-        return output_path
+        return self.render("daily", data, output_path)
 
     def generate_monthly_cases_plot(self, data: pd.Series, output_path: str) -> str:
         """
-        Gráfico de linhas dos casos mensais e o salva como uma imagem.       
+        Gráfico de linhas dos casos mensais e o salva como uma imagem.
         """
         print(f"Gerando gráfico de casos mensais ")
-        plt.style.use('ggplot')  
-        fig, ax = plt.subplots(figsize=(12, 6))
+        return self.render("monthly", data, output_path)
 
-        ax.plot(data.index, data.values, marker='o', linestyle='-', color='royalblue', label='Nº de Casos Mensais')
 
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%b/%Y'))
-        plt.xticks(rotation=45, ha='right')
+_GENERATOR: Optional[PlotGenerator] = None
 
-        ax.set_title('Número Mensal de Casos de SRAG (Últimos 12 Meses)', fontsize=16)
-        ax.set_xlabel('Mês da Notificação', fontsize=12)
-        ax.set_ylabel('Número de Casos', fontsize=12)
-        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-        ax.legend()
-        plt.tight_layout()
-        plt.savefig(output_path)
-        plt.close(fig)
-        print(f" # Gráfico salvo em: {output_path}")
-        return output_path
+
+def default_plot_generator() -> PlotGenerator:
+    """Gerador do processo atual, criado no primeiro uso; suas figuras modelo são reutilizadas."""
+    global _GENERATOR
+    if _GENERATOR is None:
+        _GENERATOR = PlotGenerator(skip_unchanged=PLOT_CONFIG.get("skip_unchanged", True))
+    return _GENERATOR
+
+
+def _render_job(job: Tuple[str, pd.Series, str]) -> str:
+    kind, data, output_path = job
+    return default_plot_generator().render(kind, data, output_path)
+
+
+def render_many(jobs: List[Tuple[str, pd.Series, str]], n_workers: Optional[int] = None) -> List[str]:
+    """
+    Renderiza vários gráficos `(tipo, série, caminho)` em um pool de processos
+    (`n_workers`, padrão PLOT_CONFIG["render_workers"] ou o número de CPUs), cada um
+    reutilizando suas figuras modelo. Retorna os caminhos na ordem dos pedidos.
+    """
+    n_workers = n_workers or PLOT_CONFIG.get("render_workers") or os.cpu_count() or 1
+    if n_workers <= 1 or len(jobs) <= 1:
+        return [_render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(jobs))) as executor:
+        return list(executor.map(_render_job, jobs, chunksize=max(1, len(jobs) // (4 * n_workers))))
+
+
+@traced("render_location_plots")
+def render_location_plots(topic: Optional[str], city: Optional[str], plot_data: Dict[str, Any],
+                          output_dir: Path = Path("output")) -> Dict[str, str]:
+    """
+    Gera os gráficos diário e mensal de uma localidade e retorna seus caminhos.
+    Função de módulo para poder rodar em outro processo (ver src/batch_reports.py).
+    """
+    topic = (topic or "Brasil").strip().upper().replace(" ", "_")
+    city = (city or "").strip().upper().replace(" ", "_")
+    plot_identifier = f"{topic}_{city}" if city else topic
+    safe_name = "".join(c for c in plot_identifier if c.isalnum() or c in ('_', '-')).rstrip()
+    daily_data, monthly_data = plot_data.get("casos_diarios"), plot_data.get("casos_mensais")
+    plotter = default_plot_generator()
+    image_paths = {}
+    output_dir = Path(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    if daily_data is not None and not daily_data.empty:
+        path = plotter.generate_daily_cases_plot(daily_data, output_dir / f"daily_cases_{safe_name}.png")
+        image_paths["daily_cases_plot"] = str(path)
+    if monthly_data is not None and not monthly_data.empty:
+        path = plotter.generate_monthly_cases_plot(monthly_data, output_dir / f"monthly_cases_{safe_name}.png")
+        image_paths["monthly_cases_plot"] = str(path)
+    return image_paths
 #teste
 if __name__ == '__main__':
     from src.metrics_calculator import MetricsCalculator
     from src.config import DATA_PROCESSING_CONFIG
+    from src.data_store import get_processed_data_path
     print("Testando o PlotGenerator de forma")
     output_dir = Path("output")
     os.makedirs(output_dir, exist_ok=True)
-    cleaned_file_path = DATA_PROCESSING_CONFIG['output_file_path']
+    cleaned_file_path = get_processed_data_path(DATA_PROCESSING_CONFIG)
     if not Path(cleaned_file_path).exists():
         print("ARQUIVO DE DADOS LIMPO NÃO ENCONTRADO! Execute 'main.py' primeiro.")
     else:
         calculator = MetricsCalculator(cleaned_data_path=cleaned_file_path)
         daily_data = calculator.get_daily_cases()
         monthly_data = calculator.get_monthly_cases()
-        plotter = PlotGenerator()
-        plotter.generate_daily_cases_plot(daily_data, output_dir / "daily_cases_srag.png")
-        plotter.generate_monthly_cases_plot(monthly_data, output_dir / "monthly_cases_srag.png")
-
+        render_many([("daily", daily_data, str(output_dir / "daily_cases_srag.png")),
+                     ("monthly", monthly_data, str(output_dir / "monthly_cases_srag.png"))])
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from src.config import DATA_PROCESSING_CONFIG, REPORT_CACHE_CONFIG
+from src.data_store import dataset_fingerprint, get_processed_data_path
+from src.dataset_index import normalize_municipality
+from src.metrics_calculator import location_uf
+
+# Campos do estado final do grafo guardados no cache (plot_data e tempos por nó ficam de fora)
+CACHED_FIELDS = ["topic", "city", "metrics", "news", "clinical_protocols", "report_text",
+                 "plot_image_paths", "pdf_report_path"]
+
+
+def _dataset_paths() -> List[Path]:
+    """Arquivos dos quais as métricas do relatório dependem, conforme a configuração atual."""
+    paths = [get_processed_data_path(DATA_PROCESSING_CONFIG)]
+    if DATA_PROCESSING_CONFIG.get("metrics_source") == "cube":
+        paths.append(Path(DATA_PROCESSING_CONFIG["cube_output_path"]))
+    return paths
+
+
+class ReportCache:
+    """
+    Cache de relatórios completos em disco. A chave combina a localidade normalizada
+    (UF + município), a versão dos dados limpos e a janela de tempo das notícias: o
+    mesmo pedido, sobre os mesmos dados, na mesma janela, devolve o relatório guardado.
+    Cada entrada guarda suas cópias dos gráficos e do PDF; entradas mais antigas que
+    `max_age_seconds` ou além de `max_entries` (menos usadas primeiro) são removidas.
+    """
+    def __init__(self, path: Path, news_bucket_seconds: float = 86_400,
+                 max_age_seconds: float = 7 * 86_400, max_entries: int = 200, enabled: bool = True):
+        self.path = Path(path)
+        self.news_bucket_seconds = news_bucket_seconds
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def key(self, topic: Optional[str], city: Optional[str]) -> str:
+        location = {
+            "uf": location_uf(topic or "Brasil") or "BR",
+            "municipio": normalize_municipality(city.strip()) if city and city.strip() else None,
+        }
+        parts = {
+            **location,
+            "dados": [dataset_fingerprint(path) for path in _dataset_paths()],
+            "janela_noticias": int(time.time() // self.news_bucket_seconds),
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.path / key
+
+    def _entry_dirs(self) -> List[Path]:
+        """Entradas completas (ignora diretórios temporários de gravações em andamento)."""
+        if not self.path.exists():
+            return []
+        return [entry for entry in self.path.iterdir() if entry.is_dir() and not entry.name.startswith(".tmp-")]
+
+    def get(self, topic: Optional[str], city: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Retorna o estado guardado do relatório, ou None se não houver entrada válida."""
+        if not self.enabled:
+            return None
+        entry_file = self._entry_dir(self.key(topic, city)) / "report.json"
+        with self._lock:
+            try:
+                with open(entry_file, encoding="utf-8") as handle:
+                    entry = json.load(handle)
+            except (FileNotFoundError, json.JSONDecodeError):
+                entry = None
+            artifacts = [entry.get("pdf_report_path"), *entry.get("plot_image_paths", {}).values()] if entry else []
+            if (entry is None or time.time() - entry["criado_em"] > self.max_age_seconds
+                    or not all(path and os.path.exists(path) for path in artifacts if path is not None)):
+                self.misses += 1
+                return None
+            os.utime(entry_file)
+            self.hits += 1
+        print(f"Relatório obtido do cache ({entry_file.parent.name[:12]}).")
+        return {field: entry.get(field) for field in CACHED_FIELDS}
+
+    def put(self, topic: Optional[str], city: Optional[str], state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Guarda o relatório com cópias dos gráficos e o PDF (movido para a entrada, em vez de
+        acumular em output/). Retorna o estado com os caminhos já apontando para o cache.
+        """
+        if not self.enabled or not state.get("report_text"):
+            return state
+        key = self.key(topic, city)
+        temp_dir = self.path / f".tmp-{uuid.uuid4().hex}"
+        os.makedirs(temp_dir)
+        entry_dir = self._entry_dir(key)
+        original_pdf = None
+        try:
+            plot_paths = {}
+            for name, plot_path in (state.get("plot_image_paths") or {}).items():
+                if plot_path and os.path.exists(plot_path):
+                    shutil.copy2(plot_path, temp_dir / Path(plot_path).name)
+                    plot_paths[name] = str(entry_dir / Path(plot_path).name)
+            pdf_path = state.get("pdf_report_path")
+            if pdf_path and os.path.exists(pdf_path):
+                # Copiado, não movido: se a gravação falhar, o PDF original continua em output/
+                shutil.copy2(pdf_path, temp_dir / Path(pdf_path).name)
+                original_pdf, pdf_path = pdf_path, str(entry_dir / Path(pdf_path).name)
+            cached_state = {**state, "plot_image_paths": plot_paths, "pdf_report_path": pdf_path}
+            entry = {field: cached_state.get(field) for field in CACHED_FIELDS}
+            entry["criado_em"] = time.time()
+            with open(temp_dir / "report.json", "w", encoding="utf-8") as handle:
+                json.dump(entry, handle, ensure_ascii=False, default=float)
+            with self._lock:
+                if entry_dir.exists():
+                    shutil.rmtree(entry_dir)
+                os.replace(temp_dir, entry_dir)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        if original_pdf:
+            os.remove(original_pdf)
+        self.evict()
+        return cached_state
+
+    def evict(self) -> int:
+        """Remove entradas expiradas e, acima de `max_entries`, as acessadas há mais tempo."""
+        with self._lock:
+            entries = []
+            for entry_dir in self._entry_dirs():
+                entry_file = entry_dir / "report.json"
+                try:
+                    with open(entry_file, encoding="utf-8") as handle:
+                        created = json.load(handle)["criado_em"]
+                    entries.append((entry_file.stat().st_mtime, created, entry_dir))
+                except (OSError, ValueError, KeyError):
+                    entries.append((0.0, 0.0, entry_dir))
+            entries.sort(key=lambda entry: entry[0], reverse=True)
+            now = time.time()
+            stale = [entry_dir for position, (_, created, entry_dir) in enumerate(entries)
+                     if position >= self.max_entries or now - created > self.max_age_seconds]
+            for entry_dir in stale:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            self.evicted += len(stale)
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evicted": self.evicted,
+                    "entries": len(self._entry_dirs())}
+
+
+REPORT_CACHE = ReportCache(REPORT_CACHE_CONFIG["path"],
+                           news_bucket_seconds=REPORT_CACHE_CONFIG.get("news_bucket_hours", 24) * 3600,
+                           max_age_seconds=REPORT_CACHE_CONFIG.get("max_age_hours", 7 * 24) * 3600,
+                           max_entries=REPORT_CACHE_CONFIG.get("max_entries", 200),
+                           enabled=REPORT_CACHE_CONFIG.get("enabled", True))
+
+
+def get_report_cache_stats() -> Dict[str, Any]:
+    return REPORT_CACHE.stats()
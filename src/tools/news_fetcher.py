@@ -1,21 +1,16 @@
 import os
 from dotenv import load_dotenv
-from langchain_tavily import TavilySearch
-from langchain.tools import tool
+from langchain.tools import StructuredTool
+from src.config import SEARCH_CONFIG
+from src.tools.search_cache import SEARCH_CACHE
+from src.instrumentation import traced
 
 load_dotenv()
 
-if not os.getenv("TAVILY_API_KEY"):
+if SEARCH_CONFIG.get("backend", "tavily") == "tavily" and not os.getenv("TAVILY_API_KEY"):
     raise ValueError("A chave de API da Tavily não foi encontrada. Verifique seu arquivo .env")
 
-@tool
-def news_search_tool(location: str = "São Paulo") -> str:
-    """
-    Busca notícias recentes sobre Síndrome Respiratória Aguda Grave (SRAG) para uma localidade específica.
-    A entrada deve ser uma string com o nome de um estado do Brasil ou a sigla 'BR' para uma busca nacional.
-    Se nenhuma localidade for fornecida, a busca padrão será para 'São Paulo'.
-    """
-    
+def _news_query(location: str) -> str:
     search_location = ""
     if not location or not location.strip():
         search_location = "São Paulo"  
@@ -26,13 +21,26 @@ def news_search_tool(location: str = "São Paulo") -> str:
         
     print(f"\nExecutando busca de notícias de SRAG para a localidade: '{search_location}'...")
     
-    query = f"notícias recentes sobre Síndrome Respiratória Aguda Grave (SRAG) em {search_location}"
-    
-    tavily_search = TavilySearch(max_results=3)
-    results = tavily_search.invoke(query)
+    return f"notícias recentes sobre Síndrome Respiratória Aguda Grave (SRAG) em {search_location}"
+
+@traced("news_search")
+def news_search(location: str = "São Paulo") -> str:
+    """
+    Busca notícias recentes sobre Síndrome Respiratória Aguda Grave (SRAG) para uma localidade específica.
+    A entrada deve ser uma string com o nome de um estado do Brasil ou a sigla 'BR' para uma busca nacional.
+    Se nenhuma localidade for fornecida, a busca padrão será para 'São Paulo'.
+    """
+    results = SEARCH_CACHE.search(_news_query(location), max_results=3)
     
     return results
 
+@traced("news_search")
+async def anews_search(location: str = "São Paulo") -> str:
+    """Versão assíncrona de news_search, usada por `news_search_tool.ainvoke`."""
+    return await SEARCH_CACHE.asearch(_news_query(location), max_results=3)
+
+news_search_tool = StructuredTool.from_function(func=news_search, coroutine=anews_search, name="news_search_tool")
+
 if __name__ == '__main__':
     print("Testando a ferramenta de busca de notícias parametrizada")
     
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+from src.config import SEARCH_CONFIG
+from src.instrumentation import count_call
+
+
+def normalize_query(query: str) -> str:
+    """Consulta normalizada para o cache: minúsculas e espaços colapsados."""
+    return " ".join(query.casefold().split())
+
+
+class TavilyBackend:
+    """Backend real: mantém um cliente TavilySearch por `max_results`, reutilizado entre chamadas."""
+    def __init__(self):
+        self._clients: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    def _client(self, max_results: int):
+        from langchain_tavily import TavilySearch
+        with self._lock:
+            if max_results not in self._clients:
+                self._clients[max_results] = TavilySearch(max_results=max_results)
+            return self._clients[max_results]
+
+    def search(self, query: str, max_results: int) -> Any:
+        return self._client(max_results).invoke(query)
+
+    async def asearch(self, query: str, max_results: int) -> Any:
+        return await self._client(max_results).ainvoke(query)
+
+
+class FakeSearchBackend:
+    """
+    Backend local para testes e execuções sem rede: respostas determinísticas no formato
+    do Tavily, com latência opcional e contagem das chamadas recebidas.
+    """
+    def __init__(self, delay: float = 0.0, responses: Optional[Dict[str, Any]] = None):
+        self.delay = delay
+        self.responses = responses or {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _response(self, query: str, max_results: int) -> Any:
+        with self._lock:
+            self.calls += 1
+        if query in self.responses:
+            return self.responses[query]
+        return {
+            "query": query,
+            "results": [
+                {"title": f"Resultado {i + 1} para '{query}'", "url": f"https://example.org/busca/{i + 1}",
+                 "content": f"Conteúdo simulado {i + 1} sobre {query}."}
+                for i in range(max_results)
+            ],
+        }
+
+    def search(self, query: str, max_results: int) -> Any:
+        time.sleep(self.delay)
+        return self._response(query, max_results)
+
+    async def asearch(self, query: str, max_results: int) -> Any:
+        await asyncio.sleep(self.delay)
+        return self._response(query, max_results)
+
+
+class _LeaderAbandoned(Exception):
+    """A busca que as demais aguardavam foi cancelada; quem aguardava tenta de novo."""
+
+
+class SearchCache:
+    """
+    Cache em processo das buscas web, por consulta normalizada e `max_results`.
+    Entradas expiram após `ttl_seconds`; acima de `max_entries` as menos usadas
+    recentemente são removidas. Buscas idênticas simultâneas (síncronas ou assíncronas)
+    são agrupadas: apenas uma vai ao backend e as demais aguardam o mesmo resultado.
+    Se a busca que está no backend for cancelada (ex.: pelo prazo de quem a fez), as
+    que aguardavam não recebem o cancelamento: uma delas passa a fazer a busca.
+    Os resultados devolvidos são compartilhados e não devem ser modificados.
+    """
+    def __init__(self, backend, ttl_seconds: float = 3_600, max_entries: int = 256):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, int], Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evicted = 0
+
+    def _lookup(self, key: Tuple[str, int]) -> Tuple[Optional[Any], Optional[Future], bool]:
+        """Retorna (resultado em cache, busca em andamento, se esta chamada deve buscar)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1], None, False
+                del self._entries[key]
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return None, flight, False
+            flight = self._in_flight[key] = Future()
+            self.misses += 1
+            return None, flight, True
+
+    def _finish(self, key: Tuple[str, int], flight: Future, result: Any = None,
+                error: Optional[BaseException] = None) -> None:
+        if error is not None and not isinstance(error, Exception):
+            # Cancelamento (ou interrupção) de quem buscava não é um erro da busca
+            error = _LeaderAbandoned()
+        with self._lock:
+            if error is None:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evicted += 1
+            del self._in_flight[key]
+        if error is None:
+            flight.set_result(result)
+        else:
+            flight.set_exception(error)
+
+    def search(self, query: str, max_results: int = 3) -> Any:
+        key = (normalize_query(query), max_results)
+        while True:
+            cached, flight, leader = self._lookup(key)
+            count_call("search_api" if leader else "search_cache_hit")
+            if flight is None:
+                return cached
+            if not leader:
+                try:
+                    return flight.result()
+                except _LeaderAbandoned:
+                    continue
+            try:
+                result = self.backend.search(query, max_results)
+            except BaseException as e:
+                self._finish(key, flight, error=e)
+                raise
+            self._finish(key, flight, result)
+            return result
+
+    async def asearch(self, query: str, max_results: int = 3) -> Any:
+        key = (normalize_query(query), max_results)
+        while True:
+            cached, flight, leader = self._lookup(key)
+            count_call("search_api" if leader else "search_cache_hit")
+            if flight is None:
+                return cached
+            if not leader:
+                try:
+                    # shield: cancelar quem aguarda não cancela a busca compartilhada
+                    return await asyncio.shield(asyncio.wrap_future(flight))
+                except _LeaderAbandoned:
+                    continue
+            try:
+                result = await self.backend.asearch(query, max_results)
+            except BaseException as e:
+                self._finish(key, flight, error=e)
+                raise
+            self._finish(key, flight, result)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                    "evicted": self.evicted, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.coalesced = self.evicted = 0
+
+
+def _build_backend(name: str):
+    if name == "tavily":
+        return TavilyBackend()
+    if name == "fake":
+        return FakeSearchBackend()
+    raise ValueError(f"Backend de busca não suportado: '{name}'.")
+
+
+SEARCH_CACHE = SearchCache(_build_backend(SEARCH_CONFIG.get("backend", "tavily")),
+                           ttl_seconds=SEARCH_CONFIG.get("ttl_seconds", 3_600),
+                           max_entries=SEARCH_CONFIG.get("max_entries", 256))
+
+
+def get_search_cache_stats() -> Dict[str, Any]:
+    return SEARCH_CACHE.stats()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.arrow_store import read_arrow_dataset, write_arrow_dataset
+from src.data_store import read_processed_data, write_processed_data
+from src.dataset_index import sort_by_date
+
+
+@pytest.fixture
+def cleaned() -> pd.DataFrame:
+    """Um frame com cada tipo gravado pelo pipeline, com valores ausentes, fora da ordem de data."""
+    return pd.DataFrame({
+        "data_notificacao": pd.to_datetime(["2024-03-01", None, "2024-01-15", "2024-02-10"]),
+        "evolucao_caso": pd.Categorical(["Cura", "Óbito", None, "Cura"], categories=["Cura", "Óbito", "Ignorado"]),
+        "uf_notificacao": ["SP", "RJ", "SP", "MG"],
+        "idade_anos_corrigida": [42.0, np.nan, 0.5, 80.0],
+        "idade": pd.array([42, None, 6, 80], dtype="Int64"),
+        "semana_notificacao": pd.array([9, 1, 3, 6], dtype="Int64"),
+        "contagem": np.array([1, 2, 3, 4], dtype=np.int64),
+    })
+
+
+def test_round_trip_keeps_dtypes_and_values(cleaned, tmp_path):
+    path = write_arrow_dataset(cleaned, tmp_path / "limpo.arrow")
+    result = read_arrow_dataset(path)
+    expected = sort_by_date(cleaned).reset_index(drop=True)
+    expected["uf_notificacao"] = expected["uf_notificacao"].astype("category")
+
+    assert result.dtypes.to_dict() == expected.dtypes.to_dict()
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_layout_columns_point_to_the_mapped_file(cleaned, tmp_path):
+    result = read_arrow_dataset(write_arrow_dataset(cleaned, tmp_path / "limpo.arrow"))
+
+    buffers = {
+        "data_notificacao": result["data_notificacao"].to_numpy(),
+        "evolucao_caso": result["evolucao_caso"].cat.codes.to_numpy(),
+        "idade_anos_corrigida": result["idade_anos_corrigida"].to_numpy(),
+        "idade": result["idade"].array._data,
+    }
+    for column, values in buffers.items():
+        assert not values.flags.writeable, column
+
+
+def test_columns_and_uf_filter(cleaned, tmp_path):
+    path = write_processed_data(cleaned, tmp_path / "limpo.arrow", file_format="arrow")
+    result = read_processed_data(path, columns=["uf_notificacao", "idade"], uf="SP")
+
+    assert list(result.columns) == ["uf_notificacao", "idade"]
+    assert result["idade"].dtype == "Int64"
+    assert result["idade"].tolist() == [6, 42]
+
+
+def test_files_from_other_writers_keep_their_nulls(cleaned, tmp_path):
+    path = tmp_path / "pandas.feather"
+    cleaned.to_feather(path)
+    result = read_arrow_dataset(path)
+
+    assert result["idade"].isna().tolist() == cleaned["idade"].isna().tolist()
+    assert result["data_notificacao"].isna().tolist() == cleaned["data_notificacao"].isna().tolist()
@@ -0,0 +1,40 @@
+import asyncio
+import contextlib
+import io
+import pytest
+
+pytest.importorskip("langchain")
+from src.agents.clinical_protocols_agent import agent  # noqa: E402
+
+
+async def fake_agent(input_dict):
+    disease = input_dict["disease"]
+    if disease == "cancelada":
+        # Como um seguidor da busca compartilhada quando outra tarefa a cancela
+        raise asyncio.CancelledError()
+    if disease == "lenta":
+        await asyncio.sleep(10)
+    return f"protocolo de {disease}"
+
+
+def test_foreign_cancellation_is_a_per_disease_failure(monkeypatch):
+    monkeypatch.setattr(agent, "aclinical_protocol_agent", fake_agent)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = asyncio.run(agent.alookup_protocols(["dengue", "cancelada", "influenza"]))
+
+    assert result == {"dengue": "protocolo de dengue", "influenza": "protocolo de influenza"}
+    assert "consulta de protocolos para 'cancelada' falhou" in output.getvalue()
+
+
+def test_cancelling_the_node_still_cancels(monkeypatch):
+    monkeypatch.setattr(agent, "aclinical_protocol_agent", fake_agent)
+
+    async def run():
+        task = asyncio.ensure_future(agent.alookup_protocols(["dengue", "lenta"]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await task
+
+    with contextlib.redirect_stdout(io.StringIO()), pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.config import DATA_PROCESSING_CONFIG
+from src.data_processor import SragDataProcessor
+
+
+def convert_age_rowwise(df: pd.DataFrame) -> pd.Series:
+    """Implementação linha a linha original, usada como referência."""
+    def convert_age(row):
+        age, age_type = row['idade'], row['tipo_idade']
+        if pd.isna(age) or pd.isna(age_type): return age
+        if age_type == 1: return age / 365.25
+        if age_type == 2: return age / 12
+        return age
+    return df.apply(convert_age, axis=1)
+
+
+def normalize(df: pd.DataFrame) -> pd.Series:
+    processor = SragDataProcessor(config=DATA_PROCESSING_CONFIG)
+    processor.df = df.copy()
+    return processor._normalize_age().df['idade_anos_corrigida']
+
+
+def reference(df: pd.DataFrame) -> np.ndarray:
+    return pd.to_numeric(convert_age_rowwise(df)).to_numpy(dtype=float, na_value=np.nan)
+
+
+@pytest.mark.parametrize("age, age_type, expected", [
+    (730, 1, 730 / 365.25),  # dias
+    (18, 2, 1.5),            # meses
+    (42, 3, 42.0),           # anos
+    (42, None, 42.0),        # tipo ausente mantém a idade
+    (None, 1, np.nan),       # idade ausente
+    (None, None, np.nan),
+])
+def test_normalize_age_units_and_missing_values(age, age_type, expected):
+    df = pd.DataFrame({"idade": pd.array([age], dtype="Int64"), "tipo_idade": pd.array([age_type], dtype="Int64")})
+    result = normalize(df)
+    np.testing.assert_array_equal(result.to_numpy(), [expected])
+    np.testing.assert_array_equal(result.to_numpy(), reference(df))
+
+
+def test_normalize_age_matches_rowwise_reference():
+    rng = np.random.default_rng(42)
+    rows = 5_000
+    age = pd.array(rng.integers(0, 120, rows), dtype="Int64")
+    age_type = pd.array(rng.choice([1, 2, 3], rows), dtype="Int64")
+    age[rng.random(rows) < 0.05] = pd.NA
+    age_type[rng.random(rows) < 0.05] = pd.NA
+    df = pd.DataFrame({"idade": age, "tipo_idade": age_type})
+
+    result = normalize(df)
+
+    assert result.dtype == np.float64
+    assert result.isna().sum() == df['idade'].isna().sum()
+    np.testing.assert_array_equal(result.to_numpy(), reference(df))
@@ -0,0 +1,101 @@
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic_data import iter_raw_chunks
+from src import incremental_ingest
+from src.config import DATA_PROCESSING_CONFIG
+from src.data_processor import SragDataProcessor
+from src.data_store import read_processed_data, write_processed_data
+from src.incremental_ingest import IncrementalIngestor
+from src.metrics_cube import build_metrics_cube, save_metrics_cube
+
+CHANGED_WEEK = 10
+
+
+@pytest.fixture
+def extracts(tmp_path):
+    """Duas extrações sintéticas: na segunda, a evolução dos casos de uma semana muda."""
+    first = next(iter_raw_chunks(3_000, seed=7, chunk_rows=3_000, start="2024-01-01", days=120))
+    second = first.copy()
+    week = second["SEM_NOT"] == CHANGED_WEEK
+    outcome = second.loc[week, "EVOLUCAO"].fillna(0)
+    second.loc[week, "EVOLUCAO"] = np.where(outcome == 1, 2, 1)
+    # A ordem das linhas não altera os digests
+    second = second.sample(frac=1, random_state=1)
+    paths = []
+    for name, frame in (("extracao_1.csv", first), ("extracao_2.csv", second)):
+        frame.to_csv(tmp_path / name, sep=";", index=False, encoding="ISO-8859-1")
+        paths.append(tmp_path / name)
+    return paths
+
+
+def make_config(tmp_path, file_format):
+    store = tmp_path / "store"
+    return {
+        **DATA_PROCESSING_CONFIG, "output_format": file_format, "chunk_size": 1_000,
+        "output_file_path": store / "limpo.csv", "parquet_output_path": store / "limpo_parquet",
+        "arrow_output_path": store / "limpo.arrow", "cube_output_path": store / "cubo.parquet",
+        "ingest_manifest_path": store / "manifesto.json",
+    }
+
+
+def normalized(df):
+    df = df.drop(columns=["ano_notificacao"], errors="ignore")
+    df = df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    keys = df.astype(str)
+    return df.iloc[np.lexsort([keys[col].to_numpy() for col in reversed(keys.columns)])].reset_index(drop=True)
+
+
+def normalized_cube(cube):
+    # As colunas por classificação e faixa etária seguem a ordem em que os valores aparecem
+    cube = cube[sorted(cube.columns)].astype({"uf_notificacao": str, "municipio_notificacao": str})
+    return cube.sort_values(["uf_notificacao", "municipio_notificacao", "data_notificacao"], ignore_index=True)
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet", "arrow"])
+def test_changed_week_matches_full_rebuild(tmp_path, extracts, file_format):
+    config = make_config(tmp_path, file_format)
+    ingestor = IncrementalIngestor(config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = ingestor.ingest(extracts[0])
+        save_metrics_cube(build_metrics_cube(read_processed_data(ingestor.output_path)), config["cube_output_path"])
+        second = ingestor.ingest(extracts[1])
+        repeated = ingestor.ingest(extracts[1])
+
+        processor = SragDataProcessor({**config, "file_path": extracts[1]})
+        processor.run_pipeline()
+        reference_path = tmp_path / "referencia" / ingestor.output_path.name
+        write_processed_data(processor.df, reference_path, file_format=file_format,
+                             partition_cols=config.get("partition_columns"))
+
+    changed_groups = {key for key in ingestor.load_manifest()["groups"] if key.endswith(f"|{CHANGED_WEEK}")}
+    assert 0 < second["grupos_alterados"] == len(changed_groups) < first["grupos_alterados"]
+    assert repeated["grupos_alterados"] == 0
+
+    pd.testing.assert_frame_equal(normalized(read_processed_data(ingestor.output_path)),
+                                  normalized(read_processed_data(reference_path)), check_dtype=False)
+    pd.testing.assert_frame_equal(normalized_cube(pd.read_parquet(config["cube_output_path"])),
+                                  normalized_cube(build_metrics_cube(processor.df)), check_dtype=False)
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_failed_write_keeps_the_previous_store(tmp_path, extracts, file_format, monkeypatch):
+    config = make_config(tmp_path, file_format)
+    ingestor = IncrementalIngestor(config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingestor.ingest(extracts[0])
+    before = normalized(read_processed_data(ingestor.output_path))
+    manifest = ingestor.load_manifest()
+
+    def failing_write(*args, **kwargs):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(incremental_ingest, "write_processed_data", failing_write)
+    with contextlib.redirect_stdout(io.StringIO()), pytest.raises(OSError):
+        ingestor.ingest(extracts[1])
+
+    pd.testing.assert_frame_equal(normalized(read_processed_data(ingestor.output_path)), before)
+    assert ingestor.load_manifest() == manifest
+    assert [path.name for path in ingestor.output_path.parent.iterdir() if ".tmp-" in path.name] == []
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+from src.tools.search_cache import FakeSearchBackend, SearchCache
+
+
+def test_entries_expire_after_ttl():
+    backend = FakeSearchBackend()
+    cache = SearchCache(backend, ttl_seconds=0.05)
+    cache.search("dengue")
+    cache.search("Dengue ")
+    assert backend.calls == 1
+
+    time.sleep(0.1)
+    cache.search("dengue")
+    assert backend.calls == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    backend = FakeSearchBackend()
+    cache = SearchCache(backend, max_entries=2)
+    cache.search("dengue")
+    cache.search("influenza")
+    cache.search("dengue")
+    cache.search("covid")
+
+    assert cache.stats()["evicted"] == 1
+    cache.search("dengue")
+    assert backend.calls == 3
+    cache.search("influenza")
+    assert backend.calls == 4
+
+
+def test_concurrent_sync_searches_share_one_call():
+    backend = FakeSearchBackend(delay=0.2)
+    cache = SearchCache(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.search("dengue"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.calls == 1
+    assert len(results) == 4 and all(result is results[0] for result in results)
+
+
+def test_concurrent_async_searches_share_one_call():
+    backend = FakeSearchBackend(delay=0.2)
+    cache = SearchCache(backend)
+
+    async def run():
+        return await asyncio.gather(*(cache.asearch("dengue") for _ in range(4)))
+
+    results = asyncio.run(run())
+    assert backend.calls == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_cancelled_leader_does_not_fail_the_followers():
+    backend = FakeSearchBackend(delay=0.3)
+    cache = SearchCache(backend)
+
+    async def run():
+        leader = asyncio.ensure_future(asyncio.wait_for(cache.asearch("dengue"), 0.1))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(cache.asearch("dengue")) for _ in range(2)]
+        # Cancelar quem aguarda também não afeta os demais
+        cancelled = asyncio.ensure_future(cache.asearch("dengue"))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        return await asyncio.gather(leader, *followers, cancelled, return_exceptions=True)
+
+    leader, *followers, cancelled = asyncio.run(run())
+    assert isinstance(leader, asyncio.TimeoutError)
+    assert isinstance(cancelled, asyncio.CancelledError)
+    assert followers[0] is followers[1] and "results" in followers[0]
+    assert backend.calls == 1
+    assert cache.stats()["entries"] == 1